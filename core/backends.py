@@ -0,0 +1,553 @@
+import os
+import abc
+import gc
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from core.kv_cache import KVStateCache
+from core.tuning import ProfileStore, DEFAULT_PARAMS
+from core.speculative import (HAS_SPECULATIVE, DRAFT_PROMPT_LOOKUP, DraftStats, TrackingDraft,
+                               LlamaModelDraft, LlamaPromptLookupDecoding)
+
+# Global flag to track if llama_cpp is usable
+HAS_LLAMA = False
+try:
+    from llama_cpp import Llama, LlamaGrammar
+    HAS_LLAMA = True
+except ImportError:
+    Llama = LlamaGrammar = None
+except OSError:
+    # Captures "FileNotFoundError: ... CUDA/.../bin" and other DLL issues
+    Llama = LlamaGrammar = None
+except Exception:
+    Llama = LlamaGrammar = None
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+# Per resident model, on top of the mmapped weights
+KV_BYTES_PER_TOKEN = 128 * 1024            # f16 K+V of a 7B-class model (32 layers x 1024 KV dims)
+COMPUTE_BUFFER_BYTES = 256 * 1024 * 1024   # Scratch buffers
+VOCAB_SIZE_ESTIMATE = 32000 # Sizes the per-position logits kept with logits_all
+
+class BaseBackend(abc.ABC):
+    """Where completions actually run. LLMEngine owns naming, scheduling, caching and
+    readiness; a backend only loads models (identified by path/id) and produces text.
+    Methods raise on failure; LLMEngine turns exceptions into its error strings.
+
+    grammar, where accepted, is a GBNF string or a JSON schema dict the output must match.
+    """
+    name = "base"
+    slots = 1 # Requests the backend can usefully run at the same time
+    supports_batch = False # complete_batch() evaluates several prompts together
+
+    def unavailable_reason(self) -> Optional[str]:
+        """An error string if the backend can't run at all, else None."""
+        return None
+
+    @abc.abstractmethod
+    def load(self, path: str) -> bool:
+        pass
+
+    def unload(self, path: Optional[str] = None):
+        pass
+
+    def is_loaded(self, path: str) -> bool:
+        return True
+
+    def warm_up(self, path: str):
+        pass
+
+    def context_size(self, path: str) -> int:
+        return DEFAULT_PARAMS["n_ctx"]
+
+    def count_tokens(self, path: str, text: str) -> Optional[int]:
+        return None
+
+    @abc.abstractmethod
+    def complete(self, path: str, prompt: str, stop, max_tokens: int, cache_prefix=None, draft=None,
+                 grammar=None) -> str:
+        pass
+
+    @abc.abstractmethod
+    def stream(self, path: str, prompt: str, stop, max_tokens: int, cache_prefix=None, draft=None,
+               grammar=None) -> Iterator[str]:
+        """Yields text pieces (about one per token)."""
+        pass
+
+    def complete_batch(self, path: str, prompts, stop, max_tokens: int, grammar=None):
+        """Completions for several prompts in one evaluation, in order."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+class LlamaCppBackend(BaseBackend):
+    """In-process llama.cpp: a RAM-budgeted LRU pool of mmapped models, on-disk KV
+    state reuse, tuned load profiles and per-call speculative decoding."""
+    name = "llama"
+    slots = 1
+
+    def __init__(self):
+        # Resident models, least recently used first: {path: Llama}
+        self.pool = OrderedDict()
+        self.ram_budget_bytes = int(os.environ.get('JARVIS_LLM_RAM_BUDGET_MB', 12288)) * 1024 * 1024
+        # Generation lock: one context evaluates at a time
+        self.lock = threading.RLock()
+        # Loads happen under their own lock so a slow GGUF load never holds the generation
+        # lock; callers that need a model which is still loading simply queue on it.
+        self.load_lock = threading.RLock()
+        self.kv_cache = KVStateCache()
+        self.profiles = ProfileStore()
+        self.draft_stats = {} # draft mode -> DraftStats
+        self.grammars = {} # GBNF text / schema JSON -> compiled LlamaGrammar
+        # Verifying draft tokens reads the logits of every drafted position, which llama_cpp
+        # only keeps for models built with logits_all=True (n_ctx x n_vocab floats), so
+        # speculative decoding is opt-in: JARVIS_SPECULATIVE=1 loads every model that way
+        self.speculative = HAS_SPECULATIVE and os.environ.get('JARVIS_SPECULATIVE', '0') == '1'
+
+    def unavailable_reason(self):
+        if not HAS_LLAMA:
+            return "System Error: llama-cpp-python is missing or broken (check CUDA/DLLs). Falling back to mock response."
+        return None
+
+    # --- Model pool ---
+
+    def is_loaded(self, path: str) -> bool:
+        return path in self.pool
+
+    def unload(self, path=None):
+        """Drops one model from the pool, or every resident model if none is given."""
+        with self.load_lock:
+            paths = [path] if path else list(self.pool)
+            for p in paths:
+                instance = self.pool.pop(p, None)
+                if instance is not None:
+                    del instance
+                    logging.info(f"Model unloaded: {p}")
+            gc.collect()
+
+    def _estimate_bytes(self, path: str) -> int:
+        # Weights are mmapped from the GGUF file; add headroom for KV cache and scratch buffers
+        n_ctx = self.profiles.params_for(path)["n_ctx"]
+        size = os.path.getsize(path) + COMPUTE_BUFFER_BYTES + n_ctx * KV_BYTES_PER_TOKEN
+        if self.speculative:
+            size += n_ctx * VOCAB_SIZE_ESTIMATE * 4
+        return size
+
+    def _make_room(self, path: str):
+        """Evicts least recently used models until `path` fits in the RAM budget. Caller holds self.load_lock.
+
+        An evicted model that is mid-generation stays alive until that call returns.
+        """
+        needed = self._estimate_bytes(path)
+        resident = sum(self._estimate_bytes(p) for p in self.pool if os.path.exists(p))
+        while self.pool and resident + needed > self.ram_budget_bytes:
+            victim, instance = self.pool.popitem(last=False)
+            del instance
+            resident -= self._estimate_bytes(victim) if os.path.exists(victim) else 0
+            logging.info(f"Model pool: evicted {victim} to stay within RAM budget.")
+        gc.collect()
+
+    def load(self, path: str) -> bool:
+        """Ensures a model is resident in the pool. Returns True on success."""
+        with self.load_lock:
+            if path in self.pool:
+                self.pool.move_to_end(path)
+                return True
+
+            if not HAS_LLAMA:
+                logging.error("llama_cpp module failed to import (Check CUDA/DLLs or install CPU version).")
+                return False
+
+            if not os.path.exists(path):
+                logging.error(f"CRITICAL: Model file missing at: {path}")
+                return False
+
+            try:
+                self._make_room(path)
+                params = self.profiles.params_for(path)
+                logging.info(f"Loading Llama model from {path} with {params}...")
+                # Defaults (no tuned profile) target an RTX 3050 4GB; run `python -m core.tuning <model>`
+                # to benchmark this machine and store a profile that is applied here.
+                self.pool[path] = Llama(
+                    model_path=path,
+                    use_mmap=True,       # Evicted models stay in the page cache; reloads are page-ins
+                    logits_all=self.speculative,
+                    verbose=True,
+                    **params
+                )
+                logging.info("Model loaded successfully.")
+                return True
+            except Exception as e:
+                logging.error(f"Failed to load model: {e}")
+                return False
+
+    def _get(self, path: str):
+        """Returns the resident Llama for `path`, loading it if needed. Raises if it can't."""
+        with self.load_lock:
+            if not self.load(path):
+                raise RuntimeError("Model could not be loaded. Please check logs.")
+            self.pool.move_to_end(path)
+            return self.pool[path]
+
+    def warm_up(self, path: str):
+        llm = self.pool.get(path)
+        if llm is None:
+            return
+        with self.lock:
+            llm.eval(self._tokenize(llm, "Hello"))
+
+    def context_size(self, path: str) -> int:
+        return self.profiles.params_for(path)["n_ctx"]
+
+    def count_tokens(self, path: str, text: str):
+        llm = self.pool.get(path)
+        if llm is None:
+            return None
+        try:
+            return len(llm.tokenize(text.encode('utf-8'), add_bos=False, special=True))
+        except Exception as e:
+            logging.debug(f"Tokenizer unavailable: {e}")
+            return None
+
+    # --- KV state reuse ---
+
+    @staticmethod
+    def _tokenize(llm, text: str):
+        return llm.tokenize(text.encode('utf-8'), special=True)
+
+    @staticmethod
+    def _shared_prefix(a, b) -> int:
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    def _prepare_kv_state(self, path, llm, prompt: str, cache_prefix=None):
+        """Primes the model's KV cache before a completion. Caller holds self.lock.
+
+        llama_cpp already reuses the longest prefix it has in memory; this adds the
+        on-disk states (after a restart/model switch) and checkpoints `cache_prefix` (e.g.
+        the fixed system prompt) the first time it is seen. Only that stable prefix is
+        saved: full conversation states are 100+ MB and, with the history window
+        sliding every turn, almost never match a later prompt.
+        """
+        try:
+            tokens = self._tokenize(llm, prompt)
+            resident = self._shared_prefix(llm.input_ids[:llm.n_tokens], tokens)
+
+            hit = self.kv_cache.lookup(path, tokens, min_tokens=resident)
+            if hit:
+                n, state = hit
+                llm.load_state(state)
+                resident = n
+                logging.info(f"KV cache: restored {n}/{len(tokens)} prompt tokens from disk.")
+
+            if cache_prefix and prompt.startswith(cache_prefix):
+                n = self._shared_prefix(self._tokenize(llm, cache_prefix), tokens)
+                if n < len(tokens) and not self.kv_cache.contains(path, tokens[:n]):
+                    # Evaluate just the stable prefix so it can be checkpointed; the
+                    # completion below then continues from it at no extra cost.
+                    if resident < n:
+                        llm.n_tokens = resident
+                        llm.eval(tokens[resident:n])
+                    else:
+                        llm.n_tokens = n
+                    self._save_kv_state(path, llm)
+        except Exception as e:
+            logging.warning(f"KV cache preparation skipped: {e}")
+
+    def _save_kv_state(self, path, llm):
+        """Persists the model's current KV state. Caller holds self.lock."""
+        n = llm.n_tokens
+        if n < KVStateCache.MIN_TOKENS:
+            return
+        tokens = llm.input_ids[:n].tolist()
+        if self.kv_cache.contains(path, tokens):
+            return
+        self.kv_cache.save(path, tokens, llm.save_state())
+
+    # --- Speculative decoding ---
+
+    def _make_draft(self, draft):
+        """Per-call draft model for speculative decoding: DRAFT_PROMPT_LOOKUP ("prompt") or a
+        model path. Returns None (plain decoding) if unavailable."""
+        if not draft:
+            return None
+        if not HAS_SPECULATIVE:
+            logging.warning("Speculative decoding requested but this llama_cpp build lacks llama_speculative.")
+            return None
+        if not self.speculative:
+            logging.debug("Speculative decoding requested but disabled (set JARVIS_SPECULATIVE=1).")
+            return None
+        if draft == DRAFT_PROMPT_LOOKUP:
+            inner = LlamaPromptLookupDecoding(num_pred_tokens=10, max_ngram_size=3)
+        else:
+            try:
+                inner = LlamaModelDraft(self._get(draft))
+            except Exception:
+                logging.warning(f"Draft model '{draft}' unavailable, decoding without it.")
+                return None
+        stats = self.draft_stats.setdefault(draft, DraftStats())
+        return TrackingDraft(inner, stats)
+
+    @contextmanager
+    def _drafting(self, llm, draft):
+        """Attaches a draft model to `llm` for one call. Caller holds self.lock."""
+        tracker = self._make_draft(draft)
+        if tracker is None:
+            yield
+            return
+        previous = getattr(llm, 'draft_model', None)
+        llm.draft_model = tracker
+        try:
+            yield
+        finally:
+            llm.draft_model = previous
+            tracker.finish(llm.input_ids[:llm.n_tokens])
+
+    # --- Generation ---
+
+    def _grammar(self, grammar):
+        """Compiled LlamaGrammar for a GBNF string or JSON schema dict, parsed once."""
+        if grammar is None:
+            return None
+        key = grammar if isinstance(grammar, str) else json.dumps(grammar, sort_keys=True)
+        if key not in self.grammars:
+            if isinstance(grammar, str):
+                self.grammars[key] = LlamaGrammar.from_string(grammar, verbose=False)
+            else:
+                self.grammars[key] = LlamaGrammar.from_json_schema(key, verbose=False)
+        return self.grammars[key]
+
+    def complete(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None) -> str:
+        llm = self._get(path)
+        with self.lock, self._drafting(llm, draft):
+            self._prepare_kv_state(path, llm, prompt, cache_prefix)
+            output = llm(
+                prompt,
+                max_tokens=max_tokens,
+                stop=stop,
+                echo=False,
+                grammar=self._grammar(grammar)
+            )
+            return output['choices'][0]['text']
+
+    def stream(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None) -> Iterator[str]:
+        """Holds self.lock until exhausted or closed."""
+        llm = self._get(path)
+        with self.lock, self._drafting(llm, draft):
+            self._prepare_kv_state(path, llm, prompt, cache_prefix)
+            for chunk in llm(
+                prompt,
+                max_tokens=max_tokens,
+                stop=stop,
+                echo=False,
+                stream=True,
+                grammar=self._grammar(grammar)
+            ):
+                text = chunk['choices'][0]['text']
+                if text:
+                    yield text
+
+    def stats(self) -> dict:
+        return {
+            "resident_models": list(self.pool),
+            "speculative": {mode: s.as_dict() for mode, s in self.draft_stats.items()},
+        }
+
+class OpenAIHTTPBackend(BaseBackend):
+    """A local OpenAI-compatible completion server (llama.cpp server, vLLM, LM Studio...).
+
+    Lets several assistant processes share one loaded model. Uses one pooled keep-alive
+    session and server-sent-event streaming. Model paths are sent as the server-side
+    model id (file name without extension).
+    """
+    name = "http"
+    supports_batch = True
+
+    def __init__(self, base_url=None, api_key=None, slots=None, timeout=None):
+        self.base_url = (base_url or os.environ.get('JARVIS_LLM_URL', 'http://127.0.0.1:8080/v1')).rstrip('/')
+        self.api_key = api_key or os.environ.get('JARVIS_LLM_API_KEY')
+        self.slots = int(slots or os.environ.get('JARVIS_LLM_SLOTS', 4))
+        self.timeout = float(timeout or os.environ.get('JARVIS_LLM_TIMEOUT', 300))
+        # Server-specific fields merged into every request; cache_prompt keeps llama.cpp
+        # server's KV cache for the shared prompt prefix between calls.
+        self.extra_body = json.loads(os.environ.get('JARVIS_LLM_EXTRA_BODY', '{"cache_prompt": true}'))
+        self.session = None
+        self.reachable = False
+        self.lock = threading.Lock()
+        if requests is not None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.slots)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            if self.api_key:
+                self.session.headers['Authorization'] = f"Bearer {self.api_key}"
+
+    def unavailable_reason(self):
+        if requests is None:
+            return "System Error: the 'requests' package is required for the HTTP LLM backend."
+        return None
+
+    @staticmethod
+    def model_id(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def load(self, path: str) -> bool:
+        """The server owns the model; just check it is reachable."""
+        if self.session is None:
+            return False
+        if self.reachable:
+            return True
+        try:
+            resp = self.session.get(f"{self.base_url}/models", timeout=5)
+            resp.raise_for_status()
+            with self.lock:
+                self.reachable = True
+            return True
+        except Exception as e:
+            logging.error(f"LLM server not reachable at {self.base_url}: {e}")
+            return False
+
+    def is_loaded(self, path: str) -> bool:
+        return self.reachable
+
+    def warm_up(self, path: str):
+        self.complete(path, "Hello", None, 1)
+
+    def context_size(self, path: str) -> int:
+        return int(os.environ.get('JARVIS_LLM_N_CTX', DEFAULT_PARAMS["n_ctx"]))
+
+    def count_tokens(self, path: str, text: str):
+        # llama.cpp server exposes /tokenize next to /v1; other servers may not
+        root = self.base_url[:-3] if self.base_url.endswith('/v1') else self.base_url
+        try:
+            resp = self.session.post(f"{root}/tokenize", json={"content": text}, timeout=5)
+            resp.raise_for_status()
+            return len(resp.json()["tokens"])
+        except Exception:
+            return None
+
+    def _payload(self, path, prompt, stop, max_tokens, stream, grammar=None):
+        payload = dict(self.extra_body)
+        payload.update({
+            "model": self.model_id(path),
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "stop": stop,
+            "stream": stream,
+        })
+        # llama.cpp server field names; servers without grammar support ignore them
+        if isinstance(grammar, str):
+            payload["grammar"] = grammar
+        elif grammar is not None:
+            payload["json_schema"] = grammar
+        return payload
+
+    def complete(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None) -> str:
+        # cache_prefix/draft: prompt caching and speculative decoding are the server's job
+        resp = self.session.post(f"{self.base_url}/completions",
+                                 json=self._payload(path, prompt, stop, max_tokens, False, grammar),
+                                 timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()['choices'][0]['text']
+
+    def complete_batch(self, path, prompts, stop, max_tokens, grammar=None):
+        # The completions API takes a prompt list; the server decodes the sequences together
+        resp = self.session.post(f"{self.base_url}/completions",
+                                 json=self._payload(path, list(prompts), stop, max_tokens, False, grammar),
+                                 timeout=self.timeout)
+        resp.raise_for_status()
+        texts = [""] * len(prompts)
+        for choice in resp.json()['choices']:
+            texts[choice.get('index', 0)] = choice['text']
+        return texts
+
+    def stream(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None) -> Iterator[str]:
+        with self.session.post(f"{self.base_url}/completions",
+                               json=self._payload(path, prompt, stop, max_tokens, True, grammar),
+                               timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                text = json.loads(data)['choices'][0].get('text', '')
+                if text:
+                    yield text
+
+    def stats(self) -> dict:
+        return {"url": self.base_url, "reachable": self.reachable, "slots": self.slots}
+
+class StubBackend(BaseBackend):
+    """Deterministic canned completions for tests and benchmarks; no model needed.
+
+    The reply depends only on the prompt. Optional delays simulate prompt evaluation
+    and decoding speed (JARVIS_STUB_PROMPT_TPS / JARVIS_STUB_GEN_TPS, 0 = instant).
+    """
+    name = "stub"
+
+    def __init__(self, prompt_tps=None, gen_tps=None, reply=None):
+        self.prompt_tps = float(prompt_tps or os.environ.get('JARVIS_STUB_PROMPT_TPS', 0))
+        self.gen_tps = float(gen_tps or os.environ.get('JARVIS_STUB_GEN_TPS', 0))
+        self.reply = reply
+        self.slots = int(os.environ.get('JARVIS_LLM_SLOTS', 1))
+
+    def load(self, path: str) -> bool:
+        return True
+
+    def count_tokens(self, path: str, text: str):
+        return len(text) // 4 + 1
+
+    def _reply(self, prompt: str) -> str:
+        if self.reply is not None:
+            return self.reply
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        lines = [l for l in prompt.splitlines() if l.strip() and not l.startswith("<|im_")]
+        last = lines[-1] if lines else ""
+        return f"Stub response {digest}. I received {len(prompt)} characters ending with: {last[:60]}"
+
+    def _words(self, prompt, max_tokens):
+        if self.prompt_tps:
+            time.sleep(self.count_tokens(None, prompt) / self.prompt_tps)
+        words = self._reply(prompt).split(" ")[:max_tokens]
+        for i, word in enumerate(words):
+            if self.gen_tps:
+                time.sleep(1.0 / self.gen_tps)
+            yield word if i == 0 else " " + word
+
+    # grammar is accepted and ignored: stub replies are plain text
+
+    def complete(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None) -> str:
+        return "".join(self._words(prompt, max_tokens))
+
+    def stream(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None) -> Iterator[str]:
+        yield from self._words(prompt, max_tokens)
+
+BACKENDS = {
+    "llama": LlamaCppBackend,
+    "http": OpenAIHTTPBackend,
+    "stub": StubBackend,
+}
+
+def create_backend(name=None) -> BaseBackend:
+    """Backend by name, default from JARVIS_LLM_BACKEND (llama, http or stub)."""
+    name = name or os.environ.get('JARVIS_LLM_BACKEND', 'llama')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
@@ -0,0 +1,226 @@
+"""
+Headless replay benchmark for JarvisEngine.
+
+Replays an utterance corpus (by default the user turns in jarvis_memory.json) through
+handle_input with a null UI, no TTS and no microphone, one turn at a time, and reports
+p50/p95/p99 latency per turn and per traced stage plus overall turns/sec. Results are
+written as JSON so runs can be compared. The LLM is a timed stub unless a model is given.
+
+    python -m core.bench
+    python -m core.bench --stub-gen-tps 20 --output bench_results.json
+    python -m core.bench --backend llama --model D:\\models\\capybara\\capybarahermes-2.5-mistral-7b.Q5_0.gguf
+
+Replay runs against a copy of the memory file (JARVIS_MEMORY_BACKEND=sqlite migrates the
+copy into a fresh database). Skills with side effects on the machine
+(apps, shell commands, code execution, volume, browser, OCR, web research) are still
+routed to, but their handlers are replaced by a no-op that reports the input handled.
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import logging
+import tempfile
+import platform
+
+from core import tracing
+
+DEFAULT_OUTPUT = "bench_results.json"
+
+SIDE_EFFECT_SKILLS = ("AppControl", "AutomationSkill", "DevMode", "ResearchSkill", "Search",
+                      "SystemControl", "VisionSkill")
+
+SKIPPED_UTTERANCES = ("exit", "quit", "shutdown")
+
+def percentiles(values) -> dict:
+    """count, mean, p50/p95/p99 and max of a list of milliseconds (nearest-rank)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    def rank(p):
+        return ordered[max(1, math.ceil(p / 100.0 * len(ordered))) - 1]
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+def load_corpus(path: str):
+    """Utterances from a memory file (its user turns), a JSON list or a text file (one per line)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        data = raw.splitlines()
+    if isinstance(data, dict):
+        data = [item["content"] for item in data.get("history", []) if item.get("role") == "user"]
+    utterances = [str(u).strip() for u in data]
+    return [u for u in utterances if u and u.lower() not in SKIPPED_UTTERANCES]
+
+class Bench:
+    def __init__(self, corpus, memory_path="jarvis_memory.json", backend="stub", model=None,
+                 stub_prompt_tps=None, stub_gen_tps=None, allow_side_effects=False, turn_timeout=120.0):
+        self.corpus = corpus
+        self.memory_path = memory_path
+        self.backend = backend
+        self.model = model
+        self.stub_prompt_tps = stub_prompt_tps
+        self.stub_gen_tps = stub_gen_tps
+        self.allow_side_effects = allow_side_effects
+        self.turn_timeout = turn_timeout
+        self.workdir = None
+        self.engine = None
+
+    def setup(self):
+        from core.engine import JarvisEngine
+        from core.memory import create_memory, JOURNAL_SUFFIX, HISTORY_SUFFIX
+        from core.llm import LLMEngine
+        from core.backends import StubBackend
+        from core.ui import NullUI
+        from core.tts import NullTTS
+        from core.retrieval import RetrievalIndex
+
+        self.workdir = tempfile.mkdtemp(prefix="jarvis-bench-")
+        memory_copy = os.path.join(self.workdir, "jarvis_memory.json")
+        for suffix in ("", JOURNAL_SUFFIX):
+            if self.memory_path and os.path.exists(self.memory_path + suffix):
+                shutil.copy(self.memory_path + suffix, memory_copy + suffix)
+        if self.memory_path and os.path.isdir(self.memory_path + HISTORY_SUFFIX):
+            shutil.copytree(self.memory_path + HISTORY_SUFFIX, memory_copy + HISTORY_SUFFIX)
+
+        backend = StubBackend(self.stub_prompt_tps, self.stub_gen_tps) if self.backend == "stub" else self.backend
+        llm = LLMEngine(model_path=self.model, backend=backend)
+        memory = create_memory(memory_copy, db_path=os.path.join(self.workdir, "jarvis_memory.db"))
+        retrieval = RetrievalIndex(index_dir=os.path.join(self.workdir, "memory_index"))
+        self.engine = JarvisEngine(ui=NullUI(), tts=NullTTS(), llm=llm, memory=memory, voice=False,
+                                   retrieval=retrieval)
+
+        started = time.perf_counter()
+        self.engine.load(watch=False, wait=True)
+        self.load_seconds = time.perf_counter() - started
+        if not self.allow_side_effects:
+            for skill in self.engine.skill_manager.skills:
+                if skill.name in SIDE_EFFECT_SKILLS:
+                    skill.handle = lambda text: True
+        self.engine.retrieval.wait_ready(timeout=600)
+        if not llm.wait_until_ready(timeout=600):
+            logging.warning(f"Bench: LLM not ready ({llm.state}); LLM turns will measure the error path.")
+
+    def wait_idle(self, deadline: float) -> bool:
+        engine = self.engine
+        while time.perf_counter() < deadline:
+            if engine.pipeline.idle() and not engine.skill_manager.executor.busy():
+                return True
+            time.sleep(0.001)
+        return False
+
+    def run(self) -> dict:
+        self.setup()
+        tracing.enable()
+        tracing.clear()
+        turns = []
+        timeouts = 0
+        started = time.perf_counter()
+        for text in self.corpus:
+            turn = tracing.new_turn("bench")
+            t0 = time.perf_counter()
+            self.engine.handle_input(text)
+            if not self.wait_idle(t0 + self.turn_timeout):
+                timeouts += 1
+                logging.warning(f"Bench: turn {turn} ({text!r}) did not finish in {self.turn_timeout:g}s.")
+            turns.append((turn, text, (time.perf_counter() - t0) * 1000))
+        elapsed = time.perf_counter() - started
+        return self.report(turns, elapsed, timeouts)
+
+    def report(self, turns, elapsed, timeouts) -> dict:
+        stages = {}
+        llm_turns = set()
+        for event in tracing.events():
+            if event.get("ph") != "X":
+                continue
+            stages.setdefault(event["name"], []).append(event["dur"] / 1000.0)
+            if event["name"] == "llm":
+                llm_turns.add(event.get("args", {}).get("turn"))
+
+        by_path = {"llm": [], "skill": []}
+        for turn, _, ms in turns:
+            by_path["llm" if turn in llm_turns else "skill"].append(ms)
+
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "backend": self.engine.llm.backend.name,
+            "model": self.model,
+            "side_effect_skills": "enabled" if self.allow_side_effects else "no-op",
+            "skill_load_seconds": round(self.load_seconds, 3),
+            "turns": len(turns),
+            "timeouts": timeouts,
+            "elapsed_seconds": round(elapsed, 3),
+            "turns_per_sec": round(len(turns) / elapsed, 3) if elapsed else 0.0,
+            "turn_ms": percentiles([ms for _, _, ms in turns]),
+            "turn_ms_by_path": {path: percentiles(values) for path, values in by_path.items()},
+            "stages_ms": {name: percentiles(values) for name, values in sorted(stages.items())},
+            "pipeline": self.engine.pipeline.stats(),
+        }
+
+    def close(self):
+        if self.engine:
+            self.engine.skill_manager.executor.shutdown()
+            self.engine.pipeline.stop()
+            self.engine.memory.close()
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay an utterance corpus through a headless JarvisEngine and report latencies.")
+    parser.add_argument("--corpus", default="jarvis_memory.json",
+                        help="Memory file (its user turns), JSON list or text file with one utterance per line")
+    parser.add_argument("--memory", default="jarvis_memory.json", help="Memory file the replay starts from (copied, never modified)")
+    parser.add_argument("--backend", default="stub", choices=["stub", "llama", "http"])
+    parser.add_argument("--model", default=None, help="GGUF path for the llama backend")
+    parser.add_argument("--stub-prompt-tps", type=float, default=None, help="Simulated prompt-eval speed (tokens/s)")
+    parser.add_argument("--stub-gen-tps", type=float, default=None, help="Simulated decode speed (words/s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the corpus this many times")
+    parser.add_argument("--allow-side-effects", action="store_true", help="Run every skill for real")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--trace", default=None, help="Also write a Chrome trace of the run to this path")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.corpus):
+        print(f"Corpus missing: {args.corpus}")
+        return 1
+    corpus = load_corpus(args.corpus) * max(1, args.repeat)
+    if not corpus:
+        print(f"No utterances in {args.corpus}")
+        return 1
+
+    bench = Bench(corpus, memory_path=args.memory, backend=args.backend, model=args.model,
+                  stub_prompt_tps=args.stub_prompt_tps, stub_gen_tps=args.stub_gen_tps,
+                  allow_side_effects=args.allow_side_effects)
+    try:
+        results = bench.run()
+        if args.trace:
+            tracing.export(args.trace)
+    finally:
+        bench.close()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    turn = results["turn_ms"]
+    print(f"{results['turns']} turns in {results['elapsed_seconds']}s ({results['turns_per_sec']} turns/s), "
+          f"turn p50 {turn.get('p50')} ms, p95 {turn.get('p95')} ms, p99 {turn.get('p99')} ms")
+    for name, stats in results["stages_ms"].items():
+        print(f"  {name:<28} n={stats['count']:<5} p50 {stats['p50']:>9} ms  p95 {stats['p95']:>9} ms  p99 {stats['p99']:>9} ms")
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
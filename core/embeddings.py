@@ -0,0 +1,80 @@
+import os
+import re
+import zlib
+import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except Exception:
+    SentenceTransformer = None
+
+DEFAULT_EMBED_MODEL = "all-MiniLM-L6-v2"
+
+_WORDS = re.compile(r"[a-z0-9']+")
+
+class HashingEmbedder:
+    """Dependency-free sentence vectors: hashed word unigrams/bigrams and character
+    trigrams, L2-normalized. Catches rewordings that share stems ("screen" / "display
+    screen") but not pure synonyms; install sentence-transformers for those."""
+    name = "hashing-v1"
+    # Shared function words alone ("what is my name" / "what is your name") score ~0.6
+    threshold = 0.65
+    margin = 0.1
+    paraphrases = False # Word overlap isn't meaning: route on canonical commands only
+    retrieval_threshold = 0.15 # Questions share few features with the facts that answer them
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = _WORDS.findall(text.lower())
+        feats = list(words)
+        feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return feats
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = zlib.crc32(feat.encode('utf-8'))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-9)
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (JARVIS_EMBED_MODEL), loaded on first use."""
+    threshold = 0.62
+    margin = 0.05
+    paraphrases = True
+    retrieval_threshold = 0.35
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name or os.environ.get('JARVIS_EMBED_MODEL', DEFAULT_EMBED_MODEL)
+        self.name = f"st:{self.model_name}"
+        self.model = None
+        self.lock = threading.Lock()
+
+    def encode(self, texts):
+        with self.lock:
+            if self.model is None:
+                self.model = SentenceTransformer(self.model_name)
+        vectors = self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+def get_embedder():
+    """Best available embedder, or None without numpy."""
+    if np is None:
+        logging.warning("numpy is missing; semantic intent routing and memory retrieval are disabled.")
+        return None
+    if SentenceTransformer is not None and os.environ.get('JARVIS_EMBED_MODEL', DEFAULT_EMBED_MODEL) != "hashing":
+        return SentenceTransformerEmbedder()
+    return HashingEmbedder()
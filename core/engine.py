@@ -1,42 +1,87 @@
-import threading
+import itertools
 import time
 import logging
 from typing import Optional
 
-from core.memory import Memory
+from core.memory import create_memory
 from core.llm import LLMEngine
+from core.prompt import PromptBuilder
 from core.ui import BaseUI, ConsoleUI, TkinterUI
 from core.skills import SkillManager, SkillContext
+from core.intent import IntentRouter
+from core.retrieval import RetrievalIndex
 from core.voice import VoiceManager
-from core.tts import TTSManager
+from core.tts import TTSManager, SentenceBuffer
+from core import tracing
+from core.pipeline import Pipeline, OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT
 
 try:
     import pyttsx3
 except ImportError:
     pyttsx3 = None
 
+SYSTEM_PROMPT = "<|im_start|>system\nYou are J.A.R.V.I.S, an advanced enterprise-grade AI assistant. You can see the screen, browse the internet, and control the system. You are helpful, precise, witty, and highly capable. You answer directly and efficiently.\n<|im_end|>"
+
+HISTORY_WINDOW = 50     # Items considered; PromptBuilder keeps the newest that fit its budget
+REPLY_MAX_TOKENS = 1024
+RETRIEVAL_TOP_K = 8     # Snippets offered to PromptBuilder; it keeps what fits its budget
+CANCEL_PHRASES = ("cancel that", "stop that", "never mind", "nevermind")
+# Handled by the memory heuristics in _run_llm; kept away from the intent router
+MEMORY_PHRASES = ("my name", "i am your boss", "i'm your boss", "who am i", "remember that")
+SHUTDOWN_SPEECH_TIMEOUT = 10.0 # Seconds shutdown waits for queued speech to finish
+
 class JarvisEngine:
-    def __init__(self):
-        self.memory = Memory()
-        self.llm = LLMEngine()
+    def __init__(self, ui=None, tts=None, llm=None, memory=None, voice=True, retrieval=None):
+        """Components can be injected (headless runs, benchmarks: see core.bench).
+        voice: True builds the microphone VoiceManager, False/None runs without voice."""
+        self.memory = memory or create_memory()
+        self.llm = llm or LLMEngine()
+        self.prompt_builder = PromptBuilder(self.llm)
+        self.retrieval = retrieval or RetrievalIndex()
+        self.retrieval.start(self.memory)
         
         # Initialize UI - prefers Tkinter, falls back to Console
         # We need a callback for when the user hits 'Send'
-        try:
-            self.ui = TkinterUI(self.handle_input)
-        except Exception:
-            logging.warning("Tkinter UI failed to initialize, falling back to Console")
-            self.ui = ConsoleUI()
+        self.ui = ui
+        if self.ui is None:
+            try:
+                self.ui = TkinterUI(self.handle_input)
+            except Exception:
+                logging.warning("Tkinter UI failed to initialize, falling back to Console")
+                self.ui = ConsoleUI()
+
+        # Start loading the model now so the first question doesn't pay for it
+        self.llm.add_state_listener(self._on_llm_state)
+        self.llm.warm_up_async()
 
         self.context = SkillContext(self)
         self.skill_manager = SkillManager(self.context)
+        self.intent_router = IntentRouter()
         
         self.voice_manager = None # placeholder
-        self.tts = TTSManager()
+        self.tts = tts or TTSManager(threaded=False)
         
-        self.voice_manager = VoiceManager(self)
+        self.voice_manager = VoiceManager(self) if voice is True else (voice or None)
+
+        # One worker per stage: each stage takes items in the order they were queued.
+        # Turns are not globally ordered, though: skills run on the skill executor and
+        # unhandled ones reach the llm stage later, so a quicker later turn can answer first.
+        # tts blocks its producers (the llm stage, skills) when full; dropping would cut
+        # sentences out of the middle of a reply.
+        self.pipeline = Pipeline()
+        self.pipeline.add_stage("asr", self._recognize, maxsize=3, overflow=OVERFLOW_DROP_OLDEST)
+        self.pipeline.add_stage("route", self._route, maxsize=8, overflow=OVERFLOW_REJECT)
+        self.pipeline.add_stage("llm", self._run_llm, maxsize=4, overflow=OVERFLOW_BLOCK)
+        self.pipeline.add_stage("tts", self.tts.say, maxsize=64, overflow=OVERFLOW_BLOCK)
+        self.pipeline.start()
         self.running = True
 
+    def _on_llm_state(self, state):
+        if state == "ready":
+            self.ui.set_status("AI core ready.")
+        else:
+            self.ui.set_status(f"AI core {state}...")
+
     def _on_speech_start(self):
         if self.voice_manager:
             self.voice_manager.pause()
@@ -47,14 +92,26 @@ class JarvisEngine:
 
 
 
+    def load(self, watch=True, wait=False):
+        """Loads skills and the intent index. wait: build the index before returning."""
+        self.skill_manager.load_skills()
+        if wait:
+            self.intent_router.build(self.skill_manager.skills)
+        else:
+            self.intent_router.build_async(self.skill_manager.skills)
+        if watch:
+            self.skill_manager.add_reload_listener(self.intent_router.build_async)
+            self.skill_manager.start_watching()
+
     def start(self):
         logging.info("Jarvis Engine Starting...")
-        self.skill_manager.load_skills()
+        self.load()
         self.ui.display_message("System Online. skills loaded.", "SYSTEM")
         self.speak("System Online.")
         
         # Start Voice Listener
-        self.voice_manager.start_listening()
+        if self.voice_manager:
+            self.voice_manager.start_listening()
 
         # Start the UI (blocking for Tkinter)
         # For Console, we need a loop
@@ -62,6 +119,7 @@ class JarvisEngine:
             while self.running:
                 user_text = self.ui.get_input()
                 if user_text:
+                    tracing.new_turn("console")
                     self.handle_input(user_text)
         else:
             self.ui.start()
@@ -72,7 +130,24 @@ class JarvisEngine:
             return
 
         self.ui.display_message(text, "You")
-        
+
+        # Cancelling must not wait behind the requests it is meant to stop
+        if text.lower().strip(" .!") in CANCEL_PHRASES and self.skill_manager.executor.busy():
+            self.skill_manager.executor.cancel_all()
+            return
+
+        # Never blocks the caller (UI thread): a full routing queue refuses the request
+        if not self.pipeline.submit("route", text):
+            self.ui.display_message("I'm still working through your earlier requests. Please try again in a moment.", "SYSTEM")
+
+    def _recognize(self, audio):
+        # Pipeline "asr" stage
+        command = self.voice_manager.recognize(audio) if self.voice_manager else None
+        if command:
+            self.handle_input(command)
+
+    def _route(self, text: str):
+        # Pipeline "route" stage
         # 1. Check learned commands
         learned_action = self.memory.get_learned_command(text)
         if learned_action:
@@ -80,33 +155,60 @@ class JarvisEngine:
             # Recursively handle the learned action text
             # CAUTION: prevent infinite loops
             if learned_action != text:
-                self.handle_input(learned_action)
+                self._route(learned_action)
             return
 
-        # 2. Check Skills
+        # 2. Check Skills. Routing is cheap and happens here; the skills themselves run
+        #    on the skill executor so this stage moves on to the next request.
         print(f"DEBUG: Checking skills for: '{text}'")
-        if self.skill_manager.process(text):
+        with tracing.span("route triggers"):
+            candidates = self.skill_manager.candidates(text)
+        if self._submit_skills(text, candidates, lambda: self._route_fallback(text)):
             return
+        self._route_fallback(text)
+
+    def _submit_skills(self, command, candidates, on_unhandled) -> bool:
+        if not candidates:
+            return False
+        self.ui.set_status(f"Working on it ({candidates[0].name})...")
+        return self.skill_manager.submit(command, candidates, on_unhandled=on_unhandled,
+                                         on_done=self._on_skill_done)
 
+    def _on_skill_done(self, task):
+        self.ui.set_status("")
+
+    def _route_fallback(self, text):
+        # 2b. Paraphrased commands ("bump the sound") route by meaning instead of costing a generation
+        if any(phrase in text.lower() for phrase in MEMORY_PHRASES):
+            self._start_llm(text)
+            return
+        with tracing.span("route intent"):
+            match = self.intent_router.route(text)
+        if match and self._submit_skills(match.utterance, [match.skill], lambda: self._start_llm(text)):
+            return
+        self._start_llm(text)
+
+    def _start_llm(self, text):
         # 3. Fallback to LLM
-        self.ui.set_status("Thinking...")
-        
-        # Construct prompt with history
-        history = self.memory.get_recent_history()
-        prompt_lines = [
-            f"<|im_start|>system\nYou are J.A.R.V.I.S, an advanced enterprise-grade AI assistant. You can see the screen, browse the internet, and control the system. You are helpful, precise, witty, and highly capable. You answer directly and efficiently.\n<|im_end|>"
-        ]
-        for item in history:
-            role = "user" if item['role'] == "user" else "assistant"
-            prompt_lines.append(f"<|im_start|>{role}\n{item['content']}\n<|im_end|>")
-        
-        prompt_lines.append(f"<|im_start|>user\n{text}\n<|im_end|>\n<|im_start|>assistant\n")
-        full_prompt = "\n".join(prompt_lines)
+        if self.llm.is_ready():
+            self.ui.set_status("Thinking...")
+        else:
+            self.ui.set_status("Thinking... (waiting for AI core to finish loading)")
 
-        # Run LLM in separate thread to not block UI
-        threading.Thread(target=self._run_llm, args=(full_prompt, text)).start()
+        # Queue for the LLM stage; waits while it is full, which holds back routing
+        self.pipeline.submit("llm", text)
 
-    def _run_llm(self, prompt, original_user_text):
+    def _build_prompt(self, text):
+        # Construct prompt with as much recent history as the token budget allows
+        with tracing.span("retrieval"):
+            snippets = self.retrieval.search(text, k=RETRIEVAL_TOP_K)
+        with tracing.span("prompt build"):
+            history = self.memory.get_recent_history(limit=HISTORY_WINDOW)
+            return self.prompt_builder.build(SYSTEM_PROMPT, history, text, max_tokens=REPLY_MAX_TOKENS,
+                                             n_ctx=self.llm.context_size(), snippets=snippets)
+
+    def _run_llm(self, original_user_text):
+        # Pipeline "llm" stage
         # 4. Smart Regex/Heuristics (Run BEFORE or INSTEAD of broken LLM)
         #    This ensures Jarvis works even if the model is missing.
         lower_text = original_user_text.lower()
@@ -154,11 +256,12 @@ class JarvisEngine:
             self.memory.add_history_item("assistant", response)
             return
 
-        # 5. LLM Attempt
-        response = self.llm.generate(prompt)
+        # 5. LLM Attempt (streamed: text goes to the UI as it arrives, sentences to TTS as they complete)
+        response = self._stream_llm(self._build_prompt(original_user_text))
         
         # Check for error message from LLM engine
-        if "System Error:" in response or "Error:" in response:
+        if response is None or "System Error:" in response or response.startswith("Error"):
+            response = response or "Error: Empty response from model."
             logging.error(f"LLM FAILURE RESPONSE: {response}")
             # Fallback chat logic if LLM is broken
             if "hello" in lower_text or "hi" in lower_text:
@@ -173,15 +276,52 @@ class JarvisEngine:
                 fallback = f"My AI system reported: {response}. I can still run commands."
             
             response = fallback
-
-        self.ui.set_status("")
-        self.ui.display_message(response, "JARVIS")
-        self.speak(response)
+            self.ui.set_status("")
+            self.ui.display_message(response, "JARVIS")
+            self.speak(response)
         
         # Save history
         self.memory.add_history_item("user", original_user_text)
         self.memory.add_history_item("assistant", response)
 
+    def _stream_llm(self, prompt):
+        """Streams a completion to the UI and TTS. Returns the full text, the engine's
+        error string if generation could not start (nothing is displayed), or None if empty."""
+        stream = self.llm.generate_stream(prompt, max_tokens=REPLY_MAX_TOKENS, cache_prefix=SYSTEM_PROMPT,
+                                          priority="interactive", caller="chat")
+        first = next(stream, None)
+        if first is None or first.startswith("System Error:") or first.startswith("Error:"):
+            stream.close()
+            return first
+
+        self.ui.set_status("")
+        sentences = SentenceBuffer()
+        parts = []
+        tail = ""
+        in_code = False
+        for chunk in itertools.chain([first.lstrip()], stream):
+            parts.append(chunk)
+            self.ui.stream_message(chunk, "JARVIS")
+            if in_code:
+                continue
+            tail = (tail + chunk)[-8:]
+            if "```" in tail:
+                # Code is not read aloud; finish the lead-in and announce the code at the end
+                in_code = True
+                self.speak(sentences.flush())
+                continue
+            for sentence in sentences.feed(chunk):
+                self.speak(sentence)
+        self.ui.end_stream("JARVIS")
+
+        if in_code:
+            self.speak("I have generated the code for you.")
+        else:
+            self.speak(sentences.flush())
+
+        response = "".join(parts).strip()
+        return response or None
+
     def speak(self, text: str):
         if not text: 
             return
@@ -192,14 +332,21 @@ class JarvisEngine:
             clean_text = "I have generated the code for you."
             
         if self.tts:
-             self.tts.speak(clean_text)
+             self.pipeline.submit("tts", clean_text)
 
     def shutdown(self):
         self.running = False
-        self.voice_manager.stop_listening()
-        self.tts.stop()
+        if self.voice_manager:
+            self.voice_manager.stop_listening()
+        self.skill_manager.stop_watching()
+        self.skill_manager.executor.shutdown()
+        # Speak while the pipeline still runs; a blocking submit to a stopped loop never returns
         self.speak("Shutting down.")
-        self.memory.save()
+        if not self.pipeline.drain("tts", timeout=SHUTDOWN_SPEECH_TIMEOUT):
+            logging.warning("Shutdown: speech still queued, stopping anyway.")
+        self.pipeline.stop()
+        self.tts.stop()
+        self.memory.close()
         if isinstance(self.ui, TkinterUI):
             self.ui.root.quit()
         exit(0)
@@ -0,0 +1,183 @@
+import os
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import tracing
+
+DEFAULT_SKILL_TIMEOUT = 60.0
+
+class SkillCancelled(BaseException):
+    """Raised inside a skill by CancellationToken.check() once it was cancelled. A
+    BaseException, like asyncio.CancelledError, so skills' `except Exception` blocks
+    don't swallow it."""
+    pass
+
+class CancellationToken:
+    """Cooperative cancellation for one skill run. Threads can't be killed, so long
+    skills call check() (or test .cancelled) between steps."""
+    def __init__(self):
+        self.event = threading.Event()
+        self.reason = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        if not self.event.is_set():
+            self.reason = reason
+            self.event.set()
+
+    def check(self):
+        if self.event.is_set():
+            raise SkillCancelled(self.reason)
+
+_local = threading.local()
+
+def current_token():
+    """Token of the skill task running on this thread, or None outside the executor."""
+    return getattr(_local, 'token', None)
+
+class SkillTask:
+    """One submitted unit of skill work. status: queued, running, done, failed,
+    cancelled or timeout."""
+    def __init__(self, name: str, timeout: float, on_done=None):
+        self.name = name
+        self.timeout = timeout
+        self.on_done = on_done
+        self.token = CancellationToken()
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+        self.future = None
+        self.turn = tracing.current_turn()
+
+    def _finish(self, status, result=None, error=None) -> bool:
+        """Records the outcome once; later outcomes (a timed-out task that returns) are ignored."""
+        with self.lock:
+            if self.finished is not None:
+                return False
+            self.status, self.result, self.error = status, result, error
+            self.finished = time.time()
+        if self.on_done:
+            try:
+                self.on_done(self)
+            except Exception as e:
+                logging.error(f"Skill task callback failed for {self.name}: {e}")
+        return True
+
+    def __repr__(self):
+        return f"SkillTask({self.name}, {self.status})"
+
+class SkillExecutor:
+    """Bounded worker pool for skill execution, off the UI thread.
+
+    At most `max_workers` skills run at once and at most `max_pending` tasks wait;
+    submit() returns None when full instead of queueing without bound. Each task gets
+    a deadline from its timeout; one watchdog thread cancels overdue tasks and reports
+    them as "timeout" through the task's on_done callback. A timed-out task still
+    occupies its worker until the skill returns, so it keeps counting towards the
+    limits (and busy()) until then.
+    """
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = int(max_workers or os.environ.get('JARVIS_SKILL_WORKERS', 4))
+        self.max_pending = int(max_pending or self.max_workers * 4)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="skill")
+        self.cond = threading.Condition()
+        self.active = set()
+        self.deadlines = [] # heap of (deadline, seq, task)
+        self.seq = 0
+        self.running = True
+        self.watchdog = threading.Thread(target=self._watch, daemon=True, name="skill-watchdog")
+        self.watchdog.start()
+
+    def submit(self, name: str, fn, timeout=DEFAULT_SKILL_TIMEOUT, on_done=None):
+        """Runs fn() on the pool. Returns the SkillTask, or None if the queue is full."""
+        task = SkillTask(name, timeout, on_done)
+        with self.cond:
+            if not self.running or len(self.active) >= self.max_workers + self.max_pending:
+                logging.warning(f"Skill executor full, rejected {name}.")
+                return None
+            self.active.add(task)
+        task.future = self.pool.submit(self._run, task, fn)
+        return task
+
+    def _run(self, task: SkillTask, fn):
+        if task.token.cancelled:
+            self._finish(task, "cancelled")
+            return
+        task.started = time.time()
+        task.status = "running"
+        if task.timeout:
+            with self.cond:
+                self.seq += 1
+                heapq.heappush(self.deadlines, (task.started + task.timeout, self.seq, task))
+                self.cond.notify()
+        _local.token = task.token
+        tracing.set_turn(task.turn)
+        try:
+            result = fn()
+            self._finish(task, "cancelled" if task.token.cancelled else "done", result)
+        except SkillCancelled:
+            self._finish(task, "cancelled")
+        except Exception as e:
+            logging.error(f"Skill task {task.name} failed: {e}")
+            self._finish(task, "failed", error=e)
+        finally:
+            _local.token = None
+            tracing.set_turn(None)
+
+    def _finish(self, task, status, result=None, error=None):
+        # Callbacks run first, so work they queue (the LLM fallback) is visible before
+        # the task stops counting as busy
+        task._finish(status, result, error)
+        with self.cond:
+            self.active.discard(task)
+
+    def _watch(self):
+        while True:
+            expired = []
+            with self.cond:
+                if not self.running:
+                    return
+                now = time.time()
+                while self.deadlines and (self.deadlines[0][0] <= now or self.deadlines[0][2].finished):
+                    deadline, _, task = heapq.heappop(self.deadlines)
+                    if task.finished is None and deadline <= now:
+                        expired.append(task)
+                if not expired:
+                    self.cond.wait(self.deadlines[0][0] - now if self.deadlines else None)
+                    continue
+            # The worker thread keeps running until the skill checks its token
+            for task in expired:
+                task.token.cancel("timeout")
+                logging.warning(f"Skill task {task.name} timed out after {task.timeout:g}s.")
+                task._finish("timeout")
+
+    def cancel_all(self, reason="cancelled") -> int:
+        """Cancels every queued or running task. Returns how many were active."""
+        with self.cond:
+            tasks = list(self.active)
+        for task in tasks:
+            task.token.cancel(reason)
+            if task.future is not None and task.future.cancel():
+                self._finish(task, "cancelled")
+        return len(tasks)
+
+    def busy(self) -> int:
+        with self.cond:
+            return len(self.active)
+
+    def shutdown(self, wait=False):
+        self.cancel_all("shutdown")
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,15 @@
+"""
+Output grammars (llama.cpp GBNF) for skills that need structured replies.
+
+Pass one as LLMEngine.generate(..., grammar=...) together with an intent so decoding
+stops at the first complete match instead of running on to max_tokens. A JSON schema
+(dict) can be passed as json_schema=... instead.
+"""
+
+# One PowerShell command on a single line, no markdown; the newline completes the
+# grammar so generation ends there. "#Impossible" is still expressible.
+SHELL_COMMAND_GBNF = r'''
+root ::= [ \t]* command "\n"
+command ::= [^`\r\n \t] [^`\r\n]*
+'''
+
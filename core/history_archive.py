@@ -0,0 +1,158 @@
+"""
+Compressed, indexed archive of conversation history.
+
+Memory keeps the newest messages in RAM and moves older ones here in immutable
+segments of SEGMENT_SIZE messages under <memory file>.history/: gzip'd JSON lines,
+each with a gzip'd keyword index (term -> message offsets) beside it. manifest.json
+lists the segments with their sequence and time ranges; it is the only file read at
+startup and the commit point of an append, so a crash mid-append leaves at most an
+unlisted segment that the next append overwrites. Keyword indexes are loaded on the
+first query that reaches their segment and kept in a small LRU cache.
+"""
+import os
+import re
+import gzip
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+SEGMENT_SIZE = 256       # Messages per segment
+INDEX_CACHE_SIZE = 32    # Keyword indexes kept in RAM
+
+STOPWORDS = frozenset("""a an and are as at be but by can do does for from how i in is it me my of on or
+please so that the this to was what when where which who why will with you your""".split())
+
+_WORDS = re.compile(r"\w+")
+
+def keywords(text: str):
+    """Distinct lowercase words of `text` without stopwords, in order."""
+    return list(dict.fromkeys(w for w in _WORDS.findall(text.lower()) if w not in STOPWORDS))
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class HistoryArchive:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.segments = []  # Manifest entries, oldest first; replaced, never mutated
+        self.last_seq = None  # seq of the newest archived message
+        self.lock = threading.Lock() # Guards the index cache
+        self._indexes = OrderedDict() # segment name -> {term: [offsets]}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                self.segments = manifest["segments"]
+                self.last_seq = manifest["last_seq"]
+            except Exception as e:
+                logging.error(f"Failed to load history archive manifest: {e}")
+
+    def __len__(self):
+        return sum(segment["count"] for segment in self.segments)
+
+    def archived(self, seq) -> bool:
+        """True if the message with this seq is already in the archive."""
+        return self.last_seq is not None and seq <= self.last_seq
+
+    def append(self, items):
+        """Writes messages ({"role", "content", "ts", "seq"}, oldest first) as a new
+        segment. Messages that are already archived are skipped."""
+        items = [item for item in items if not self.archived(item["seq"])]
+        if not items:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"segment-{len(self.segments):06d}"
+        index = {}
+        for offset, item in enumerate(items):
+            for term in keywords(item["content"]):
+                index.setdefault(term, []).append(offset)
+        lines = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+        _write_atomic(os.path.join(self.directory, name + '.jsonl.gz'), gzip.compress(lines.encode('utf-8')))
+        _write_atomic(os.path.join(self.directory, name + '.index.json.gz'),
+                      gzip.compress(json.dumps(index, ensure_ascii=False).encode('utf-8')))
+
+        stamps = [item["ts"] for item in items if item.get("ts") is not None]
+        segment = {"name": name, "count": len(items), "first_seq": items[0]["seq"], "last_seq": items[-1]["seq"],
+                   "start_ts": min(stamps) if stamps else None, "end_ts": max(stamps) if stamps else None}
+        segments = self.segments + [segment]
+        manifest = {"last_seq": segment["last_seq"], "segments": segments}
+        _write_atomic(self.manifest_path, json.dumps(manifest, indent=1).encode('utf-8'))
+        self.segments = segments
+        self.last_seq = segment["last_seq"]
+        with self.lock:
+            self._indexes[name] = index
+            self._trim_cache()
+
+    def _trim_cache(self):
+        while len(self._indexes) > INDEX_CACHE_SIZE:
+            self._indexes.popitem(last=False)
+
+    def _read(self, segment):
+        with open(os.path.join(self.directory, segment["name"] + '.jsonl.gz'), 'rb') as f:
+            return [json.loads(line) for line in gzip.decompress(f.read()).decode('utf-8').splitlines()]
+
+    def _index(self, segment) -> dict:
+        name = segment["name"]
+        with self.lock:
+            if name in self._indexes:
+                self._indexes.move_to_end(name)
+                return self._indexes[name]
+        with open(os.path.join(self.directory, name + '.index.json.gz'), 'rb') as f:
+            index = json.loads(gzip.decompress(f.read()).decode('utf-8'))
+        with self.lock:
+            self._indexes[name] = index
+            self._trim_cache()
+        return index
+
+    def iter_items(self, segments=None):
+        """Every archived message, oldest first, one segment in RAM at a time."""
+        for segment in (self.segments if segments is None else segments):
+            yield from self._read(segment)
+
+    def between(self, start: float, end: float, limit: int, after=None, segments=None):
+        """Up to `limit` messages with start <= ts < end and seq > after, oldest first."""
+        found = []
+        for segment in (self.segments if segments is None else segments):
+            if segment["start_ts"] is None or segment["end_ts"] < start or segment["start_ts"] >= end:
+                continue
+            if after is not None and segment["last_seq"] <= after:
+                continue
+            for item in self._read(segment):
+                ts = item.get("ts")
+                if ts is not None and start <= ts < end and (after is None or item["seq"] > after):
+                    found.append(item)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def mentioning(self, terms, limit: int, before=None, segments=None):
+        """Up to `limit` messages containing every term (see keywords()) with seq < before,
+        newest first. Segments whose index lacks a term are not decompressed."""
+        found = []
+        for segment in reversed(self.segments if segments is None else segments):
+            if before is not None and segment["first_seq"] >= before:
+                continue
+            index = self._index(segment)
+            offsets = None
+            for term in terms:
+                postings = set(index.get(term, ()))
+                offsets = postings if offsets is None else offsets & postings
+                if not offsets:
+                    break
+            if not offsets:
+                continue
+            items = self._read(segment)
+            for offset in sorted(offsets, reverse=True):
+                item = items[offset]
+                if before is None or item["seq"] < before:
+                    found.append(item)
+                    if len(found) >= limit:
+                        return found
+        return found
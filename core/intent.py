@@ -0,0 +1,158 @@
+"""
+Semantic intent router between the trigger-based skills and the LLM fallback.
+
+Skills list example utterances per canonical command:
+
+    examples = {
+        "volume up": ["bump the sound", "make it louder"],
+    }
+
+Each example (and the canonical command itself) is embedded once; an input whose
+nearest example is similar enough is handed to that skill as the canonical command,
+so "bump the sound" runs "volume up" without an LLM generation. Vectors are cached in
+intent_index/ and only new or changed examples are embedded on startup.
+
+Paraphrases are only indexed with an embedder that captures meaning (sentence-
+transformers). The hashing fallback scores word overlap, so "how much charge is left
+in a tesla" would match "how much charge is left"; with it only the canonical commands
+are indexed and match close rewordings ("turn the volume up"). Commands that are
+costly or change something (model switches, running code) should not list examples.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+from core.embeddings import get_embedder, np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'intent_index')
+
+class IntentMatch:
+    def __init__(self, skill, utterance: str, example: str, score: float):
+        self.skill = skill
+        self.utterance = utterance # Canonical command passed to skill.handle()
+        self.example = example
+        self.score = score
+
+    def __repr__(self):
+        return f"IntentMatch({self.skill.name}, {self.utterance!r}, {self.score:.2f})"
+
+class IntentRouter:
+    """Nearest-example routing over a normalized embedding matrix (cosine similarity)."""
+    def __init__(self, embedder=None, cache_dir=None, threshold=None, margin=None):
+        self.embedder = embedder if embedder is not None else get_embedder()
+        self.cache_dir = cache_dir or os.environ.get('JARVIS_INTENT_CACHE', DEFAULT_CACHE_DIR)
+        env_threshold = os.environ.get('JARVIS_INTENT_THRESHOLD')
+        self.threshold = float(threshold or env_threshold or getattr(self.embedder, 'threshold', 0.6))
+        # Best match must beat the best example of another command by this much
+        self.margin = margin if margin is not None else getattr(self.embedder, 'margin', 0.05)
+        self.lock = threading.Lock()
+        self.texts = [] # Example text per vector row
+        self.owners = [] # {(skill, canonical)} per vector row; an example may serve several
+        self.vectors = None # Memory-mapped from the cache file
+        self.ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.embedder is not None
+
+    def build_async(self, skills):
+        if not self.enabled:
+            return
+        threading.Thread(target=self.build, args=(skills,), daemon=True, name="intent-index").start()
+
+    def build(self, skills):
+        """(Re)builds the index from the skills' examples, embedding only uncached texts."""
+        if not self.enabled:
+            return
+        started = time.time()
+        use_paraphrases = getattr(self.embedder, 'paraphrases', True)
+        rows = []
+        for skill in skills:
+            for canonical, paraphrases in (getattr(skill, 'examples', None) or {}).items():
+                for example in [canonical] + (list(paraphrases) if use_paraphrases else []):
+                    rows.append((skill, canonical, example))
+        texts = sorted({example.lower() for _, _, example in rows})
+
+        try:
+            vectors, encoded = self._load_vectors(texts)
+        except Exception as e:
+            logging.error(f"Intent index build failed: {e}")
+            return
+        position = {text: i for i, text in enumerate(texts)}
+        owners = [set() for _ in texts]
+        for skill, canonical, example in rows:
+            owners[position[example.lower()]].add((skill, canonical))
+        with self.lock:
+            self.texts = texts
+            self.owners = owners
+            self.vectors = vectors if texts else None
+            self.ready = True
+        logging.info(f"Intent index: {len(rows)} examples from {len(skills)} skills "
+                     f"({encoded} embedded) in {time.time() - started:.2f}s.")
+
+    def _paths(self):
+        return os.path.join(self.cache_dir, 'vectors.npy'), os.path.join(self.cache_dir, 'index.json')
+
+    def _load_vectors(self, texts):
+        """Vectors for `texts` in order, reusing the on-disk cache. Returns (vectors, n_encoded)."""
+        if not texts:
+            return np.zeros((0, 1), dtype=np.float32), 0
+        vec_path, index_path = self._paths()
+        cached_texts, cached = [], None
+        if os.path.exists(vec_path) and os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                if meta.get("embedder") == self.embedder.name:
+                    cached_texts = meta["texts"]
+                    cached = np.load(vec_path, mmap_mode='r')
+            except Exception as e:
+                logging.warning(f"Intent cache unreadable, rebuilding: {e}")
+                cached_texts, cached = [], None
+
+        if cached is not None and cached_texts == texts:
+            return cached, 0
+
+        known = {text: i for i, text in enumerate(cached_texts)}
+        missing = [t for t in texts if t not in known]
+        fresh = self.embedder.encode(missing) if missing else None
+        fresh_pos = {text: i for i, text in enumerate(missing)}
+        dim = fresh.shape[1] if fresh is not None else cached.shape[1]
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i] = cached[known[text]] if text in known else fresh[fresh_pos[text]]
+        del cached # Release the mapping before replacing the file (Windows)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = vec_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, vectors)
+        os.replace(tmp, vec_path)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({"embedder": self.embedder.name, "texts": texts}, f)
+        os.replace(index_path + '.tmp', index_path)
+        return np.load(vec_path, mmap_mode='r'), len(missing)
+
+    def route(self, text: str):
+        """Returns an IntentMatch if `text` confidently matches a skill example, else None."""
+        with self.lock:
+            if not self.ready or self.vectors is None:
+                return None
+            texts, owners, vectors = self.texts, self.owners, self.vectors
+        query = self.embedder.encode([text])[0]
+        scores = vectors @ query
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold or len(owners[best]) > 1:
+            return None
+        target = next(iter(owners[best]))
+        skill, canonical = target
+        example = texts[best]
+        rivals = [float(s) for s, owner in zip(scores, owners) if owner != {target}]
+        if rivals and score - max(rivals) < self.margin:
+            logging.debug(f"Intent router: '{text}' is ambiguous ({canonical!r} {score:.2f})")
+            return None
+        logging.info(f"Intent router: '{text}' -> {skill.name} '{canonical}' ({score:.2f} via '{example}')")
+        return IntentMatch(skill, canonical, example, score)
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from array import array
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'kv_cache')
+
+class KVStateCache:
+    """On-disk store of llama.cpp KV states (Llama.save_state()), keyed by model file
+    and by a hash of the exact token prefix that was evaluated into the state.
+
+    Used by LLMEngine to skip re-evaluating prompt prefixes it has already seen,
+    including across restarts. Entries are evicted least-recently-used once the
+    total size exceeds the capacity.
+    """
+    MIN_TOKENS = 32 # Prefixes shorter than this are cheaper to re-evaluate than to load
+
+    def __init__(self, cache_dir=None, capacity_mb=None):
+        self.cache_dir = cache_dir or os.environ.get('JARVIS_KV_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.capacity_bytes = int(capacity_mb or os.environ.get('JARVIS_KV_CACHE_MB', 2048)) * 1024 * 1024
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        # {model_key: {prefix_hash: {"n_tokens": int, "size": int, "used": float}}}
+        self.index = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except Exception as e:
+            logging.error(f"KV cache index unreadable, starting empty: {e}")
+            self.index = {}
+
+    def _save_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    @staticmethod
+    def model_key(model_path: str) -> str:
+        """Identifies a model file; changes if the file is replaced."""
+        try:
+            st = os.stat(model_path)
+            ident = f"{os.path.abspath(model_path)}|{st.st_size}|{int(st.st_mtime)}"
+        except OSError:
+            ident = os.path.abspath(model_path)
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def prefix_hash(tokens) -> str:
+        return hashlib.sha1(array('i', tokens).tobytes()).hexdigest()
+
+    def _entry_path(self, model_key, prefix_hash):
+        return os.path.join(self.cache_dir, model_key, prefix_hash + '.state')
+
+    def lookup(self, model_path: str, tokens, min_tokens=0):
+        """Returns (n_tokens, state) for the longest cached prefix of `tokens` that is
+        longer than min_tokens, or None."""
+        key = self.model_key(model_path)
+        with self.lock:
+            entries = sorted(self.index.get(key, {}).items(), key=lambda kv: -kv[1]["n_tokens"])
+        for prefix_hash, meta in entries:
+            n = meta["n_tokens"]
+            # A state must leave at least one prompt token to evaluate
+            if n <= min_tokens or n >= len(tokens):
+                continue
+            if self.prefix_hash(tokens[:n]) != prefix_hash:
+                continue
+            try:
+                with open(self._entry_path(key, prefix_hash), 'rb') as f:
+                    state = pickle.load(f)
+            except Exception as e:
+                logging.warning(f"KV cache entry unreadable, dropping: {e}")
+                self._drop(key, prefix_hash)
+                continue
+            with self.lock:
+                meta["used"] = time.time()
+            return n, state
+        return None
+
+    def contains(self, model_path: str, tokens) -> bool:
+        key = self.model_key(model_path)
+        with self.lock:
+            return self.prefix_hash(tokens) in self.index.get(key, {})
+
+    def save(self, model_path: str, tokens, state):
+        """Persists a state whose KV cache holds exactly `tokens`."""
+        if len(tokens) < self.MIN_TOKENS:
+            return
+        key = self.model_key(model_path)
+        prefix_hash = self.prefix_hash(tokens)
+        path = self._entry_path(key, prefix_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            with self.lock:
+                self.index.setdefault(key, {})[prefix_hash] = {
+                    "n_tokens": len(tokens),
+                    "size": os.path.getsize(path),
+                    "used": time.time()
+                }
+                self._evict()
+                self._save_index()
+            logging.info(f"KV cache: saved {len(tokens)}-token prefix state.")
+        except Exception as e:
+            logging.error(f"KV cache save failed: {e}")
+
+    def _drop(self, key, prefix_hash):
+        with self.lock:
+            self.index.get(key, {}).pop(prefix_hash, None)
+            try:
+                os.remove(self._entry_path(key, prefix_hash))
+            except OSError:
+                pass
+            self._save_index()
+
+    def _evict(self):
+        # Caller holds self.lock
+        entries = [(meta["used"], key, h, meta["size"])
+                   for key, group in self.index.items() for h, meta in group.items()]
+        total = sum(e[3] for e in entries)
+        for _, key, h, size in sorted(entries):
+            if total <= self.capacity_bytes:
+                break
+            self.index[key].pop(h, None)
+            try:
+                os.remove(self._entry_path(key, h))
+            except OSError:
+                pass
+            total -= size
@@ -2,19 +2,56 @@ import os
 import threading
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
 
-# Global flag to track if llama_cpp is usable
-HAS_LLAMA = False
-try:
-    from llama_cpp import Llama
-    HAS_LLAMA = True
-except ImportError:
-    Llama = None
-except OSError:
-    # Captures "FileNotFoundError: ... CUDA/.../bin" and other DLL issues
-    Llama = None
-except Exception:
-    Llama = None
+from core.backends import create_backend, BaseBackend, HAS_LLAMA
+from core.response_cache import ResponseCache
+from core.tuning import DEFAULT_PARAMS
+from core.speculative import DRAFT_PROMPT_LOOKUP
+from core.scheduler import LLMScheduler, QueueTimeout, PRIORITY_BACKGROUND
+from core import tracing
+
+DEFAULT_STOP = ["<|im_end|>", "User:", "[INST]"]
+DEFAULT_MODEL = "default"
+N_CTX = DEFAULT_PARAMS["n_ctx"]
+DEFAULT_MAX_TOKENS = 1024
+
+# Upper bound on generated tokens per kind of request; generate(..., intent=...) applies it
+INTENT_TOKEN_CAPS = {
+    "chat": 1024,
+    "code": 1536,
+    "summary": 384,
+    "command": 96,
+    "classify": 16,
+}
+
+# Readiness states of the active model, reported to state listeners (UI status bar)
+STATE_IDLE = "idle"
+STATE_LOADING = "loading"
+STATE_WARMING = "warming up"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+def is_error_response(text: str) -> bool:
+    return text.startswith(("Error", "System Error:"))
+
+class BatchResult:
+    """Outcome of one prompt in generate_batch(), in input order."""
+    def __init__(self, index: int, text: str = "", error: str = None, elapsed: float = 0.0, cached=False):
+        self.index = index
+        self.text = text
+        self.error = error
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"BatchResult({self.index}, {status}, {self.elapsed:.2f}s)"
 
 class LLMEngine:
     _instance = None
@@ -27,96 +64,396 @@ class LLMEngine:
                     cls._instance = super(LLMEngine, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self, model_path=None):
-        if hasattr(self, 'model'):
+    def __init__(self, model_path=None, backend=None):
+        if hasattr(self, 'backend'):
             return
         
         # 1. User specified path
         default_path = r"D:\models\capybara\capybarahermes-2.5-mistral-7b.Q5_0.gguf"
         
-        self.model_path = os.environ.get('MISTRAL_MODEL_PATH')
+        self.model_path = model_path or os.environ.get('MISTRAL_MODEL_PATH')
         
         # Priority Check
         if not self.model_path:
             self.model_path = default_path
             
-        self.default_model_path = default_path 
+        self.default_model_path = self.model_path
         self.current_model_path = self.model_path
-            
-        self.model = None
-        self.loaded = False
-        self.lock = threading.RLock()
-        logging.info(f"LLM Engine Configured. Target Model: {self.model_path}")
-
-    def unload_model(self):
-        with self.lock:
-            if self.model:
-                del self.model
-                self.model = None
-            self.loaded = False
-            import gc
-            gc.collect()
-            logging.info("Model unloaded.")
 
-    def reload_model(self, new_path=None):
-        if new_path:
-            self.current_model_path = new_path
-        
-        self.unload_model()
-        # Force re-load next time load_model is called or call it now
-        # We'll set the internal path and let load_model handle it
-        self.model_path = self.current_model_path
-        return self.load_model()
-
-    def load_model(self):
-        if self.loaded:
-            return True
-        
-        if not HAS_LLAMA:
-            logging.error("llama_cpp module failed to import (Check CUDA/DLLs or install CPU version).")
-            return False
+        # Named models; the active one serves requests that don't name a model
+        self.model_paths = {DEFAULT_MODEL: self.model_path}
+        if os.environ.get('JARVIS_DRAFT_MODEL_PATH'):
+            # Small model with the same vocabulary, usable as generate(..., draft="draft")
+            self.model_paths["draft"] = os.environ['JARVIS_DRAFT_MODEL_PATH']
+        self.active_model = DEFAULT_MODEL
+
+        # Where completions run: in-process llama.cpp, a shared HTTP server, or a stub
+        self.backend: BaseBackend = backend if isinstance(backend, BaseBackend) else create_backend(backend)
+
+        self.scheduler = LLMScheduler(slots=self.backend.slots)
+        self.state = STATE_IDLE
+        self.ready_event = threading.Event()
+        self._state_listeners = []
+        self.response_cache = ResponseCache()
+        logging.info(f"LLM Engine Configured. Backend: {self.backend.name}, Target Model: {self.model_path}")
+
+    @property
+    def loaded(self) -> bool:
+        return self.backend.is_loaded(self.current_model_path)
+
+    def register_model(self, name: str, path: str):
+        """Makes a model file addressable by name (e.g. generate(..., model="coding"))."""
+        self.model_paths[name] = path
+
+    def resolve_model(self, model=None) -> str:
+        """Maps a model name (or a raw path) to a file path. None means the active model."""
+        if model is None:
+            return self.current_model_path
+        return self.model_paths.get(model, model)
 
-        if not os.path.exists(self.model_path):
-            logging.error(f"CRITICAL: Model file missing at: {self.model_path}")
+    def _resolve_draft(self, draft):
+        if not draft or draft == DRAFT_PROMPT_LOOKUP:
+            return draft
+        return self.resolve_model(draft)
+
+    @staticmethod
+    def token_budget(max_tokens=None, intent=None, default=DEFAULT_MAX_TOKENS) -> int:
+        """max_tokens for a call: the explicit value, bounded by the intent's cap."""
+        cap = INTENT_TOKEN_CAPS.get(intent)
+        if intent and cap is None:
+            logging.warning(f"Unknown generation intent '{intent}', no token cap applied.")
+        if max_tokens is None:
+            return cap or default
+        return min(max_tokens, cap) if cap else max_tokens
+
+    def set_active_model(self, name: str) -> bool:
+        """Makes `name` the model used by default. Other resident models stay loaded."""
+        path = self.resolve_model(name)
+        if not self.load_model(name):
             return False
+        self.active_model = name if name in self.model_paths else path
+        self.current_model_path = path
+        self.model_path = path
+        self._set_state(STATE_READY)
+        logging.info(f"Active model: {self.active_model}")
+        return True
+
+    def unload_model(self, model=None):
+        """Drops one model from the backend, or every resident model if none is given."""
+        self.backend.unload(self.resolve_model(model) if model else None)
+
+    def reload_model(self, new_path=None):
+        """Switches the active model to `new_path` (a path or a registered name)."""
+        return self.set_active_model(new_path or self.active_model)
+
+    def load_model(self, model=None):
+        """Ensures a model is loaded in the backend. Returns True on success."""
+        return self.backend.load(self.resolve_model(model))
+
+    def context_size(self, model=None) -> int:
+        """n_ctx the model is (or will be) loaded with."""
+        return self.backend.context_size(self.resolve_model(model))
+
+    def count_tokens(self, text: str, model=None):
+        """Token count of `text` with the model's own tokenizer, or None if unavailable."""
+        return self.backend.count_tokens(self.resolve_model(model), text)
+
+    def speculative_stats(self) -> dict:
+        """Draft acceptance statistics per drafting mode."""
+        return self.backend.stats().get("speculative", {})
 
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "state": self.state,
+            "scheduler": self.scheduler.stats(),
+            "response_cache": self.response_cache.stats(),
+            **self.backend.stats(),
+        }
+
+    def add_state_listener(self, callback):
+        """Registers callback(state) for readiness changes of the active model."""
+        self._state_listeners.append(callback)
+        callback(self.state)
+
+    def _set_state(self, state):
+        self.state = state
+        if state == STATE_READY:
+            self.ready_event.set()
+        else:
+            self.ready_event.clear()
+        for callback in list(self._state_listeners):
+            try:
+                callback(state)
+            except Exception as e:
+                logging.error(f"LLM state listener failed: {e}")
+
+    def is_ready(self) -> bool:
+        return self.state == STATE_READY
+
+    def wait_until_ready(self, timeout=None) -> bool:
+        return self.ready_event.wait(timeout)
+
+    def warm_up_async(self, model=None):
+        """Loads the model in the background and runs a tiny inference so the weights
+        are paged in before the first real request. Requests that arrive meanwhile
+        wait on the load instead of starting a second one."""
+        if self.state in (STATE_LOADING, STATE_WARMING):
+            return
+        self._set_state(STATE_LOADING) # Before the thread starts, so early requests see it
+        threading.Thread(target=self._warm_up, args=(model,), daemon=True, name="llm-warmup").start()
+
+    def _warm_up(self, model=None):
+        started = time.time()
+        path = self.resolve_model(model)
+        if self.backend.unavailable_reason() or not self.backend.load(path):
+            self._set_state(STATE_FAILED)
+            return
+        self._set_state(STATE_WARMING)
         try:
-            logging.info(f"Loading Llama model from {self.model_path}...")
-            # Reduced Context for stability on lower-end/CPU
-            # Optimized for RTX 3050 4GB: n_batch=512, n_ctx=4096, offload all layers
-            self.model = Llama(
-                model_path=self.model_path,
-                n_ctx=4096,          # Safe limit for 4GB VRAM
-                n_threads=6,
-                n_batch=512,         # Lower batch size to reduce VRAM spikes
-                n_gpu_layers=20,     # Adjusted for 4GB VRAM (prevents overflow to RAM)
-                verbose=True
-            )
-            self.loaded = True
-            logging.info("Model loaded successfully.")
-            return True
+            self.backend.warm_up(path)
         except Exception as e:
-            logging.error(f"Failed to load model: {e}")
-            return False
+            logging.warning(f"Warm-up inference failed (model is still usable): {e}")
+        self._set_state(STATE_READY)
+        logging.info(f"LLM warm-up finished in {time.time() - started:.1f}s")
+
+    def _check_ready(self, model=None):
+        """Returns an error string if generation cannot run, else None.
+        Blocks while the model is being loaded by the warm-up thread."""
+        reason = self.backend.unavailable_reason()
+        if reason:
+            return reason
+
+        is_active = self.resolve_model(model) == self.current_model_path
+        if not self.load_model(model):
+            if is_active:
+                self._set_state(STATE_FAILED)
+            return "Error: Model could not be loaded. Please check logs."
+        # While the warm-up thread is loading or warming the model it reports readiness itself
+        if is_active and self.state not in (STATE_READY, STATE_LOADING, STATE_WARMING):
+            self._set_state(STATE_READY)
+        return None
+
+    def _stream_tokens(self, path, prompt: str, stop, max_tokens, cache_prefix=None, draft=None,
+                       grammar=None) -> Iterator[str]:
+        """Yields text pieces from the backend; errors end the stream and are logged."""
+        try:
+            yield from self.backend.stream(path, prompt, stop or DEFAULT_STOP, max_tokens, cache_prefix, draft,
+                                           grammar=grammar)
+        except Exception as e:
+            logging.error(f"Streaming generation error: {e}")
+
+    def generate(self, prompt: str, stop=None, max_tokens=None, cache_prefix=None, model=None,
+                 priority="interactive", caller="default", cache=False, draft=None,
+                 grammar=None, json_schema=None, intent=None) -> str:
+        """Thread-safe generation.
+
+        cache_prefix: leading part of the prompt that repeats across calls (system prompt);
+        the llama backend keeps its KV state on disk so it is only evaluated once per model.
+        model: registered model name or path to use for this call (default: the active model).
+        priority/caller: scheduling class ("interactive", "command", "background") and the
+        name used for round-robin fairness within that class.
+        cache: opt in to the response cache; only for deterministic prompts whose answer
+        doesn't depend on anything outside the prompt (summaries). True also matches prompts
+        that differ only in case and punctuation; "exact" requires the identical prompt,
+        for outputs where those matter (paths, names in shell commands).
+        draft: speculative decoding for this call; "prompt" drafts from n-grams already in
+        the prompt (copy-heavy tasks: code fixes, summaries), a model name uses that small
+        model as the drafter. Acceptance rates are in speculative_stats(). The llama backend
+        only drafts with JARVIS_SPECULATIVE=1 (models are then loaded with logits_all) and
+        ignores it otherwise.
+        grammar/json_schema: constrain the output to a GBNF grammar (see core.grammars) or a
+        JSON schema; decoding ends as soon as the grammar is complete.
+        intent: kind of request ("chat", "code", "summary", "command", "classify"); caps
+        max_tokens via INTENT_TOKEN_CAPS.
+        """
+        max_tokens = self.token_budget(max_tokens, intent)
+        grammar = grammar if grammar is not None else json_schema
+        if cache:
+            keys = self._cache_keys(model, stop, max_tokens, grammar, prompt, exact=cache == "exact")
+            cached = self.response_cache.get(keys)
+            if cached is not None:
+                logging.info(f"Response cache hit for {caller}.")
+                return cached
+            response = self.generate(prompt, stop=stop, max_tokens=max_tokens, cache_prefix=cache_prefix,
+                                     model=model, priority=priority, caller=caller, draft=draft, grammar=grammar)
+            if response and not is_error_response(response):
+                self.response_cache.put(keys, response)
+            return response
+
+        error = self._check_ready(model)
+        if error:
+            return error
+
+        path = self.resolve_model(model)
+        draft = self._resolve_draft(draft)
+        priority = self.scheduler.resolve_priority(priority)
+        if priority == PRIORITY_BACKGROUND and grammar is None:
+            # A grammar can't resume from partial output, so constrained calls run to the end
+            return self._generate_preemptible(path, prompt, stop, max_tokens, cache_prefix, priority, caller, draft)
+
+        try:
+            ticket = self.scheduler.acquire(priority, caller)
+        except QueueTimeout as e:
+            return f"Error: {e}"
+        try:
+            with tracing.span("llm generate", caller=caller):
+                return self.backend.complete(path, prompt, stop or DEFAULT_STOP, max_tokens, cache_prefix, draft,
+                                             grammar=grammar).strip()
+        except Exception as e:
+            logging.error(f"Generation error: {e}")
+            return f"Error regenerating response: {e}"
+        finally:
+            self.scheduler.release(ticket)
+
+    def _cache_keys(self, model, stop, max_tokens, grammar, prompt, exact=False):
+        params = {"stop": stop, "max_tokens": max_tokens}
+        if grammar is not None:
+            params["grammar"] = grammar
+        keys = self.response_cache.make_keys(self.resolve_model(model), params, prompt)
+        return keys[:1] if exact else keys
 
-    def generate(self, prompt: str, stop=None, max_tokens=1024) -> str:
-        """Thread-safe generation."""
-        if not HAS_LLAMA:
-            return "System Error: llama-cpp-python is missing or broken (check CUDA/DLLs). Falling back to mock response."
+    def generate_batch(self, prompts: List[str], stop=None, max_tokens=None, model=None,
+                       priority="command", caller="default", cache=False, draft=None,
+                       max_workers=None, grammar=None, json_schema=None, intent=None) -> List[BatchResult]:
+        """Runs independent prompts (map steps of a map/reduce) and returns one BatchResult
+        per prompt, in order. A failing item doesn't fail the others.
 
-        if not self.loaded:
-            if not self.load_model():
-                return "Error: Model could not be loaded. Please check logs."
+        Backends that evaluate several sequences together (an HTTP server taking a prompt
+        list) get all uncached prompts in one request; otherwise items run on a bounded
+        worker pool sized to the backend's concurrent slots.
+        """
+        max_tokens = self.token_budget(max_tokens, intent, default=512)
+        grammar = grammar if grammar is not None else json_schema
+        results = [None] * len(prompts)
+        pending = []
+        for i, prompt in enumerate(prompts):
+            if cache:
+                keys = self._cache_keys(model, stop, max_tokens, grammar, prompt, exact=cache == "exact")
+                hit = self.response_cache.get(keys)
+                if hit is not None:
+                    results[i] = BatchResult(i, hit, cached=True)
+                    continue
+            pending.append(i)
 
-        with self.lock:
+        if len(pending) > 1 and self.backend.supports_batch and not draft:
+            batched = self._complete_batch([prompts[i] for i in pending], stop, max_tokens, model, priority, caller,
+                                           grammar)
+            if batched is not None:
+                for i, result in zip(pending, batched):
+                    result.index = i
+                    results[i] = result
+                    if cache and result.ok:
+                        keys = self._cache_keys(model, stop, max_tokens, grammar, prompts[i], exact=cache == "exact")
+                        self.response_cache.put(keys, result.text)
+                return results
+
+        def run_one(i):
+            started = time.time()
+            text = self.generate(prompts[i], stop=stop, max_tokens=max_tokens, model=model,
+                                 priority=priority, caller=caller, cache=cache, draft=draft, grammar=grammar)
+            elapsed = time.time() - started
+            if not text or is_error_response(text):
+                return BatchResult(i, error=text or "Error: Empty response from model.", elapsed=elapsed)
+            return BatchResult(i, text, elapsed=elapsed)
+
+        workers = max(1, min(len(pending), max_workers or self.backend.slots))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as pool:
+            for result in pool.map(run_one, pending):
+                results[result.index] = result
+        return results
+
+    def _complete_batch(self, prompts, stop, max_tokens, model, priority, caller, grammar=None):
+        """One backend call for several prompts. Returns BatchResults, or None to fall back."""
+        error = self._check_ready(model)
+        if error:
+            return [BatchResult(i, error=error) for i in range(len(prompts))]
+        try:
+            ticket = self.scheduler.acquire(priority, caller)
+        except QueueTimeout as e:
+            return [BatchResult(i, error=f"Error: {e}") for i in range(len(prompts))]
+        started = time.time()
+        try:
+            texts = self.backend.complete_batch(self.resolve_model(model), prompts, stop or DEFAULT_STOP, max_tokens,
+                                                grammar=grammar)
+        except Exception as e:
+            logging.warning(f"Batched generation failed, falling back to per-item calls: {e}")
+            return None
+        finally:
+            self.scheduler.release(ticket)
+        elapsed = time.time() - started
+        return [BatchResult(i, text.strip(), elapsed=elapsed) if text.strip()
+                else BatchResult(i, error="Error: Empty response from model.", elapsed=elapsed)
+                for i, text in enumerate(texts)]
+
+    def _generate_preemptible(self, path, prompt, stop, max_tokens, cache_prefix, priority, caller, draft=None) -> str:
+        """Background generation that yields the model to higher-priority requests at
+        token boundaries, then re-queues and continues from the text produced so far."""
+        text = ""
+        produced = 0 # Tokens generated so far
+        while True:
             try:
-                output = self.model(
-                    prompt,
-                    max_tokens=max_tokens,
-                    stop=stop or ["<|im_end|>", "User:", "[INST]"],
-                    echo=False
-                )
-                return output['choices'][0]['text'].strip()
-            except Exception as e:
-                logging.error(f"Generation error: {e}")
-                return f"Error regenerating response: {e}"
+                ticket = self.scheduler.acquire(priority, caller)
+            except QueueTimeout as e:
+                return text.strip() if text else f"Error: {e}"
+            preempted = False
+            streamed = 0
+            pieces = self._stream_tokens(path, prompt + text, stop, max_tokens - produced, cache_prefix, draft)
+            try:
+                with tracing.span("llm generate", caller=caller):
+                    for piece in pieces:
+                        text += piece
+                        streamed += 1
+                        if ticket.preempt.is_set():
+                            preempted = True
+                            break
+            finally:
+                pieces.close()
+                self.scheduler.release(ticket, preempted=preempted)
+            if not preempted:
+                return text.strip()
+            # Streamed pieces are not always single tokens (HTTP chunks, multi-byte text)
+            counted = self.backend.count_tokens(path, text)
+            produced = counted if counted is not None else produced + streamed
+            if produced >= max_tokens:
+                return text.strip()
+            logging.info(f"LLM: {caller} preempted after {produced} tokens, re-queued.")
+
+    def generate_stream(self, prompt: str, stop=None, max_tokens=None, cache_prefix=None, model=None,
+                        priority="interactive", caller="default", draft=None,
+                        grammar=None, json_schema=None, intent=None) -> Iterator[str]:
+        """Thread-safe streaming generation. Yields text fragments as they are decoded.
+
+        If the model is unavailable a single error string (same text as generate()) is
+        yielded instead. The model is held until the iterator is exhausted or closed.
+        """
+        max_tokens = self.token_budget(max_tokens, intent)
+        grammar = grammar if grammar is not None else json_schema
+        error = self._check_ready(model)
+        if error:
+            yield error
+            return
+
+        path = self.resolve_model(model)
+        draft = self._resolve_draft(draft)
+        try:
+            with tracing.span("llm queue", caller=caller):
+                ticket = self.scheduler.acquire(priority, caller)
+        except QueueTimeout as e:
+            yield f"Error: {e}"
+            return
+        pieces = self._stream_tokens(path, prompt, stop, max_tokens, cache_prefix, draft, grammar)
+        started = first = time.perf_counter()
+        count = 0
+        try:
+            for piece in pieces:
+                if not count:
+                    first = time.perf_counter()
+                    tracing.record("llm prompt eval", started, first, caller=caller)
+                count += 1
+                yield piece
+        finally:
+            pieces.close()
+            self.scheduler.release(ticket)
+            if count:
+                tracing.record("llm decode", first, time.perf_counter(), caller=caller, pieces=count)
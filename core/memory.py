@@ -1,59 +1,378 @@
 import os
 import json
+import time
 import logging
 import pickle
+import threading
 from typing import Dict, Any, List
 
+from core.history_archive import HistoryArchive, SEGMENT_SIZE, keywords
+
+JOURNAL_SUFFIX = ".journal"
+HISTORY_SUFFIX = ".history"
+FSYNC_POLICIES = ("always", "interval", "never")
+FSYNC_INTERVAL = 1.0 # Seconds between fsyncs with the "interval" policy
+FLUSH_INTERVAL = 0.5 # Seconds the flusher waits to coalesce a burst of mutations
+HISTORY_LIMIT = 50    # Messages kept in RAM; older ones move to the history archive
+
 class Memory:
-    def __init__(self, filepath="jarvis_memory.json"):
+    """Persistent memory: a JSON snapshot plus an append-only journal of mutations.
+
+    Each mutation adds one JSON line to <filepath>.journal, so persisting a turn
+    costs O(change). save() compacts: it writes the full snapshot to a temp file,
+    renames it over the old one and empties the journal. Journal records carry a
+    sequence number and the snapshot stores the last one it includes, so a crash
+    between the rename and the truncation doesn't apply a record twice. Loading reads
+    the snapshot and replays the journal; a torn last line (crash mid-write) is dropped.
+
+    Thread-safe and write-behind: mutations and reads take an RLock and touch only
+    memory; reads return copies. Journal records are buffered and a background
+    flusher writes each burst in one go, flush_interval seconds after the first
+    mutation (JARVIS_MEMORY_FLUSH_INTERVAL, 0 writes synchronously). Disk I/O happens
+    on the flusher, in flush()/save() and in close(), which JarvisEngine.shutdown calls.
+
+    fsync: "always" (every flush is durable), "interval" (at most one fsync per
+    FSYNC_INTERVAL, default; a write that lands sooner is synced by the flusher once the
+    interval is up) or "never" (left to the OS). JARVIS_MEMORY_FSYNC sets it.
+
+    History is tiered: the newest HISTORY_LIMIT messages stay in the snapshot and in
+    RAM, and once SEGMENT_SIZE more have piled up the flusher moves the oldest into
+    the compressed archive in <filepath>.history (core.history_archive). Messages carry
+    their timestamp ("ts") and journal sequence number ("seq"); the archive records the
+    last seq it holds, so journal records and snapshot entries it already holds are
+    skipped on load. history_between() and history_mentioning() page through both tiers.
+
+    read_only loads without ever writing (no compaction of a torn or long journal);
+    for readers such as the SQLite migration. Mutations are refused.
+    """
+    def __init__(self, filepath="jarvis_memory.json", fsync=None, compact_every=None, flush_interval=None,
+                 read_only=False):
         self.filepath = filepath
+        self.read_only = read_only
+        self.journal_path = filepath + JOURNAL_SUFFIX
+        self.fsync = fsync or os.environ.get('JARVIS_MEMORY_FSYNC', 'interval')
+        if self.fsync not in FSYNC_POLICIES:
+            logging.warning(f"Unknown memory fsync policy '{self.fsync}', using 'interval'.")
+            self.fsync = "interval"
+        self.compact_every = int(compact_every or os.environ.get('JARVIS_MEMORY_COMPACT_EVERY', 1000))
+        self.flush_interval = float(flush_interval if flush_interval is not None
+                                    else os.environ.get('JARVIS_MEMORY_FLUSH_INTERVAL', FLUSH_INTERVAL))
+        self.lock = threading.RLock()   # Guards data, seq and pending
+        self.io_lock = threading.Lock() # Serializes journal and snapshot writes
         self.data: Dict[str, Any] = {
             "user_preferences": {},
             "learned_commands": {},  # Format: {"trigger_phrase": "action_description"}
             "history": [],
             "system_prompt_extras": []
         }
+        self.seq = 0              # Sequence number of the last mutation
+        self.journal = None
+        self.journal_entries = 0  # Records in the journal since the last compaction
+        self.last_sync = 0.0
+        self.unsynced = False     # Journal writes not yet fsynced ("interval" policy)
+        self.pending: List[str] = []    # Journal lines not yet written
+        self.wake = threading.Event()
+        self.closed = False
+        self.listeners = []
+        self.archive = HistoryArchive(filepath + HISTORY_SUFFIX)
         self.load()
+        self.flusher = None
+        if self.flush_interval > 0 and not read_only:
+            self.flusher = threading.Thread(target=self._flush_loop, daemon=True, name="memory-flusher")
+            self.flusher.start()
 
     def load(self):
         if os.path.exists(self.filepath):
             try:
                 with open(self.filepath, 'r') as f:
                     loaded = json.load(f)
+                    self.seq = loaded.pop("journal_seq", 0)
                     self.data.update(loaded)
+                history = self.data["history"]
+                # Messages saved before they carried a seq sort before every journaled one
+                for i, item in enumerate(history):
+                    item.setdefault("seq", i - len(history))
+                self.data["history"] = [item for item in history if not self.archive.archived(item["seq"])]
                 logging.info(f"Memory loaded from {self.filepath}")
             except Exception as e:
                 logging.error(f"Failed to load memory: {e}")
+        self._replay()
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        replayed, torn = 0, False
+        started = time.perf_counter()
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    torn = True # Only the last write can be incomplete
+                    break
+                if entry.get("seq", 0) <= self.seq:
+                    continue # Already in the snapshot
+                self._apply(entry)
+                self.seq = entry["seq"]
+                replayed += 1
+        self.journal_entries = replayed
+        logging.info(f"Memory journal: replayed {replayed} records in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if torn:
+            logging.warning(f"Memory journal {self.journal_path} ends with an incomplete record; it was dropped.")
+        if (torn or replayed >= self.compact_every) and not self.read_only:
+            self.save()
+
+    def _apply(self, entry: dict):
+        op = entry["op"]
+        if op == "set":
+            self.data[entry["section"]][entry["key"]] = entry["value"]
+        elif op == "history":
+            if self.archive.archived(entry["seq"]):
+                return # Moved to the archive after this record was journaled
+            self.data["history"].append({"role": entry["role"], "content": entry["content"],
+                                         "ts": entry.get("ts"), "seq": entry["seq"]})
+        else:
+            logging.warning(f"Unknown memory journal op '{op}' ignored.")
+
+    def _record(self, entry: dict):
+        """Applies a mutation and queues its journal record. No disk I/O."""
+        if self.read_only:
+            raise RuntimeError(f"Memory {self.filepath} is open read-only.")
+        with self.lock:
+            self.seq += 1
+            entry["seq"] = self.seq
+            self._apply(entry)
+            self.pending.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        if self.flusher is None:
+            self.flush()
+        else:
+            self.wake.set()
+        if entry["op"] == "history":
+            self._notify("history", entry["role"], entry["content"])
+        else:
+            self._notify(entry["section"], entry["key"], entry["value"])
+
+    def add_change_listener(self, callback):
+        """Registers callback(section, key, value), called after every mutation on the
+        mutating thread. section is "user_preferences", "learned_commands" or
+        "history" (key is the role, value the content)."""
+        self.listeners.append(callback)
+
+    def _notify(self, section, key, value):
+        for callback in list(self.listeners):
+            try:
+                callback(section, key, value)
+            except Exception as e:
+                logging.error(f"Memory listener failed: {e}")
+
+    def iter_entries(self):
+        """(section, key, value) for every stored preference and history message."""
+        with self.lock:
+            prefs = list(self.data["user_preferences"].items())
+        for key, value in prefs:
+            yield "user_preferences", key, value
+        for item in self.iter_history():
+            yield "history", item["role"], item["content"]
+
+    def _history_tiers(self):
+        # Consistent view of both tiers: the archive is updated before the hot tail is
+        # trimmed, so hot messages it already holds are filtered out here
+        with self.lock:
+            segments = self.archive.segments
+            last_seq = segments[-1]["last_seq"] if segments else None
+            hot = [dict(item) for item in self.data["history"] if last_seq is None or item["seq"] > last_seq]
+        return segments, hot
+
+    def iter_history(self):
+        """Every history message, archived ones included, oldest first."""
+        segments, hot = self._history_tiers()
+        yield from self.archive.iter_items(segments)
+        yield from hot
+
+    def history_between(self, start: float, end: float, limit=100, after=None) -> List[dict]:
+        """Messages with start <= ts < end (epoch seconds), oldest first, at most `limit`.
+        Pass after=<last message>["seq"] for the next page."""
+        segments, hot = self._history_tiers()
+        found = self.archive.between(start, end, limit, after=after, segments=segments)
+        for item in hot:
+            if len(found) >= limit:
+                break
+            ts = item.get("ts")
+            if ts is not None and start <= ts < end and (after is None or item["seq"] > after):
+                found.append(item)
+        return found
+
+    def history_mentioning(self, text: str, limit=20, before=None) -> List[dict]:
+        """Messages containing every keyword of `text`, newest first, at most `limit`.
+        Pass before=<last message>["seq"] for the next page."""
+        terms = keywords(text)
+        if not terms:
+            return []
+        segments, hot = self._history_tiers()
+        found = []
+        for item in reversed(hot):
+            if len(found) >= limit:
+                return found
+            if (before is None or item["seq"] < before) and set(terms) <= set(keywords(item["content"])):
+                found.append(item)
+        return found + self.archive.mentioning(terms, limit - len(found), before=before, segments=segments)
+
+    def _flush_loop(self):
+        while True:
+            woke = self.wake.wait(self._sync_due())
+            if self.closed:
+                return
+            if not woke:
+                self._sync() # Interval is up for writes that skipped their fsync
+                continue
+            time.sleep(self.flush_interval) # Let the rest of the burst arrive
+            self.wake.clear()
+            if self.closed:
+                return # close() was called during the sleep and flushes itself
+            self.flush()
+
+    def _sync_due(self):
+        """Seconds until the deferred fsync is due, or None if nothing is unsynced."""
+        if not self.unsynced:
+            return None
+        return max(0.0, FSYNC_INTERVAL - (time.monotonic() - self.last_sync))
+
+    def _sync(self):
+        with self.io_lock:
+            if not self.unsynced or self.journal is None:
+                return
+            try:
+                os.fsync(self.journal.fileno())
+            except Exception as e:
+                logging.error(f"Failed to sync memory journal: {e}")
+            self.last_sync = time.monotonic()
+            self.unsynced = False
+
+    def flush(self):
+        """Writes queued journal records; compacts once the journal is long enough."""
+        with self.io_lock:
+            with self.lock:
+                lines, self.pending = self.pending, []
+            if not lines:
+                return
+            try:
+                if self.journal is None:
+                    self.journal = open(self.journal_path, 'a', encoding='utf-8')
+                self.journal.write("".join(lines))
+                self.journal.flush()
+                now = time.monotonic()
+                if self.fsync == "always" or (self.fsync == "interval" and now - self.last_sync >= FSYNC_INTERVAL):
+                    os.fsync(self.journal.fileno())
+                    self.last_sync = now
+                    self.unsynced = False
+                elif self.fsync == "interval":
+                    self.unsynced = True # The flusher syncs it when the interval is up
+            except Exception as e:
+                logging.error(f"Failed to append to memory journal: {e}")
+                with self.lock:
+                    self.pending[:0] = lines # Retry with the next flush
+                return
+            self.journal_entries += len(lines)
+            self._archive()
+            if self.journal_entries >= self.compact_every:
+                self._compact()
+
+    def _archive(self):
+        """Moves the oldest history messages into the archive, a segment at a time, once
+        enough have piled up beyond the HISTORY_LIMIT hot tail. Runs under io_lock."""
+        while True:
+            with self.lock:
+                history = self.data["history"]
+                if len(history) < HISTORY_LIMIT + SEGMENT_SIZE:
+                    return
+                batch = [dict(item) for item in history[:SEGMENT_SIZE]]
+            try:
+                self.archive.append(batch)
+            except Exception as e:
+                logging.error(f"Failed to archive memory history: {e}")
+                return
+            with self.lock:
+                self.data["history"] = [item for item in self.data["history"]
+                                        if not self.archive.archived(item["seq"])]
 
     def save(self):
+        """Compacts: writes the full snapshot atomically, then empties the journal."""
+        with self.io_lock:
+            self._compact()
+
+    def _compact(self):
+        self._archive()
+        # Serialized under the data lock so the snapshot is consistent; queued records
+        # are part of it, so they are dropped instead of written
+        with self.lock:
+            snapshot = json.dumps(dict(self.data, journal_seq=self.seq), indent=4)
+            self.pending = []
+        tmp = self.filepath + ".tmp"
         try:
-            with open(self.filepath, 'w') as f:
-                json.dump(self.data, f, indent=4)
+            with open(tmp, 'w') as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.filepath)
         except Exception as e:
             logging.error(f"Failed to save memory: {e}")
+            return
+        try:
+            if self.journal is not None:
+                self.journal.close()
+            # The snapshot already holds every record, so a crash before this is harmless
+            self.journal = open(self.journal_path, 'w', encoding='utf-8')
+            self.journal_entries = 0
+            self.unsynced = False
+        except Exception as e:
+            self.journal = None
+            logging.error(f"Failed to reset memory journal: {e}")
+
+    def close(self):
+        """Stops the flusher and writes everything (compacted) to disk."""
+        self.closed = True
+        self.wake.set()
+        if self.read_only:
+            return
+        if self.flusher is not None and self.flusher is not threading.current_thread():
+            self.flusher.join(timeout=5.0)
+        self.save()
+        with self.io_lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
 
     def get_preference(self, key: str, default=None):
-        return self.data["user_preferences"].get(key, default)
+        with self.lock:
+            return self.data["user_preferences"].get(key, default)
 
     def set_preference(self, key: str, value: Any):
-        self.data["user_preferences"][key] = value
-        self.save()
+        self._record({"op": "set", "section": "user_preferences", "key": key, "value": value})
 
     def learn_command(self, trigger: str, action: str):
         """Maps a user phrase to a specific action."""
-        self.data["learned_commands"][trigger.lower()] = action
-        self.save()
+        self._record({"op": "set", "section": "learned_commands", "key": trigger.lower(), "value": action})
 
     def get_learned_command(self, text: str) -> str:
         """Checks if the text matches a learned command."""
-        return self.data["learned_commands"].get(text.lower())
+        with self.lock:
+            return self.data["learned_commands"].get(text.lower())
 
     def add_history_item(self, role: str, content: str):
-        self.data["history"].append({"role": role, "content": content})
-        # Keep last 50 messages strictly for saving, runtime might use fewer
-        if len(self.data["history"]) > 50:
-            self.data["history"] = self.data["history"][-50:]
-        self.save()
+        self._record({"op": "history", "role": role, "content": content, "ts": time.time()})
 
     def get_recent_history(self, limit=10):
-        return self.data["history"][-limit:]
+        """Newest messages from the hot tail (up to HISTORY_LIMIT), oldest first."""
+        with self.lock:
+            return [dict(item) for item in self.data["history"][-limit:]]
+
+def create_memory(filepath="jarvis_memory.json", db_path=None):
+    """Memory backend from JARVIS_MEMORY_BACKEND: json (default) or sqlite. The sqlite
+    backend migrates `filepath` on first use."""
+    backend = os.environ.get('JARVIS_MEMORY_BACKEND', 'json')
+    if backend == 'sqlite':
+        from core.sqlite_memory import SQLiteMemory
+        return SQLiteMemory(db_path, json_path=filepath)
+    if backend != 'json':
+        logging.warning(f"Unknown memory backend '{backend}', using json.")
+    return Memory(filepath)
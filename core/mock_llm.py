@@ -1,8 +1,16 @@
 from core.llm import LLMEngine
 
+MOCK_RESPONSE = "I am in Mock Mode because the local model failed to load. Please check your CUDA installation or switching to a CPU-only llama-cpp-python."
+
 class MockLLMEngine(LLMEngine):
-    def load_model(self):
+    def load_model(self, model=None):
         return True
+
+    def warm_up_async(self, model=None):
+        self._set_state("ready")
         
-    def generate(self, prompt: str, stop=None, max_tokens=1024) -> str:
-        return "I am in Mock Mode because the local model failed to load. Please check your CUDA installation or switching to a CPU-only llama-cpp-python."
+    def generate(self, prompt: str, **kwargs) -> str:
+        return MOCK_RESPONSE
+
+    def generate_stream(self, prompt: str, **kwargs):
+        yield MOCK_RESPONSE
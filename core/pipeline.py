@@ -0,0 +1,187 @@
+"""
+Staged asyncio pipeline for the assistant's request flow:
+
+    asr (speech -> text)  ->  route (learned commands, skills, intents)  ->  llm  ->  tts
+
+Each stage has a bounded queue, a fixed number of workers and an overflow policy, so
+a burst of input degrades predictably (queued, dropped or refused) instead of
+piling up threads that all contend for the model. Stage handlers are blocking calls run on
+the stage's own thread pool; the event loop itself lives on one background thread.
+Items leave a queue in the order they were accepted, so a single-worker stage handles
+them strictly in order. Stages hand work on by submitting to the next stage from their
+handler thread; with the "block" policy that call waits while the next stage is full,
+which is what pushes back on the stages before it.
+"""
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import tracing
+
+# Overflow policies when a stage queue is full
+OVERFLOW_BLOCK = "block"              # Producer waits (never used from the loop or UI thread)
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # Oldest queued item is discarded (stale speech)
+OVERFLOW_REJECT = "reject"            # New item is refused; submit() returns False
+
+class Stage:
+    def __init__(self, name: str, handler, workers=1, maxsize=8, overflow=OVERFLOW_BLOCK):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"stage-{name}")
+        self.queue = None # Created on the loop
+        self.busy = 0
+        self.pending = 0 # Accepted and not yet finished (queued + running)
+        self.metrics = {"submitted": 0, "processed": 0, "failed": 0, "dropped": 0, "rejected": 0,
+                        "wait_total": 0.0, "run_total": 0.0}
+
+class Pipeline:
+    def __init__(self):
+        self.stages = {}
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def add_stage(self, name: str, handler, **kwargs) -> Stage:
+        stage = Stage(name, handler, **kwargs)
+        self.stages[name] = stage
+        return stage
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True, name="pipeline")
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for stage in self.stages.values():
+            stage.queue = asyncio.Queue(maxsize=stage.maxsize)
+            for _ in range(stage.workers):
+                self.loop.create_task(self._worker(stage))
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            # Workers wait on their queues forever; cancel them so the loop closes cleanly
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        for stage in self.stages.values():
+            stage.executor.shutdown(wait=False)
+
+    # --- Submission ---
+
+    def submit(self, name: str, item, block=None) -> bool:
+        """Queues `item` for a stage from any thread. Returns False if it was refused.
+        block overrides the stage's policy for this call (False: never wait)."""
+        stage = self.stages[name]
+        if self.loop is None or not self.loop.is_running():
+            logging.warning(f"Pipeline not running, dropped item for {name}.")
+            return False
+        # The item carries the submitter's trace turn to the stage's thread
+        entry = (time.perf_counter(), tracing.current_turn(), item)
+        if threading.current_thread() is self.thread:
+            return self._offer(stage, entry)
+        wait = stage.overflow == OVERFLOW_BLOCK if block is None else block
+        future = asyncio.run_coroutine_threadsafe(self._put(stage, entry, wait), self.loop)
+        return future.result()
+
+    async def _put(self, stage: Stage, entry, wait: bool) -> bool:
+        if wait:
+            stage.metrics["submitted"] += 1
+            stage.pending += 1
+            await stage.queue.put(entry)
+            return True
+        return self._offer(stage, entry)
+
+    def _offer(self, stage: Stage, entry) -> bool:
+        # Runs on the loop thread
+        if stage.queue.full():
+            if stage.overflow == OVERFLOW_DROP_OLDEST:
+                stage.queue.get_nowait()
+                stage.queue.task_done()
+                stage.pending -= 1
+                stage.metrics["dropped"] += 1
+                logging.warning(f"Pipeline: {stage.name} queue full, dropped its oldest item.")
+            else:
+                stage.metrics["rejected"] += 1
+                logging.warning(f"Pipeline: {stage.name} queue full, refused new item.")
+                return False
+        stage.metrics["submitted"] += 1
+        stage.pending += 1
+        stage.queue.put_nowait(entry)
+        return True
+
+    # --- Workers ---
+
+    async def _worker(self, stage: Stage):
+        while True:
+            entry = await stage.queue.get()
+            started = time.perf_counter()
+            stage.metrics["wait_total"] += started - entry[0]
+            stage.busy += 1
+            try:
+                await self.loop.run_in_executor(stage.executor, self._call, stage, entry)
+                stage.metrics["processed"] += 1
+            except Exception as e:
+                stage.metrics["failed"] += 1
+                logging.error(f"Pipeline stage {stage.name} failed: {e}")
+            finally:
+                stage.busy -= 1
+                stage.pending -= 1
+                stage.metrics["run_total"] += time.perf_counter() - started
+                stage.queue.task_done()
+
+    def _call(self, stage: Stage, entry):
+        enqueued, turn, item = entry
+        tracing.set_turn(turn)
+        started = time.perf_counter()
+        tracing.record(f"{stage.name} wait", enqueued, started)
+        try:
+            stage.handler(item)
+        finally:
+            tracing.record(stage.name, started, time.perf_counter())
+            tracing.set_turn(None)
+
+    def drain(self, name: str, timeout=None) -> bool:
+        """Waits until a stage has no queued or running work. Returns False on timeout."""
+        stage = self.stages[name]
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while stage.pending:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def idle(self) -> bool:
+        """True when no stage has queued or running work. A handler's own submits
+        are counted before it finishes, so a turn in flight never looks idle."""
+        return all(stage.pending == 0 for stage in self.stages.values())
+
+    def stats(self) -> dict:
+        out = {}
+        for name, stage in self.stages.items():
+            m = stage.metrics
+            done = m["processed"] + m["failed"]
+            out[name] = {
+                "queued": stage.queue.qsize() if stage.queue else 0,
+                "running": stage.busy,
+                "workers": stage.workers,
+                **{k: v for k, v in m.items() if not k.endswith("_total")},
+                "avg_wait": m["wait_total"] / done if done else 0.0,
+                "avg_run": m["run_total"] / done if done else 0.0,
+            }
+        return out
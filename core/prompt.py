@@ -0,0 +1,95 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from core.llm import N_CTX
+
+def chatml_turn(role: str, content: str) -> str:
+    return f"<|im_start|>{role}\n{content}\n<|im_end|>"
+
+class PromptBuilder:
+    """Assembles the ChatML chat prompt within a token budget.
+
+    History is added newest-first until the history budget is spent, and room for the
+    reply (max_tokens) is always reserved, so prompt size never overflows the context
+    and its evaluation cost stays bounded. Token counts come from the loaded model's
+    tokenizer and are cached per history item.
+
+    Snippets retrieved from long-term memory (core.retrieval) go into a system turn
+    between the history and the user's message, best first, within their own budget.
+    They change every turn, so placing them last keeps the system prompt and history
+    an unchanged prefix whose KV state is reused.
+    """
+    def __init__(self, llm, history_budget=None, cache_size=4096, context_budget=None):
+        self.llm = llm
+        self.history_budget = int(history_budget or os.environ.get('JARVIS_HISTORY_TOKENS', 1536))
+        self.context_budget = int(context_budget or os.environ.get('JARVIS_RETRIEVAL_TOKENS', 256))
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self._counts = OrderedDict() # (model_path, text) -> token count
+
+    def count_tokens(self, text: str) -> int:
+        model_path = self.llm.resolve_model()
+        key = (model_path, text)
+        with self.lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+
+        count = self.llm.count_tokens(text)
+        exact = count is not None
+        if not exact:
+            # Model not loaded yet: rough estimate, not cached so real counts replace it
+            count = len(text) // 3 + 1
+        else:
+            with self.lock:
+                self._counts[key] = count
+                while len(self._counts) > self.cache_size:
+                    self._counts.popitem(last=False)
+        return count
+
+    def build(self, system_prompt: str, history, user_text: str, max_tokens=1024, n_ctx=N_CTX, snippets=()) -> str:
+        """history: memory items ({"role", "content"}) oldest first.
+        snippets: retrieval Snippets, best first."""
+        user_block = chatml_turn("user", user_text) + "\n<|im_start|>assistant\n"
+        fixed = self.count_tokens(system_prompt) + self.count_tokens(user_block)
+        available = n_ctx - max_tokens - fixed - len(history) - 8 # newline joins + BOS slack
+        context_block = self._context_block(snippets, history, min(self.context_budget, available // 4))
+        if context_block:
+            available -= self.count_tokens(context_block) + 1
+        budget = min(self.history_budget, available)
+
+        turns = []
+        used = 0
+        for item in reversed(history):
+            role = "user" if item['role'] == "user" else "assistant"
+            turn = chatml_turn(role, item['content'])
+            cost = self.count_tokens(turn)
+            if used + cost > budget:
+                break
+            turns.append(turn)
+            used += cost
+        turns.reverse()
+
+        if len(turns) < len(history):
+            logging.debug(f"PromptBuilder: kept {len(turns)}/{len(history)} history items ({used}/{budget} tokens).")
+        return "\n".join([system_prompt] + turns + ([context_block] if context_block else []) + [user_block])
+
+    def _context_block(self, snippets, history, budget: int) -> str:
+        # Snippets repeating a message that is already in the history window are skipped
+        recent = {item['content'] for item in history}
+        header = "Relevant things you remember (use them if they help):"
+        lines, used = [], self.count_tokens(header) + 8
+        for snippet in snippets:
+            if snippet.text in recent:
+                continue
+            line = f"- {snippet.render()}"
+            cost = self.count_tokens(line)
+            if used + cost > budget:
+                continue # A shorter, lower-ranked snippet may still fit
+            lines.append(line)
+            used += cost
+        if not lines:
+            return ""
+        return chatml_turn("system", "\n".join([header] + lines))
@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'response_cache.json')
+SAVE_DELAY = 2.0 # Seconds the background writer waits to coalesce a burst of puts
+
+class ResponseCache:
+    """LRU + TTL cache of completed generations, persisted to a JSON file.
+
+    Every entry is reachable by two keys: the exact prompt, and a normalized form
+    (case, whitespace and punctuation folded) so trivially different phrasings of the
+    same deterministic request share a result. Both keys include the model file and
+    the generation parameters.
+
+    Changes are written by a background thread, SAVE_DELAY seconds after the first one
+    of a burst, and once more at exit; save() writes synchronously.
+    """
+    def __init__(self, path=None, max_entries=None, ttl=None):
+        self.path = path or os.environ.get('JARVIS_RESPONSE_CACHE', DEFAULT_CACHE_PATH)
+        self.max_entries = int(max_entries or os.environ.get('JARVIS_RESPONSE_CACHE_SIZE', 512))
+        self.ttl = float(ttl or os.environ.get('JARVIS_RESPONSE_CACHE_TTL', 7 * 24 * 3600))
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock() # Serializes file writes
+        self.dirty = threading.Event()
+        self.saver = None
+        self.entries = OrderedDict() # key -> {"text": str, "created": float}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        text = prompt.lower()
+        text = re.sub(r"[^\w\s]", " ", text)
+        return " ".join(text.split())
+
+    @staticmethod
+    def make_keys(model_path: str, params: dict, prompt: str):
+        """Returns (exact_key, normalized_key) for a request."""
+        base = json.dumps([model_path, params], sort_keys=True, default=str)
+        exact = hashlib.sha1(f"{base}\0e\0{prompt}".encode('utf-8')).hexdigest()
+        normalized = hashlib.sha1(f"{base}\0n\0{ResponseCache.normalize(prompt)}".encode('utf-8')).hexdigest()
+        return exact, normalized
+
+    def get(self, keys):
+        now = time.time()
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                if now - entry["created"] > self.ttl:
+                    del self.entries[key]
+                    continue
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry["text"]
+            self.misses += 1
+            return None
+
+    def put(self, keys, text: str):
+        entry = {"text": text, "created": time.time()}
+        with self.lock:
+            for key in keys:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self._schedule_save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self._schedule_save()
+
+    def _schedule_save(self):
+        with self.lock:
+            if self.saver is None:
+                self.saver = threading.Thread(target=self._save_loop, daemon=True, name="response-cache-saver")
+                self.saver.start()
+                atexit.register(self._save_if_dirty)
+        self.dirty.set()
+
+    def _save_loop(self):
+        while True:
+            self.dirty.wait()
+            time.sleep(SAVE_DELAY) # Let the rest of the burst arrive
+            self._save_if_dirty()
+
+    def _save_if_dirty(self):
+        if self.dirty.is_set():
+            self.dirty.clear()
+            self.save()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                loaded = json.load(f)
+            now = time.time()
+            for key, entry in loaded.items():
+                if now - entry["created"] <= self.ttl:
+                    self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            logging.info(f"Response cache loaded: {len(self.entries)} entries.")
+        except Exception as e:
+            logging.error(f"Failed to load response cache: {e}")
+
+    def save(self):
+        with self.io_lock:
+            with self.lock:
+                snapshot = dict(self.entries)
+            try:
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logging.error(f"Failed to save response cache: {e}")
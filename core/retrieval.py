@@ -0,0 +1,249 @@
+"""
+Retrieval over long-term memory for prompt context.
+
+Facts, research knowledge, other text preferences and history messages are embedded
+(core.embeddings) into a float16 matrix stored raw in memory_index/vectors.f16 and
+memory-mapped for search; memory_index/entries.jsonl holds one entry per row. The
+index follows memory through its change listener: new entries are embedded in
+batches on a background thread and appended to both files, so an update costs
+O(change). Re-setting a key appends a new row and retires the old one.
+
+PromptBuilder gets the top-k snippets for the user's message and includes as many
+as fit its retrieval token budget.
+"""
+import os
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+
+from core.embeddings import get_embedder, np
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'memory_index')
+
+SEARCH_CHUNK = 65536 # Rows scored per step, bounds the float32 working set
+EMBED_BATCH = 64
+KINDS = ("fact", "knowledge", "preference", "history")
+
+class Snippet:
+    def __init__(self, kind: str, key: str, text: str, score: float):
+        self.kind = kind   # "fact", "knowledge", "preference" or "history"
+        self.key = key
+        self.text = text
+        self.score = score
+
+    def render(self) -> str:
+        if self.kind == "knowledge":
+            return f"Research on {self.key[len('knowledge_'):].replace('_', ' ')}: {self.text}"
+        if self.kind == "preference":
+            return f"{self.key.replace('_', ' ')}: {self.text}"
+        if self.kind == "history":
+            return f"Earlier, {'the user' if self.key.startswith('user') else 'you'} said: {self.text}"
+        return self.text
+
+    def __repr__(self):
+        return f"Snippet({self.kind}, {self.text[:40]!r}, {self.score:.2f})"
+
+def describe(section: str, key, value):
+    """(kind, key, text) to index for a memory mutation, or None if it isn't indexed."""
+    if section == "history":
+        if not isinstance(value, str) or not value.strip():
+            return None
+        # Keyed by content: repeated messages ("hi") are one row
+        digest = hashlib.sha1(f"{key}\n{value}".encode('utf-8')).hexdigest()[:16]
+        return "history", f"{key}:{digest}", value
+    if section != "user_preferences" or not isinstance(value, str) or not value.strip():
+        return None
+    if key.startswith("fact_"):
+        return "fact", key, value
+    if key.startswith("knowledge_"):
+        return "knowledge", key, value
+    return "preference", key, value
+
+class RetrievalIndex:
+    def __init__(self, embedder=None, index_dir=None, min_score=None):
+        self.embedder = embedder if embedder is not None else get_embedder()
+        self.index_dir = index_dir or os.environ.get('JARVIS_RETRIEVAL_DIR', DEFAULT_INDEX_DIR)
+        min_score = min_score or os.environ.get('JARVIS_RETRIEVAL_MIN_SCORE')
+        if min_score is None and self.embedder is not None:
+            min_score = self.embedder.retrieval_threshold
+        self.min_score = float(min_score or 0.0)
+        self.lock = threading.Lock()     # Guards entries, live rows and the mapping
+        self.io_lock = threading.Lock()  # Serializes appends
+        self.entries = []    # (kind, key, text) per row; only ever appended to
+        self.latest = {}     # key -> newest row
+        self.live = np.zeros(0, dtype=bool) if np is not None else None       # Per row, with spare capacity;
+        self.kinds = np.zeros(0, dtype=np.uint8) if np is not None else None  # retired rows are skipped
+        self.vectors = None  # float16 memmap, rows x dim
+        self.dim = None
+        self.incoming = queue.Queue()
+        self.worker = None
+        self.ready = threading.Event() # Set once the index is open (and backfilled)
+
+    @property
+    def enabled(self) -> bool:
+        return self.embedder is not None
+
+    def _paths(self):
+        return (os.path.join(self.index_dir, 'vectors.f16'), os.path.join(self.index_dir, 'entries.jsonl'),
+                os.path.join(self.index_dir, 'meta.json'))
+
+    def start(self, memory):
+        """Opens the index, backfills it from memory if it is new or the embedder
+        changed, and follows memory changes from then on."""
+        if not self.enabled:
+            return
+        memory.add_change_listener(self.on_memory_change)
+        self.worker = threading.Thread(target=self._run, args=(memory,), daemon=True, name="retrieval-index")
+        self.worker.start()
+
+    def on_memory_change(self, section: str, key, value):
+        # Runs on the mutating thread: only queue the work
+        entry = describe(section, key, value)
+        if entry:
+            self.incoming.put(entry)
+
+    def _run(self, memory):
+        try:
+            if not self._open():
+                started = time.time()
+                entries = [e for e in (describe(*item) for item in memory.iter_entries()) if e]
+                for i in range(0, len(entries), EMBED_BATCH):
+                    self._append(entries[i:i + EMBED_BATCH])
+                logging.info(f"Retrieval index: backfilled {len(entries)} entries in {time.time() - started:.1f}s.")
+        except Exception as e:
+            logging.error(f"Retrieval index unavailable: {e}")
+            return
+        self.ready.set()
+        while True:
+            batch = [self.incoming.get()]
+            while len(batch) < EMBED_BATCH:
+                try:
+                    batch.append(self.incoming.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._append(batch)
+            except Exception as e:
+                logging.error(f"Retrieval index update failed: {e}")
+
+    def _open(self) -> bool:
+        """Loads an existing index for this embedder. Returns False if it must be rebuilt."""
+        vec_path, entries_path, meta_path = self._paths()
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("embedder") != self.embedder.name or not os.path.exists(entries_path):
+            os.makedirs(self.index_dir, exist_ok=True)
+            for path in (vec_path, entries_path):
+                open(path, 'wb').close()
+            self.dim = None
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({"embedder": self.embedder.name}, f)
+            return False
+
+        self.dim = meta.get("dim")
+        entries, lines = [], 0
+        with open(entries_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                lines += 1
+                try:
+                    entries.append(tuple(json.loads(line)))
+                except ValueError:
+                    break # Torn last line
+        if self.dim:
+            entries = entries[:os.path.getsize(vec_path) // (self.dim * 2)]
+        else:
+            entries = []
+        if len(entries) != lines:
+            # An append was interrupted: keep the rows both files agree on
+            with open(entries_path, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(list(e), ensure_ascii=False) + "\n" for e in entries))
+        self._install(entries)
+        logging.info(f"Retrieval index: {len(entries)} entries loaded.")
+        return True
+
+    def _append(self, batch):
+        """Embeds new entries and appends them to the index files."""
+        with self.lock:
+            batch = [e for e in dict.fromkeys(batch)
+                     if e[1] not in self.latest or self.entries[self.latest[e[1]]] != e]
+        if not batch:
+            return
+        vectors = self.embedder.encode([e[2] for e in batch]).astype(np.float16)
+        vec_path, entries_path, meta_path = self._paths()
+        with self.io_lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({"embedder": self.embedder.name, "dim": self.dim}, f)
+            with self.lock:
+                count = len(self.entries)
+            with open(vec_path, 'r+b') as f:
+                if os.path.getsize(vec_path) != count * self.dim * 2:
+                    f.truncate(count * self.dim * 2) # Rows left by an interrupted append
+                f.seek(0, os.SEEK_END)
+                f.write(vectors.tobytes())
+            with open(entries_path, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(list(e), ensure_ascii=False) + "\n" for e in batch))
+            self._install(batch)
+
+    def _install(self, batch):
+        """Adds rows just written to the index files; costs O(len(batch)) apart from
+        the amortized growth of the per-row arrays."""
+        if not batch:
+            return
+        vectors = None
+        with self.lock:
+            start = len(self.entries)
+            count = start + len(batch)
+            if count > len(self.live):
+                capacity = max(1024, 2 * count)
+                self.live = np.concatenate([self.live[:start], np.zeros(capacity - start, dtype=bool)])
+                self.kinds = np.concatenate([self.kinds[:start], np.zeros(capacity - start, dtype=np.uint8)])
+            for row, (kind, key, _) in enumerate(batch, start):
+                previous = self.latest.get(key)
+                if previous is not None:
+                    self.live[previous] = False
+                self.latest[key] = row
+                self.live[row] = True
+                self.kinds[row] = KINDS.index(kind)
+            self.entries.extend(batch)
+            if self.dim:
+                vectors = np.memmap(self._paths()[0], dtype=np.float16, mode='r', shape=(count, self.dim))
+            self.vectors = vectors
+
+    def wait_ready(self, timeout=None) -> bool:
+        return self.enabled and self.ready.wait(timeout)
+
+    def search(self, text: str, k=5, kinds=None):
+        """Top-k live entries most similar to `text` (cosine), best first."""
+        if not self.enabled:
+            return []
+        with self.lock:
+            entries, vectors = self.entries, self.vectors
+            if vectors is None:
+                return []
+            count = len(vectors)
+            live, row_kinds = self.live[:count].copy(), self.kinds[:count]
+        query = self.embedder.encode([text])[0].astype(np.float32)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_CHUNK):
+            chunk = np.asarray(vectors[start:start + SEARCH_CHUNK], dtype=np.float32)
+            scores[start:start + len(chunk)] = chunk @ query
+        scores[~live] = -1.0
+        if kinds:
+            scores[~np.isin(row_kinds, [KINDS.index(kind) for kind in kinds])] = -1.0
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Snippet(*entries[i], float(scores[i])) for i in top if scores[i] >= self.min_score]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"rows": len(self.entries), "live": int(self.live[:len(self.entries)].sum()) if self.live is not None else 0,
+                    "pending": self.incoming.qsize(), "dim": self.dim}
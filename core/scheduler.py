@@ -0,0 +1,182 @@
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Priority classes, lower value runs first
+PRIORITY_INTERACTIVE = 0   # Chat replies the user is waiting on
+PRIORITY_COMMAND = 1       # Skill work triggered by the user (automation, code, OCR summaries)
+PRIORITY_BACKGROUND = 2    # Long jobs nobody is blocked on (research summaries)
+
+PRIORITIES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "command": PRIORITY_COMMAND,
+    "background": PRIORITY_BACKGROUND,
+}
+PRIORITY_NAMES = {v: k for k, v in PRIORITIES.items()}
+
+# Seconds a request may sit in the queue before it is given up on
+DEFAULT_MAX_WAIT = {
+    PRIORITY_INTERACTIVE: 120.0,
+    PRIORITY_COMMAND: 180.0,
+    PRIORITY_BACKGROUND: 900.0,
+}
+
+class QueueTimeout(Exception):
+    """Raised when a request waited longer than its class allows."""
+    pass
+
+class Ticket:
+    """One queued or running LLM request."""
+    def __init__(self, priority: int, caller: str):
+        self.priority = priority
+        self.caller = caller
+        self.enqueued = time.time()
+        self.started = None
+        self.granted = False
+        # Set when a higher-priority request is waiting; preemptible holders should
+        # release at the next token boundary and re-queue.
+        self.preempt = threading.Event()
+
+class LLMScheduler:
+    """Grants use of the model to at most `slots` requests at a time (1 for an
+    in-process model, more for an inference server that batches).
+
+    Requests wait in per-priority queues; the highest non-empty class always goes
+    next, and within a class callers are served round-robin so one busy skill cannot
+    starve another. Arrival of a higher-priority request flags the running ticket for
+    preemption when every slot is busy. The caller runs its own work once granted,
+    which keeps streaming generators on the consumer's thread.
+    """
+    def __init__(self, max_wait=None, slots=1):
+        self.max_wait = dict(DEFAULT_MAX_WAIT)
+        self.max_wait.update(max_wait or {})
+        self.slots = slots
+        self.cond = threading.Condition()
+        # {priority: OrderedDict(caller -> deque[Ticket])}; caller order is the round-robin order
+        self.queues = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self.running = set()
+        self.metrics = {p: {"served": 0, "timeouts": 0, "preempted": 0, "wait_total": 0.0, "wait_max": 0.0}
+                        for p in PRIORITY_NAMES}
+
+    @staticmethod
+    def resolve_priority(priority) -> int:
+        if isinstance(priority, str):
+            return PRIORITIES[priority]
+        return int(priority)
+
+    def acquire(self, priority="interactive", caller="default", timeout=None) -> Ticket:
+        """Blocks until the request may use the model. Raises QueueTimeout."""
+        priority = self.resolve_priority(priority)
+        if timeout is None:
+            timeout = self.max_wait[priority]
+        ticket = Ticket(priority, caller)
+        deadline = ticket.enqueued + timeout
+
+        with self.cond:
+            self.queues[priority].setdefault(caller, deque()).append(ticket)
+            self._dispatch()
+            if not ticket.granted and self.running:
+                # All slots busy: ask the least important holder to yield if it ranks below us
+                victim = max(self.running, key=lambda t: (t.priority, t.started))
+                if victim.priority > priority:
+                    victim.preempt.set()
+            depth = self.depth()
+            if depth:
+                logging.debug(f"LLM queue: {caller} waiting ({PRIORITY_NAMES[priority]}), depth={depth}")
+
+            while not ticket.granted:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self.metrics[priority]["timeouts"] += 1
+                    logging.warning(f"LLM queue: {caller} gave up after {timeout:.0f}s ({PRIORITY_NAMES[priority]})")
+                    raise QueueTimeout(f"LLM busy, waited {timeout:.0f}s")
+                self.cond.wait(remaining)
+
+        return ticket
+
+    def release(self, ticket: Ticket, preempted=False):
+        with self.cond:
+            self.running.discard(ticket)
+            if preempted:
+                self.metrics[ticket.priority]["preempted"] += 1
+            self._dispatch()
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority="interactive", caller="default", timeout=None):
+        ticket = self.acquire(priority, caller, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _remove(self, ticket: Ticket):
+        # Caller holds self.cond
+        callers = self.queues[ticket.priority]
+        pending = callers.get(ticket.caller)
+        if pending and ticket in pending:
+            pending.remove(ticket)
+            if not pending:
+                del callers[ticket.caller]
+
+    def _dispatch(self):
+        # Caller holds self.cond
+        while len(self.running) < self.slots and self._grant_next():
+            pass
+
+    def _grant_next(self) -> bool:
+        # Caller holds self.cond
+        for priority in sorted(self.queues):
+            callers = self.queues[priority]
+            if not callers:
+                continue
+            caller, pending = next(iter(callers.items()))
+            ticket = pending.popleft()
+            # Round-robin: this caller goes to the back of its class
+            del callers[caller]
+            if pending:
+                callers[caller] = pending
+
+            ticket.granted = True
+            ticket.started = time.time()
+            waited = ticket.started - ticket.enqueued
+            m = self.metrics[priority]
+            m["served"] += 1
+            m["wait_total"] += waited
+            m["wait_max"] = max(m["wait_max"], waited)
+            self.running.add(ticket)
+            self.cond.notify_all()
+            return True
+        return False
+
+    def higher_priority_waiting(self, priority: int) -> bool:
+        with self.cond:
+            return any(self.queues[p] for p in self.queues if p < priority)
+
+    def depth(self, priority=None) -> int:
+        """Number of queued (not running) requests, optionally for one class."""
+        with self.cond:
+            classes = [self.resolve_priority(priority)] if priority is not None else list(self.queues)
+            return sum(len(q) for p in classes for q in self.queues[p].values())
+
+    def stats(self) -> dict:
+        """Queue depth and wait metrics per priority class."""
+        with self.cond:
+            out = {}
+            for p, name in PRIORITY_NAMES.items():
+                m = self.metrics[p]
+                out[name] = {
+                    "queued": sum(len(q) for q in self.queues[p].values()),
+                    "served": m["served"],
+                    "timeouts": m["timeouts"],
+                    "preempted": m["preempted"],
+                    "avg_wait": m["wait_total"] / m["served"] if m["served"] else 0.0,
+                    "max_wait": m["wait_max"],
+                }
+            out["running"] = [{"caller": t.caller,
+                               "priority": PRIORITY_NAMES[t.priority],
+                               "elapsed": time.time() - t.started} for t in self.running]
+            return out
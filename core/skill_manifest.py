@@ -0,0 +1,119 @@
+"""
+Skill manifests: what a skill file declares, read without importing it.
+
+The class attributes name, description, triggers, examples, dependencies and timeout are
+read from the source with ast.literal_eval, so heavy imports (OCR, scraping, GUI
+automation) only happen when a skill is first used. Manifests are cached in
+skill_manifest.json and re-parsed when a file's mtime or size changes.
+"""
+import os
+import sys
+import ast
+import json
+import logging
+import threading
+import importlib.util
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'skill_manifest.json')
+
+MANIFEST_FIELDS = ("name", "description", "triggers", "examples", "dependencies", "timeout")
+
+_STDLIB = set(getattr(sys, 'stdlib_module_names', ())) | set(sys.builtin_module_names)
+
+def _is_skill_class(node: ast.ClassDef) -> bool:
+    for base in node.bases:
+        if (isinstance(base, ast.Name) and base.id == "BaseSkill") or \
+           (isinstance(base, ast.Attribute) and base.attr == "BaseSkill"):
+            return True
+    return False
+
+def _required_imports(tree: ast.Module):
+    """Third-party top-level imports outside try blocks (those are optional)."""
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module.split('.')[0])
+    return sorted({n for n in names if n not in _STDLIB and n not in ("core", "skills")})
+
+def parse_manifest(path: str):
+    """Manifests of the skill classes in a file: [{"class", "name", ...}]. Returns None
+    if a class can't be described statically (computed attributes), meaning the file
+    has to be imported to find out."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    requires = _required_imports(tree)
+
+    classes = []
+    for node in tree.body:
+        if not (isinstance(node, ast.ClassDef) and _is_skill_class(node)):
+            continue
+        entry = {"class": node.name, "name": node.name, "description": "",
+                 "triggers": [], "examples": {}, "dependencies": requires, "timeout": None}
+        for stmt in node.body:
+            targets = []
+            if isinstance(stmt, ast.Assign):
+                targets = [t.id for t in stmt.targets if isinstance(t, ast.Name)]
+            elif isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name) and stmt.value:
+                targets = [stmt.target.id]
+            for target in targets:
+                if target in MANIFEST_FIELDS:
+                    try:
+                        entry[target] = ast.literal_eval(stmt.value)
+                    except ValueError:
+                        return None
+        entry["triggers"] = [list(t) for t in entry["triggers"]]
+        classes.append(entry)
+    return classes
+
+def missing_dependencies(manifest: dict):
+    """Declared dependencies that aren't installed (checked without importing them)."""
+    missing = []
+    for name in manifest.get("dependencies", []):
+        try:
+            if importlib.util.find_spec(name) is None:
+                missing.append(name)
+        except (ImportError, ValueError):
+            missing.append(name)
+    return missing
+
+class ManifestCache:
+    """Parsed manifests per skill file, invalidated by mtime and size."""
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('JARVIS_SKILL_MANIFEST', DEFAULT_MANIFEST_PATH)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logging.warning(f"Skill manifest cache unreadable, re-parsing skills: {e}")
+
+    def get(self, filepath: str):
+        stat = os.stat(filepath)
+        key = os.path.abspath(filepath)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                return entry["classes"]
+        classes = parse_manifest(filepath)
+        with self.lock:
+            self.entries[key] = {"mtime": stat.st_mtime, "size": stat.st_size, "classes": classes}
+            self.dirty = True
+        return classes
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f, indent=1)
+                os.replace(tmp, self.path)
+                self.dirty = False
+            except Exception as e:
+                logging.error(f"Failed to save skill manifest cache: {e}")
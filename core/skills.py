@@ -1,9 +1,16 @@
 import os
+import time
 import importlib.util
 import logging
 import inspect
+import threading
 from typing import List, Dict, Callable
 
+from core.triggers import TriggerIndex
+from core.skill_manifest import ManifestCache, missing_dependencies
+from core.executor import SkillExecutor, current_token, DEFAULT_SKILL_TIMEOUT
+from core import tracing
+
 class SkillContext:
     """Provides skills with access to the core engine capabilities."""
     def __init__(self, engine):
@@ -25,17 +32,46 @@ class SkillContext:
         # But since our engine is async-ish, returning values is hard.
         return ""  # Placeholder
         
-    def llm_query(self, prompt: str) -> str:
-        return self.engine.llm.generate(prompt)
+    def llm_query(self, prompt: str, priority="command", caller="skills", **kwargs) -> str:
+        """Runs a one-shot completion. Skill work is scheduled behind interactive chat;
+        pass priority="background" for long jobs. Other kwargs go to LLMEngine.generate
+        (e.g. model="coding")."""
+        return self.engine.llm.generate(prompt, priority=priority, caller=caller, **kwargs)
+
+    def llm_batch(self, prompts, priority="command", caller="skills", **kwargs):
+        """Runs independent prompts together (map step); returns BatchResults in order."""
+        return self.engine.llm.generate_batch(prompts, priority=priority, caller=caller, **kwargs)
         
     @property
     def memory(self):
         return self.engine.memory
 
+    @property
+    def cancelled(self) -> bool:
+        """True once the running skill task was cancelled or timed out."""
+        token = current_token()
+        return token is not None and token.cancelled
+
+    def check_cancelled(self):
+        """Raises SkillCancelled if the running skill task was cancelled; call between
+        slow steps so a timed-out skill stops early."""
+        token = current_token()
+        if token is not None:
+            token.check()
+
 class BaseSkill:
     """Abstract base class for all skills."""
     name: str = "BaseSkill"
     description: str = "Base description"
+    # Literal (kind, pattern[, priority]) tuples, see core.triggers. handle() is only
+    # called when one matches; skills without triggers are tried after all others.
+    triggers: list = []
+    # Canonical command -> paraphrases, for the semantic intent router (core.intent)
+    examples: dict = {}
+    # Modules the skill needs; defaults to its top-level third-party imports
+    dependencies: list = []
+    # Seconds a single run may take before it is cancelled and reported as timed out
+    timeout: float = DEFAULT_SKILL_TIMEOUT
 
     def __init__(self, context: SkillContext):
         self.context = context
@@ -44,49 +80,279 @@ class BaseSkill:
         """Return True if this skill handled the input."""
         return False
 
+    def expects_followup(self) -> bool:
+        """True while the skill waits for a reply (e.g. a confirmation); it then sees
+        the next input before any other skill."""
+        return False
+
     def help(self) -> str:
         return f"{self.name}: {self.description}"
 
+class LazySkill(BaseSkill):
+    """Stands in for a skill described by its manifest; the module is imported and the
+    skill instantiated the first time it has to handle input."""
+    def __init__(self, context: SkillContext, manifest: dict, filepath: str, importer: Callable):
+        super().__init__(context)
+        self.manifest = manifest
+        self.filepath = filepath
+        self.importer = importer
+        self.name = manifest["name"]
+        self.description = manifest["description"]
+        self.triggers = [tuple(t) for t in manifest["triggers"]]
+        self.examples = manifest["examples"]
+        self.dependencies = manifest["dependencies"]
+        self.timeout = manifest.get("timeout") or DEFAULT_SKILL_TIMEOUT
+        self.instance = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.instance is not None
+
+    def load(self) -> BaseSkill:
+        with self.lock:
+            if self.instance is None:
+                module = self.importer(self.filepath)
+                self.instance = getattr(module, self.manifest["class"])(self.context)
+                logging.info(f"Registered skill: {self.instance.name}")
+        return self.instance
+
+    def handle(self, input_text: str) -> bool:
+        return self.load().handle(input_text)
+
+    def expects_followup(self) -> bool:
+        return self.instance is not None and self.instance.expects_followup()
+
 class SkillManager:
     def __init__(self, context: SkillContext):
         self.context = context
         self.skills: List[BaseSkill] = []
         self.skills_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'skills')
+        self.index = TriggerIndex()
+        self.legacy: List[BaseSkill] = [] # Skills without declared triggers
+        self.files: Dict[str, List[BaseSkill]] = {} # skill file -> its registered skills
+        self.lock = threading.RLock() # Guards the routing state above; swapped as a whole
+        self.manifests = ManifestCache()
+        self.modules = {} # filepath -> imported module
+        self.import_times: Dict[str, float] = {} # skill file -> seconds spent importing it
+        self.import_lock = threading.Lock()
+        self.executor = SkillExecutor()
+        self.run_locks = {} # skill -> lock; a skill instance never runs twice at once
+        self.reload_listeners: List[Callable] = []
+        self.watcher = None
 
     def load_skills(self):
-        self.skills = []
         if not os.path.exists(self.skills_dir):
             os.makedirs(self.skills_dir)
+        started = time.perf_counter()
             
+        files = {}
         for filename in os.listdir(self.skills_dir):
             if filename.endswith('.py') and not filename.startswith('__'):
-                self._load_skill_file(os.path.join(self.skills_dir, filename))
-        
-        logging.info(f"Loaded {len(self.skills)} skills.")
+                filepath = os.path.join(self.skills_dir, filename)
+                files[filepath] = self._register_skill_file(filepath)
+        self.manifests.save()
+
+        self._install(files)
+        lazy = sum(1 for s in self.skills if isinstance(s, LazySkill) and not s.loaded)
+        logging.info(f"Loaded {len(self.skills)} skills in {time.perf_counter() - started:.2f}s "
+                     f"({lazy} deferred until first use; {self.index.count} triggers, {len(self.legacy)} without triggers).")
 
-    def _load_skill_file(self, filepath):
+    def _register_skill_file(self, filepath, reload=False) -> List[BaseSkill]:
+        """The file's skills, built from its manifest; only files that can't be described
+        statically, or skills with no triggers or examples, are imported now.
+        With reload=True the module is re-imported fresh and errors are raised."""
         try:
-            spec = importlib.util.spec_from_file_location("skill_module", filepath)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
+            manifest = self.manifests.get(filepath)
+        except Exception as e:
+            if reload:
+                raise
+            logging.error(f"Failed to read skill manifest from {filepath}: {e}")
+            return []
+        if reload:
+            with self.import_lock:
+                self.modules.pop(filepath, None)
+        if manifest is None:
+            return self._load_skill_file(filepath, reload)
+
+        skills = []
+        for entry in manifest:
+            missing = missing_dependencies(entry)
+            if missing:
+                logging.warning(f"Skipping skill {entry['name']}: missing {', '.join(missing)}")
+                continue
+            skill = LazySkill(self.context, entry, filepath, self._import_module)
+            if reload or (not skill.triggers and not skill.examples):
+                # Legacy skills see every input anyway; reloaded ones are checked before the swap
+                try:
+                    skill.load()
+                except Exception as e:
+                    if reload:
+                        raise
+                    logging.error(f"Failed to load skill from {filepath}: {e}")
+                    continue
+            skills.append(skill)
+        return skills
+
+    def _import_module(self, filepath):
+        with self.import_lock:
+            if filepath not in self.modules:
+                started = time.perf_counter()
+                spec = importlib.util.spec_from_file_location("skill_module", filepath)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                elapsed = time.perf_counter() - started
+                self.import_times[os.path.basename(filepath)] = elapsed
+                logging.info(f"Imported {os.path.basename(filepath)} in {elapsed:.2f}s")
+                self.modules[filepath] = module
+            return self.modules[filepath]
+
+    def import_report(self) -> Dict[str, float]:
+        """Seconds spent importing each skill file so far, slowest first."""
+        return dict(sorted(self.import_times.items(), key=lambda item: -item[1]))
+
+    def _install(self, files: Dict[str, List[BaseSkill]]):
+        """Builds the routing state for `files` and swaps it in at once."""
+        # Sorted so tie-breaks between equal-priority triggers don't depend on the filesystem
+        skills = [skill for path in sorted(files) for skill in files[path]]
+        index = TriggerIndex()
+        legacy = []
+        for skill in skills:
+            if skill.triggers:
+                index.add(skill, skill.triggers)
+            else:
+                legacy.append(skill)
+        index.build()
+        with self.lock:
+            self.files, self.skills, self.index, self.legacy = dict(files), skills, index, legacy
+
+    # --- Hot reload ---
+
+    def start_watching(self):
+        """Reloads skill files when they change on disk (JARVIS_SKILL_HOT_RELOAD=0 disables)."""
+        if os.environ.get('JARVIS_SKILL_HOT_RELOAD', '1') == '0' or self.watcher:
+            return
+        from core.watcher import FileWatcher
+        self.watcher = FileWatcher(self.skills_dir, self.reload_files)
+        self.watcher.start()
+
+    def stop_watching(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def add_reload_listener(self, callback):
+        """Registers callback(skills), called after skills were reloaded."""
+        self.reload_listeners.append(callback)
+
+    def reload_files(self, changed, removed=()):
+        """Re-imports changed skill files and swaps their skills in between dispatches;
+        runs already in progress finish on the old instance. A file that fails to import
+        keeps its previous skills."""
+        with self.lock:
+            files = dict(self.files)
+        updated = []
+        for filepath in removed:
+            if files.pop(filepath, None) is not None:
+                with self.import_lock:
+                    self.modules.pop(filepath, None)
+                updated.append(os.path.basename(filepath))
+        for filepath in changed:
+            try:
+                files[filepath] = self._register_skill_file(filepath, reload=True)
+                updated.append(os.path.basename(filepath))
+            except Exception as e:
+                logging.error(f"Reload of {os.path.basename(filepath)} failed, keeping the previous version: {e}")
+                self.context.engine.ui.display_message(f"Skill reload failed ({os.path.basename(filepath)}): {e}", "SYSTEM")
+        if not updated:
+            return
+        self.manifests.save()
+        self._install(files)
+        logging.info(f"Reloaded skills: {', '.join(updated)}")
+        self.context.engine.ui.display_message(f"Reloaded {', '.join(updated)}.", "SYSTEM")
+        for callback in list(self.reload_listeners):
+            try:
+                callback(self.skills)
+            except Exception as e:
+                logging.error(f"Skill reload listener failed: {e}")
+
+    def candidates(self, text: str) -> List[BaseSkill]:
+        """Skills to try for `text`, in order: skills awaiting a follow-up, skills whose
+        triggers match (by priority), then skills without triggers."""
+        with self.lock:
+            skills, index, legacy = self.skills, self.index, self.legacy
+        ordered = [s for s in skills if s.expects_followup()]
+        for skill in index.match(text) + legacy:
+            if skill not in ordered:
+                ordered.append(skill)
+        return ordered
+
+    def _load_skill_file(self, filepath, reload=False) -> List[BaseSkill]:
+        skills = []
+        try:
+            module = self._import_module(filepath)
             
             # Find classes inheriting from BaseSkill
             for name, obj in inspect.getmembers(module):
-                if inspect.isclass(obj) and issubclass(obj, BaseSkill) and obj is not BaseSkill:
+                if inspect.isclass(obj) and issubclass(obj, BaseSkill) and obj not in (BaseSkill, LazySkill):
                     skill_instance = obj(self.context)
-                    self.skills.append(skill_instance)
+                    skills.append(skill_instance)
                     logging.info(f"Registered skill: {skill_instance.name}")
         except Exception as e:
+            if reload:
+                raise
             logging.error(f"Failed to load skill from {filepath}: {e}")
+        return skills
 
     def process(self, text: str) -> bool:
-        """Iterate through skills to see if one wants to handle the input."""
-        for skill in self.skills:
-            try:
-                if skill.handle(text):
-                    return True
-            except Exception as e:
-                logging.error(f"Error in skill {skill.name}: {e}")
-                self.context.speak(f"I encountered an error while executing {skill.name}.")
-                return True # We caught it, so it's 'handled' in a way
+        """Offers the input to candidate skills until one handles it."""
+        for skill in self.candidates(text):
+            if self.dispatch(skill, text):
+                return True
         return False
+
+    def submit(self, text: str, candidates=None, on_unhandled=None, on_done=None) -> bool:
+        """Routes `text` now (trigger matching only) and runs the candidate skills on the
+        executor, off the caller's (UI) thread. Returns False if no skill is a candidate.
+
+        on_unhandled() runs on the worker if every candidate declined; on_done(task)
+        runs once the task finished, failed, was cancelled or timed out.
+        """
+        candidates = self.candidates(text) if candidates is None else list(candidates)
+        if not candidates:
+            return False
+        name = candidates[0].name
+
+        def run():
+            for skill in candidates:
+                with self.run_locks.setdefault(skill, threading.Lock()):
+                    if self.dispatch(skill, text):
+                        return skill.name
+            return None
+
+        def done(task):
+            if on_done:
+                on_done(task)
+            if task.status == "done" and task.result is None and on_unhandled:
+                on_unhandled()
+            elif task.status == "timeout":
+                self.context.speak(f"{name} is taking too long, so I stopped it.")
+            elif task.status == "cancelled" and task.token.reason != "shutdown":
+                self.context.speak("Cancelled.")
+            elif task.status == "failed":
+                self.context.speak(f"I encountered an error while executing {name}.")
+
+        timeout = max(skill.timeout for skill in candidates)
+        if self.executor.submit(name, run, timeout=timeout, on_done=done) is None:
+            self.context.speak("I'm still busy with earlier requests. Please try again in a moment.")
+        return True
+
+    def dispatch(self, skill: BaseSkill, text: str) -> bool:
+        """Runs one skill on the input; errors are reported and count as handled."""
+        try:
+            with tracing.span(f"skill {skill.name}"):
+                return bool(skill.handle(text))
+        except Exception as e:
+            logging.error(f"Error in skill {skill.name}: {e}")
+            self.context.speak(f"I encountered an error while executing {skill.name}.")
+            return True # We caught it, so it's 'handled' in a way
@@ -0,0 +1,94 @@
+import logging
+import threading
+
+try:
+    import numpy as np
+    from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+    HAS_SPECULATIVE = True
+except Exception:
+    # llama_cpp only duck-types draft models, so the wrappers below still define cleanly
+    np = None
+    LlamaDraftModel = object
+    LlamaPromptLookupDecoding = None
+    HAS_SPECULATIVE = False
+
+DRAFT_PROMPT_LOOKUP = "prompt"
+
+class DraftStats:
+    """Proposed/accepted draft token counts for one drafting mode."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.proposed = 0
+        self.accepted = 0
+
+    def record(self, proposed: int, accepted: int):
+        with self.lock:
+            self.proposed += proposed
+            self.accepted += accepted
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            rate = self.accepted / self.proposed if self.proposed else 0.0
+            return {"generations": self.calls, "proposed": self.proposed,
+                    "accepted": self.accepted, "acceptance_rate": round(rate, 3)}
+
+def _matching_prefix(a, b) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if int(x) != int(y):
+            break
+        n += 1
+    return n
+
+class TrackingDraft(LlamaDraftModel):
+    """Wraps a draft model and measures how many proposed tokens the target accepted.
+
+    llama_cpp calls the draft with everything evaluated so far; tokens that appear in
+    the next call beyond the previous length and match the previous proposal were
+    accepted.
+    """
+    def __init__(self, inner, stats: DraftStats):
+        self.inner = inner
+        self.stats = stats
+        self.last_len = 0
+        self.last_draft = []
+        with stats.lock:
+            stats.calls += 1
+
+    def _settle(self, input_ids):
+        if len(self.last_draft):
+            accepted = _matching_prefix(input_ids[self.last_len:], self.last_draft)
+            self.stats.record(len(self.last_draft), accepted)
+        self.last_draft = []
+
+    def __call__(self, input_ids, /, **kwargs):
+        self._settle(input_ids)
+        draft = self.inner(input_ids, **kwargs)
+        self.last_len = len(input_ids)
+        self.last_draft = list(draft)
+        return draft
+
+    def finish(self, input_ids):
+        """Accounts for the final proposal once generation has ended."""
+        self._settle(input_ids)
+
+class LlamaModelDraft(LlamaDraftModel):
+    """Speculative decoding with a small GGUF model sharing the target's vocabulary.
+    Proposes the draft model's greedy continuation."""
+    def __init__(self, draft_llm, num_pred_tokens=6):
+        self.draft_llm = draft_llm
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, /, **kwargs):
+        proposal = []
+        try:
+            # reset=True lets llama_cpp reuse the draft's already-evaluated prefix
+            for token in self.draft_llm.generate(list(input_ids), top_k=1, temp=0.0, reset=True):
+                proposal.append(token)
+                if len(proposal) >= self.num_pred_tokens:
+                    break
+        except Exception as e:
+            logging.debug(f"Draft model failed, no proposal: {e}")
+            proposal = []
+        return np.array(proposal, dtype=np.intc)
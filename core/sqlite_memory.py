@@ -0,0 +1,337 @@
+"""
+SQLite-backed long-term memory with full-text search.
+
+Same public API as core.memory.Memory, selected with JARVIS_MEMORY_BACKEND=sqlite.
+Nothing is loaded into RAM at startup: preferences, facts ("fact_<timestamp>" keys),
+research knowledge ("knowledge_<query>" keys), learned commands and history live in
+their own tables, and facts, knowledge and history are indexed with FTS5 for search().
+
+On first use the existing JSON memory (snapshot and journal) is migrated; the JSON
+files are left untouched. Writes go into an open transaction that a background
+thread commits every flush interval (JARVIS_MEMORY_FLUSH_INTERVAL), so callers never
+wait for a disk sync; close() commits the rest.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, List
+
+from core.memory import Memory, FLUSH_INTERVAL, JOURNAL_SUFFIX
+from core.history_archive import STOPWORDS, keywords
+
+DEFAULT_DB_PATH = "jarvis_memory.db"
+
+FACT_PREFIX = "fact_"
+KNOWLEDGE_PREFIX = "knowledge_"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS preferences (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS learned_commands (trigger TEXT PRIMARY KEY, action TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS facts (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, text TEXT NOT NULL, created REAL);
+CREATE TABLE IF NOT EXISTS knowledge (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, topic TEXT NOT NULL,
+                                      summary TEXT NOT NULL, created REAL);
+CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY, ts REAL, role TEXT NOT NULL, content TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS history_ts ON history(ts);
+"""
+
+# External-content FTS5 tables kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS facts_fts USING fts5(text, content='facts', content_rowid='id');
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(topic, summary, content='knowledge', content_rowid='id');
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(content, content='history', content_rowid='id');
+
+CREATE TRIGGER IF NOT EXISTS facts_ai AFTER INSERT ON facts BEGIN
+    INSERT INTO facts_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS facts_ad AFTER DELETE ON facts BEGIN
+    INSERT INTO facts_fts(facts_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS facts_au AFTER UPDATE ON facts BEGIN
+    INSERT INTO facts_fts(facts_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO facts_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_ai AFTER INSERT ON knowledge BEGIN
+    INSERT INTO knowledge_fts(rowid, topic, summary) VALUES (new.id, new.topic, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_ad AFTER DELETE ON knowledge BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, topic, summary) VALUES ('delete', old.id, old.topic, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_au AFTER UPDATE ON knowledge BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, topic, summary) VALUES ('delete', old.id, old.topic, old.summary);
+    INSERT INTO knowledge_fts(rowid, topic, summary) VALUES (new.id, new.topic, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts(history_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+# kind -> query returning (key, content, score) for an FTS5 MATCH expression and a limit
+SEARCH_QUERIES = {
+    "facts": "SELECT f.key, f.text, bm25(facts_fts) FROM facts_fts JOIN facts f ON f.id = facts_fts.rowid "
+             "WHERE facts_fts MATCH ? ORDER BY bm25(facts_fts) LIMIT ?",
+    "knowledge": "SELECT k.key, k.topic || ': ' || k.summary, bm25(knowledge_fts) FROM knowledge_fts "
+                 "JOIN knowledge k ON k.id = knowledge_fts.rowid WHERE knowledge_fts MATCH ? ORDER BY bm25(knowledge_fts) LIMIT ?",
+    "history": "SELECT h.role, h.content, bm25(history_fts) FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+               "WHERE history_fts MATCH ? ORDER BY bm25(history_fts) LIMIT ?",
+}
+
+# Without FTS5 (rare sqlite builds) search falls back to substring matching
+LIKE_QUERIES = {
+    "facts": "SELECT key, text, 0 FROM facts WHERE text LIKE ? ORDER BY id DESC LIMIT ?",
+    "knowledge": "SELECT key, topic || ': ' || summary, 0 FROM knowledge WHERE topic LIKE ? OR summary LIKE ? ORDER BY id DESC LIMIT ?",
+    "history": "SELECT role, content, 0 FROM history WHERE content LIKE ? ORDER BY id DESC LIMIT ?",
+}
+
+def fts_query(text: str, op="OR") -> str:
+    """Free text as an FTS5 query: content words quoted (no operator injection), joined by op."""
+    words = re.findall(r"\w+", text.lower())
+    words = [w for w in words if w not in STOPWORDS] or words
+    return f" {op} ".join(f'"{w}"' for w in dict.fromkeys(words))
+
+class SQLiteMemory:
+    def __init__(self, db_path=None, json_path="jarvis_memory.json", flush_interval=None):
+        self.db_path = db_path or os.environ.get('JARVIS_MEMORY_DB', DEFAULT_DB_PATH)
+        self.json_path = json_path
+        self.flush_interval = float(flush_interval if flush_interval is not None
+                                    else os.environ.get('JARVIS_MEMORY_FLUSH_INTERVAL', FLUSH_INTERVAL))
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"SQLite FTS5 unavailable ({e}), memory search uses substring matching.")
+            self.has_fts = False
+        self.in_tx = False
+        self.closed = False
+        self.listeners = []
+        self.wake = threading.Event()
+        self._migrate()
+        self.flusher = None
+        if self.flush_interval > 0:
+            self.flusher = threading.Thread(target=self._flush_loop, daemon=True, name="memory-flusher")
+            self.flusher.start()
+
+    # --- Transactions ---
+
+    def _write(self, sql: str, params=()):
+        self._mutate(lambda: self.conn.execute(sql, params))
+
+    def _mutate(self, apply):
+        """Runs apply() in the open write transaction. No commit, no disk sync."""
+        with self.lock:
+            if not self.in_tx:
+                self.conn.execute("BEGIN")
+                self.in_tx = True
+            apply()
+        if self.flusher is None:
+            self.flush()
+        else:
+            self.wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self.wake.wait()
+            if self.closed:
+                return
+            time.sleep(self.flush_interval) # Let the rest of the burst arrive
+            self.wake.clear()
+            if self.closed:
+                return # close() was called during the sleep and commits itself
+            self.flush()
+
+    def flush(self):
+        """Commits pending writes."""
+        with self.lock:
+            if self.in_tx:
+                try:
+                    self.conn.execute("COMMIT")
+                except sqlite3.Error as e:
+                    logging.error(f"Failed to commit memory: {e}")
+                self.in_tx = False
+
+    def save(self):
+        self.flush()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        if self.flusher is not None and self.flusher is not threading.current_thread():
+            self.flusher.join(timeout=5.0)
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+    def _query(self, sql: str, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # --- Migration ---
+
+    def _migrate(self):
+        if self._query("SELECT value FROM meta WHERE key = 'migrated_from'"):
+            return
+        empty = not self._query("SELECT 1 FROM preferences UNION ALL SELECT 1 FROM history LIMIT 1")
+        if empty and self.json_path and (os.path.exists(self.json_path) or os.path.exists(self.json_path + JOURNAL_SUFFIX)):
+            started = time.perf_counter()
+            memory = Memory(self.json_path, read_only=True)
+            data = memory.data
+            with self.lock:
+                self.conn.execute("BEGIN")
+                for key, value in data.get("user_preferences", {}).items():
+                    self._set(key, value)
+                for trigger, action in data.get("learned_commands", {}).items():
+                    self.conn.execute("INSERT OR REPLACE INTO learned_commands VALUES (?, ?)", (trigger, action))
+                for item in memory.iter_history(): # Archived messages included
+                    self.conn.execute("INSERT INTO history (ts, role, content) VALUES (?, ?, ?)",
+                                      (item.get("ts"), item["role"], item["content"]))
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('migrated_from', ?)", (self.json_path,))
+                self.conn.execute("COMMIT")
+            memory.close()
+            logging.info(f"Memory migrated from {self.json_path} to {self.db_path} in {time.perf_counter() - started:.2f}s")
+        else:
+            with self.lock:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('migrated_from', '')")
+
+    # --- Public API (same as Memory) ---
+
+    def _set(self, key: str, value: Any):
+        # Runs inside a transaction; facts and research summaries get their own tables
+        now = time.time()
+        if key.startswith(FACT_PREFIX) and isinstance(value, str):
+            self.conn.execute("INSERT INTO facts (key, text, created) VALUES (?, ?, ?) "
+                              "ON CONFLICT(key) DO UPDATE SET text = excluded.text", (key, value, now))
+        elif key.startswith(KNOWLEDGE_PREFIX) and isinstance(value, str):
+            topic = key[len(KNOWLEDGE_PREFIX):].replace('_', ' ')
+            self.conn.execute("INSERT INTO knowledge (key, topic, summary, created) VALUES (?, ?, ?, ?) "
+                              "ON CONFLICT(key) DO UPDATE SET summary = excluded.summary, created = excluded.created",
+                              (key, topic, value, now))
+        else:
+            self.conn.execute("INSERT OR REPLACE INTO preferences VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_preference(self, key: str, default=None):
+        if key.startswith(FACT_PREFIX):
+            rows = self._query("SELECT text FROM facts WHERE key = ?", (key,))
+            if rows:
+                return rows[0][0]
+        elif key.startswith(KNOWLEDGE_PREFIX):
+            rows = self._query("SELECT summary FROM knowledge WHERE key = ?", (key,))
+            if rows:
+                return rows[0][0]
+        rows = self._query("SELECT value FROM preferences WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def set_preference(self, key: str, value: Any):
+        self._mutate(lambda: self._set(key, value))
+        self._notify("user_preferences", key, value)
+
+    def learn_command(self, trigger: str, action: str):
+        """Maps a user phrase to a specific action."""
+        self._write("INSERT OR REPLACE INTO learned_commands VALUES (?, ?)", (trigger.lower(), action))
+        self._notify("learned_commands", trigger.lower(), action)
+
+    def get_learned_command(self, text: str) -> str:
+        """Checks if the text matches a learned command."""
+        rows = self._query("SELECT action FROM learned_commands WHERE trigger = ?", (text.lower(),))
+        return rows[0][0] if rows else None
+
+    def add_history_item(self, role: str, content: str):
+        self._write("INSERT INTO history (ts, role, content) VALUES (?, ?, ?)", (time.time(), role, content))
+        self._notify("history", role, content)
+
+    def get_recent_history(self, limit=10):
+        rows = self._query("SELECT role, content FROM history ORDER BY id DESC LIMIT ?", (limit,))
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def iter_history(self, batch=1000):
+        """Every history message, oldest first, read in batches."""
+        last = 0
+        while True:
+            rows = self._query("SELECT id, role, content, ts FROM history WHERE id > ? ORDER BY id LIMIT ?", (last, batch))
+            if not rows:
+                return
+            for last, role, content, ts in rows:
+                yield {"role": role, "content": content, "ts": ts, "seq": last}
+
+    def history_between(self, start: float, end: float, limit=100, after=None) -> List[dict]:
+        """Messages with start <= ts < end, oldest first; see Memory.history_between.
+        seq is the row id."""
+        rows = self._query("SELECT id, role, content, ts FROM history WHERE ts >= ? AND ts < ? AND id > ? "
+                           "ORDER BY id LIMIT ?", (start, end, after or 0, limit))
+        return [{"role": role, "content": content, "ts": ts, "seq": seq} for seq, role, content, ts in rows]
+
+    def history_mentioning(self, text: str, limit=20, before=None) -> List[dict]:
+        """Messages containing every keyword of `text`, newest first; see
+        Memory.history_mentioning."""
+        terms = keywords(text)
+        if not terms:
+            return []
+        if self.has_fts:
+            rows = self._query("SELECT h.id, h.role, h.content, h.ts FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+                               "WHERE history_fts MATCH ? AND h.id < ? ORDER BY h.id DESC LIMIT ?",
+                               (fts_query(" ".join(terms), op="AND"), before or 2 ** 63 - 1, limit))
+        else:
+            where = " AND ".join("content LIKE ?" for _ in terms)
+            rows = self._query(f"SELECT id, role, content, ts FROM history WHERE {where} AND id < ? ORDER BY id DESC LIMIT ?",
+                               [f"%{term}%" for term in terms] + [before or 2 ** 63 - 1, limit])
+        return [{"role": role, "content": content, "ts": ts, "seq": seq} for seq, role, content, ts in rows]
+
+    def add_change_listener(self, callback):
+        """Registers callback(section, key, value); see Memory.add_change_listener."""
+        self.listeners.append(callback)
+
+    def _notify(self, section, key, value):
+        for callback in list(self.listeners):
+            try:
+                callback(section, key, value)
+            except Exception as e:
+                logging.error(f"Memory listener failed: {e}")
+
+    def iter_entries(self, batch=1000):
+        """(section, key, value) for every preference, fact, knowledge entry and history
+        message, read in batches."""
+        for key, value in self._query("SELECT key, value FROM preferences"):
+            yield "user_preferences", key, json.loads(value)
+        for key, text in self._query("SELECT key, text FROM facts ORDER BY id"):
+            yield "user_preferences", key, text
+        for key, summary in self._query("SELECT key, summary FROM knowledge ORDER BY id"):
+            yield "user_preferences", key, summary
+        for item in self.iter_history(batch):
+            yield "history", item["role"], item["content"]
+
+    # --- Lookup ---
+
+    def search(self, text: str, kinds=("facts", "knowledge", "history"), limit=10) -> List[dict]:
+        """Full-text search over facts, research knowledge and history, best first:
+        [{"kind", "key", "content", "score"}] (lower score is better; key is the role
+        for history)."""
+        results = []
+        if self.has_fts:
+            query = fts_query(text)
+            if not query:
+                return []
+            for kind in kinds:
+                for key, content, score in self._query(SEARCH_QUERIES[kind], (query, limit)):
+                    results.append({"kind": kind, "key": key, "content": content, "score": score})
+            results.sort(key=lambda r: r["score"])
+        else:
+            pattern = f"%{text}%"
+            for kind in kinds:
+                params = (pattern, pattern, limit) if kind == "knowledge" else (pattern, limit)
+                for key, content, score in self._query(LIKE_QUERIES[kind], params):
+                    results.append({"kind": kind, "key": key, "content": content, "score": score})
+        return results[:limit]
+
+    def facts(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT text FROM facts ORDER BY id")]
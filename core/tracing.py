@@ -0,0 +1,134 @@
+"""
+Per-turn latency tracing, exported as Chrome trace-event JSON (chrome://tracing, Perfetto).
+
+Enabled by JARVIS_TRACE: "1" writes jarvis_trace.json, any other value is the output
+path; unset (or "0") disables it and span()/record() return immediately. A turn ID is
+started where input arrives (end of speech, Send) and kept in a thread-local; the
+pipeline and the skill executor carry it to the threads that continue the turn, so
+every span lands on the turn that caused it.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import itertools
+import threading
+from collections import deque
+
+_setting = os.environ.get('JARVIS_TRACE', '').strip()
+ENABLED = _setting not in ('', '0')
+TRACE_PATH = 'jarvis_trace.json' if _setting == '1' else _setting
+MAX_EVENTS = int(os.environ.get('JARVIS_TRACE_MAX_EVENTS', 200000))
+
+_local = threading.local()
+_turns = itertools.count(1)
+_events = deque(maxlen=MAX_EVENTS)
+_threads = {}
+_pid = os.getpid()
+
+def enable(path=None):
+    """Turns tracing on at runtime (JARVIS_TRACE does it at startup)."""
+    global ENABLED, TRACE_PATH
+    ENABLED = True
+    TRACE_PATH = path or TRACE_PATH
+
+def events() -> list:
+    """Copy of the recorded events."""
+    return list(_events)
+
+def clear():
+    _events.clear()
+
+def _now_us() -> float:
+    return time.perf_counter() * 1e6
+
+def current_turn():
+    """Turn ID the calling thread is working on, or None."""
+    return getattr(_local, 'turn', None)
+
+def set_turn(turn):
+    _local.turn = turn
+
+def new_turn(source: str):
+    """Starts a turn on the calling thread. Returns its ID (None when tracing is off)."""
+    if not ENABLED:
+        return None
+    turn = next(_turns)
+    _local.turn = turn
+    instant("turn start", source=source)
+    return turn
+
+def _emit(event: dict):
+    thread = threading.current_thread()
+    if thread.ident not in _threads:
+        _threads[thread.ident] = thread.name
+    event.update(pid=_pid, tid=thread.ident)
+    turn = current_turn()
+    if turn is not None:
+        event.setdefault("args", {})["turn"] = turn
+    _events.append(event) # deque.append is atomic
+
+def record(name: str, start: float, end: float, **args):
+    """Records a span measured with time.perf_counter() timestamps."""
+    if not ENABLED:
+        return
+    _emit({"name": name, "cat": name.split(' ')[0], "ph": "X", "ts": start * 1e6,
+           "dur": (end - start) * 1e6, "args": args})
+
+def instant(name: str, **args):
+    if not ENABLED:
+        return
+    _emit({"name": name, "cat": name.split(' ')[0], "ph": "i", "s": "t", "ts": _now_us(), "args": args})
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter(), **self.args)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str, **args):
+    """Context manager timing a block: `with tracing.span("prompt build"): ...`"""
+    return _Span(name, args) if ENABLED else _NULL_SPAN
+
+def export(path=None) -> str:
+    """Writes the collected events as Chrome trace JSON. Returns the path written."""
+    path = path or TRACE_PATH or 'jarvis_trace.json'
+    recorded = list(_events)
+    meta = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(_threads.items())]
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": meta + recorded, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp, path)
+    logging.info(f"Trace with {len(recorded)} events written to {path}.")
+    return path
+
+def _export_at_exit():
+    try:
+        export()
+    except Exception as e:
+        logging.error(f"Failed to write trace: {e}")
+
+if ENABLED:
+    atexit.register(_export_at_exit)
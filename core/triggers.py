@@ -0,0 +1,130 @@
+"""
+Compiled trigger index for skill dispatch.
+
+Skills declare literal triggers as a class attribute:
+
+    triggers = [
+        ("prefix", "learn:", 10),     # normalized text starts with the pattern
+        ("keyword", "read screen"),   # pattern occurs anywhere in the normalized text
+        ("regex", r"\\.com$"),        # re.search on the normalized text
+    ]
+
+The optional third item is a priority; higher runs first (default 0). Keyword and
+prefix patterns go into one Aho-Corasick automaton, so a single pass over the input
+finds every skill whose literal triggers occur in it, however many skills are loaded.
+"""
+import re
+import logging
+from collections import deque
+
+TRIGGER_KINDS = ("keyword", "prefix", "regex")
+
+_EDGE_PUNCTUATION = " \t\r\n.?!,"
+_SPACES = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    """Lowercase, collapse whitespace and trim edge punctuation ("Hello, Jarvis!" -> "hello, jarvis")."""
+    return _SPACES.sub(" ", text.lower()).strip(_EDGE_PUNCTUATION)
+
+def _pattern(text: str) -> str:
+    # Patterns keep their edge spaces ("open " must not match "reopen" at the end)
+    return _SPACES.sub(" ", text.lower())
+
+class AhoCorasick:
+    """Multi-pattern substring matcher. add() patterns, build(), then iter_matches()."""
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.own = [[]] # state -> [(pattern_length, value)] ending exactly here
+        self.out = [[]] # own outputs plus those of the fail chain, filled by build()
+        self.built = True
+
+    def add(self, pattern: str, value):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.own.append([])
+            state = nxt
+        self.own[state].append((len(pattern), value))
+        self.built = False
+
+    def build(self):
+        self.out = [list(own) for own in self.own]
+        queue = deque(self.goto[0].values())
+        for state in queue:
+            self.fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+        self.built = True
+
+    def iter_matches(self, text: str):
+        """Yields (start, value) for every occurrence of every pattern."""
+        if not self.built:
+            self.build()
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for length, value in self.out[state]:
+                yield i - length + 1, value
+
+class TriggerIndex:
+    """Maps input text to the skills whose declared triggers match it."""
+    def __init__(self):
+        self.automaton = AhoCorasick()
+        self.regexes = [] # (compiled, skill, priority)
+        self.order = {} # skill -> registration order, the final tie-breaker
+        self.count = 0
+
+    def add(self, skill, triggers):
+        self.order.setdefault(skill, len(self.order))
+        for trigger in triggers:
+            try:
+                kind, pattern = trigger[0], trigger[1]
+                priority = int(trigger[2]) if len(trigger) > 2 else 0
+                if kind not in TRIGGER_KINDS:
+                    raise ValueError(f"unknown kind '{kind}'")
+                if kind == "regex":
+                    self.regexes.append((re.compile(pattern), skill, priority))
+                else:
+                    self.automaton.add(_pattern(pattern), (kind, skill, priority))
+                self.count += 1
+            except Exception as e:
+                logging.error(f"Invalid trigger {trigger!r} on {getattr(skill, 'name', skill)}: {e}")
+
+    def build(self):
+        self.automaton.build()
+
+    def match(self, text: str):
+        """Candidate skills for `text`, best first: priority, then earliest match, then
+        registration order."""
+        clean = normalize(text)
+        best = {} # skill -> (-priority, position)
+        def consider(skill, priority, position):
+            rank = (-priority, position)
+            if skill not in best or rank < best[skill]:
+                best[skill] = rank
+
+        for start, (kind, skill, priority) in self.automaton.iter_matches(clean):
+            if kind == "prefix" and start != 0:
+                continue
+            consider(skill, priority, start)
+        for regex, skill, priority in self.regexes:
+            m = regex.search(clean)
+            if m:
+                consider(skill, priority, m.start())
+
+        return sorted(best, key=lambda s: best[s] + (self.order[s],))
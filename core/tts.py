@@ -2,6 +2,7 @@ import threading
 import queue
 import logging
 import time
+import re
 
 try:
     import pyttsx3
@@ -10,18 +11,43 @@ except ImportError:
     pyttsx3 = None
     pythoncom = None
 
-class TTSManager:
+# End of sentence: terminal punctuation followed by whitespace (avoids splitting "3.14")
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+
+class SentenceBuffer:
+    """Accumulates streamed text and releases it one complete sentence at a time."""
     def __init__(self):
+        self.pending = ""
+
+    def feed(self, text: str):
+        """Adds a fragment and returns the sentences it completed."""
+        self.pending += text
+        parts = SENTENCE_END.split(self.pending)
+        self.pending = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self) -> str:
+        """Returns whatever is left over once the stream ends."""
+        rest = self.pending.strip()
+        self.pending = ""
+        return rest
+
+class TTSManager:
+    """Speaks text with pyttsx3. By default it owns a worker thread fed by speak();
+    with threaded=False the caller drives say() from one dedicated thread instead
+    (the engine's pipeline TTS stage)."""
+    def __init__(self, threaded=True):
         self.queue = queue.Queue()
         self.thread = threading.Thread(target=self._worker, daemon=True)
         self.running = True
         self.engine = None
+        self.init_failed = False
         self.is_speaking = False
         
-        if pyttsx3:
-            self.thread.start()
-        else:
+        if not pyttsx3:
             logging.warning("TTSManager: pyttsx3 not installed. Speech disabled.")
+        elif threaded:
+            self.thread.start()
 
     def speak(self, text):
         if not text:
@@ -29,8 +55,10 @@ class TTSManager:
         # Clean text (remove code blocks, etc. if needed)
         self.queue.put(text)
 
-    def _worker(self):
-        # Initialize engine ONLY in the worker thread
+    def _init_engine(self) -> bool:
+        # The engine must be created on the thread that speaks with it
+        if self.engine is not None or self.init_failed:
+            return self.engine is not None
         try:
             if pythoncom:
                 pythoncom.CoInitialize()
@@ -44,6 +72,28 @@ class TTSManager:
                     break
         except Exception as e:
             logging.error(f"TTSManager Init Error: {e}")
+            self.init_failed = True
+            return False
+        logging.info("TTSManager: Engine initialized.")
+        return True
+
+    def say(self, text):
+        """Speaks text and returns when done. Always call from the same thread."""
+        if not text or not pyttsx3 or not self._init_engine():
+            return
+        logging.info(f"TTSManager Speaking: {text[:50]}...")
+        self.is_speaking = True
+        try:
+            self.engine.say(text)
+            logging.debug("TTSManager: runAndWait starting...")
+            self.engine.runAndWait()
+            logging.debug("TTSManager: runAndWait finished.")
+        finally:
+            self.is_speaking = False
+
+    def _worker(self):
+        # Initialize engine ONLY in the worker thread
+        if not self._init_engine():
             return
 
         logging.info("TTSManager: Worker started.")
@@ -52,16 +102,7 @@ class TTSManager:
             try:
                 # Get text, wait max 1 sec to check running flag
                 text = self.queue.get(timeout=1.0)
-                
-                logging.info(f"TTSManager Speaking: {text[:50]}...")
-                
-                self.is_speaking = True
-                self.engine.say(text)
-                logging.debug("TTSManager: runAndWait starting...")
-                self.engine.runAndWait()
-                logging.debug("TTSManager: runAndWait finished.")
-                self.is_speaking = False
-                
+                self.say(text)
                 self.queue.task_done()
             except queue.Empty:
                 continue
@@ -74,3 +115,16 @@ class TTSManager:
         if self.thread.is_alive():
             self.thread.join(timeout=1.0)
         # pyttsx3 cleanup if needed (runAndWait handles dispatch)
+
+class NullTTS:
+    """Speaks nothing; for headless runs and benchmarks."""
+    is_speaking = False
+
+    def speak(self, text):
+        pass
+
+    def say(self, text):
+        pass
+
+    def stop(self):
+        pass
@@ -0,0 +1,217 @@
+"""
+Hardware auto-tuning of llama.cpp load parameters.
+
+Benchmarks prompt-eval and generation speed for candidate thread counts, batch sizes,
+GPU offload and context sizes, and stores the best profile per model file and machine
+in llm_profiles.json. LLMEngine.load_model applies stored profiles automatically.
+
+    python -m core.tuning D:\\models\\capybara\\capybarahermes-2.5-mistral-7b.Q5_0.gguf
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import platform
+import threading
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'llm_profiles.json')
+
+# Used when no tuned profile exists (tuned for an RTX 3050 4GB laptop)
+DEFAULT_PARAMS = {
+    "n_ctx": 4096,
+    "n_threads": 6,
+    "n_batch": 512,
+    "n_gpu_layers": 20,
+}
+
+# Shape of a typical chat turn, used to weigh prompt-eval against generation speed
+TURN_PROMPT_TOKENS = 1000
+TURN_REPLY_TOKENS = 200
+
+# A larger context is taken if a turn that fills it is at most this much slower than
+# one filling the smallest candidate context
+CONTEXT_SLOWDOWN = 1.25
+
+BENCH_TEXT = (
+    "J.A.R.V.I.S is a personal assistant that can open applications, search the web, "
+    "read the screen, control system settings and learn new commands from its user. "
+)
+
+def machine_id() -> str:
+    ident = "|".join([platform.node(), platform.system(), platform.machine(),
+                      platform.processor(), str(os.cpu_count())])
+    return hashlib.sha1(ident.encode('utf-8')).hexdigest()[:12]
+
+def model_id(model_path: str) -> str:
+    try:
+        size = os.path.getsize(model_path)
+    except OSError:
+        size = 0
+    return f"{os.path.basename(model_path)}:{size}"
+
+class ProfileStore:
+    """Tuned load parameters per machine and model file."""
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('JARVIS_LLM_PROFILES', DEFAULT_PROFILE_PATH)
+        self.lock = threading.Lock()
+        self.data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.data = json.load(f)
+            except Exception as e:
+                logging.error(f"Failed to load LLM profiles: {e}")
+
+    def get(self, model_path: str):
+        with self.lock:
+            return self.data.get(machine_id(), {}).get(model_id(model_path))
+
+    def params_for(self, model_path: str) -> dict:
+        """Load parameters for a model: tuned profile over the defaults."""
+        params = dict(DEFAULT_PARAMS)
+        profile = self.get(model_path)
+        if profile:
+            params.update(profile["params"])
+        return params
+
+    def set(self, model_path: str, params: dict, metrics: dict):
+        with self.lock:
+            self.data.setdefault(machine_id(), {})[model_id(model_path)] = {
+                "params": params,
+                "metrics": metrics,
+                "tuned": time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.data, f, indent=4)
+            os.replace(tmp, self.path)
+
+def gpu_offload_supported() -> bool:
+    try:
+        import llama_cpp
+        return bool(llama_cpp.llama_supports_gpu_offload())
+    except Exception:
+        return False
+
+class Tuner:
+    """Coordinate search over load parameters for one GGUF file.
+
+    Each dimension is tuned in turn (threads, batch, GPU layers) keeping the best
+    values found so far; the score is the estimated time of a typical turn. Context
+    sizes are then compared with prompts that fill each of them, since attention cost
+    only shows once the context is actually used.
+    """
+    def __init__(self, model_path: str, store=None, prompt_tokens=256, gen_tokens=32, log=print):
+        self.model_path = model_path
+        self.store = store or ProfileStore()
+        self.prompt_tokens = prompt_tokens
+        self.gen_tokens = gen_tokens
+        self.log = log
+
+    def candidates(self) -> dict:
+        cpus = os.cpu_count() or 4
+        threads = sorted({max(1, cpus // 4), max(1, cpus // 2), max(1, (3 * cpus) // 4), cpus})
+        return {
+            "n_threads": threads,
+            "n_batch": [128, 256, 512, 1024],
+            "n_gpu_layers": [0, 10, 20, 35, 99] if gpu_offload_supported() else [0],
+            "n_ctx": [2048, 4096, 8192],
+        }
+
+    def benchmark(self, params: dict, prompt_tokens=None):
+        """Returns (prompt_tps, gen_tps) or None if the model fails to load/run."""
+        from llama_cpp import Llama
+        llm = None
+        prompt_tokens = prompt_tokens or self.prompt_tokens
+        try:
+            llm = Llama(model_path=self.model_path, use_mmap=True, verbose=False, **params)
+            text = BENCH_TEXT * (prompt_tokens // 20 + 1)
+            tokens = llm.tokenize(text.encode('utf-8'))[:prompt_tokens]
+
+            started = time.perf_counter()
+            llm.eval(tokens)
+            prompt_tps = len(tokens) / (time.perf_counter() - started)
+
+            # The prompt is already evaluated, so this call only pays for decoding
+            prompt_text = llm.detokenize(tokens).decode('utf-8', errors='ignore')
+            started = time.perf_counter()
+            out = llm(prompt_text, max_tokens=self.gen_tokens, temperature=0.0)
+            generated = max(1, out['usage']['completion_tokens'])
+            gen_tps = generated / (time.perf_counter() - started)
+            return prompt_tps, gen_tps
+        except Exception as e:
+            logging.warning(f"Tuning: {params} failed: {e}")
+            return None
+        finally:
+            del llm
+
+    @staticmethod
+    def score(result) -> float:
+        prompt_tps, gen_tps = result
+        return TURN_PROMPT_TOKENS / prompt_tps + TURN_REPLY_TOKENS / gen_tps
+
+    def run(self) -> dict:
+        grid = self.candidates()
+        best = dict(DEFAULT_PARAMS)
+        best["n_ctx"] = 2048 # Tune speed on the cheapest context, then pick the largest affordable one
+        best_result = None
+        tried = {}
+
+        def measure(params, prompt_tokens=None):
+            key = json.dumps([params, prompt_tokens], sort_keys=True)
+            if key not in tried:
+                tried[key] = self.benchmark(params, prompt_tokens)
+                if tried[key]:
+                    self.log(f"  {params} ({prompt_tokens or self.prompt_tokens} prompt tokens) -> "
+                             f"prompt {tried[key][0]:.1f} tok/s, gen {tried[key][1]:.1f} tok/s")
+            return tried[key]
+
+        for dim in ("n_threads", "n_batch", "n_gpu_layers"):
+            self.log(f"Tuning {dim}...")
+            for value in grid[dim]:
+                params = dict(best, **{dim: value})
+                result = measure(params)
+                if result and (best_result is None or self.score(result) < self.score(best_result)):
+                    best, best_result = params, result
+
+        if best_result is None:
+            raise RuntimeError(f"No candidate configuration could run {self.model_path}")
+
+        # Largest context whose full-context turn stays within CONTEXT_SLOWDOWN of the
+        # smallest one's; the prompt fills each candidate, leaving room for the reply
+        self.log("Tuning n_ctx...")
+        chosen, chosen_result, baseline = best, best_result, None
+        for value in sorted(grid["n_ctx"]):
+            params = dict(best, n_ctx=value)
+            result = measure(params, prompt_tokens=value - self.gen_tokens - 16)
+            if not result:
+                continue
+            if baseline is None:
+                baseline = self.score(result)
+            if self.score(result) <= baseline * CONTEXT_SLOWDOWN:
+                chosen, chosen_result = params, result
+        best, best_result = chosen, chosen_result
+
+        metrics = {"prompt_tps": round(best_result[0], 2), "gen_tps": round(best_result[1], 2)}
+        self.store.set(self.model_path, best, metrics)
+        self.log(f"Best profile: {best} ({metrics})")
+        return best
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark llama.cpp parameters for a GGUF model and store the best profile.")
+    parser.add_argument("model_path", help="Path to the .gguf model file")
+    parser.add_argument("--prompt-tokens", type=int, default=256)
+    parser.add_argument("--gen-tokens", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.model_path):
+        print(f"Model file missing: {args.model_path}")
+        return 1
+    Tuner(args.model_path, prompt_tokens=args.prompt_tokens, gen_tokens=args.gen_tokens).run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
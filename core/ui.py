@@ -3,6 +3,8 @@ import threading
 import queue
 import logging
 
+from core import tracing
+
 class BaseUI(abc.ABC):
     @abc.abstractmethod
     def display_message(self, text: str, sender: str = "JARVIS"):
@@ -21,10 +23,37 @@ class BaseUI(abc.ABC):
     def start(self):
         pass
 
+    def stream_message(self, text: str, sender: str = "JARVIS"):
+        """Appends a fragment to the message currently being streamed.
+        UIs without incremental rendering buffer it until end_stream()."""
+        self._stream_parts = getattr(self, '_stream_parts', [])
+        self._stream_parts.append(text)
+
+    def end_stream(self, sender: str = "JARVIS"):
+        """Finishes the message started by stream_message()."""
+        parts = getattr(self, '_stream_parts', [])
+        self._stream_parts = []
+        if parts:
+            self.display_message("".join(parts), sender)
+
 class ConsoleUI(BaseUI):
+    def __init__(self):
+        self._streaming = False
+
     def display_message(self, text: str, sender: str = "JARVIS"):
         print(f"\n[{sender}]: {text}")
 
+    def stream_message(self, text: str, sender: str = "JARVIS"):
+        if not self._streaming:
+            print(f"\n[{sender}]: ", end="")
+            self._streaming = True
+        print(text, end="", flush=True)
+
+    def end_stream(self, sender: str = "JARVIS"):
+        if self._streaming:
+            print()
+            self._streaming = False
+
     def set_status(self, text: str):
         # Console doesn't really have a status bar, maybe just log it
         pass
@@ -39,6 +68,26 @@ class ConsoleUI(BaseUI):
         # CLI doesn't need a mainloop setup
         pass
 
+class NullUI(BaseUI):
+    """Discards all output; for headless runs and benchmarks."""
+    def display_message(self, text: str, sender: str = "JARVIS"):
+        pass
+
+    def stream_message(self, text: str, sender: str = "JARVIS"):
+        pass
+
+    def end_stream(self, sender: str = "JARVIS"):
+        pass
+
+    def set_status(self, text: str):
+        pass
+
+    def get_input(self) -> str:
+        return ""
+
+    def start(self):
+        pass
+
 # Try importing Tkinter
 try:
     import tkinter as tk
@@ -60,6 +109,7 @@ class TkinterUI(BaseUI):
         # Queue for thread-safe UI updates
         self.msg_queue = queue.Queue()
         self.ready_event = threading.Event()
+        self._streaming = False # Only touched from the Tk thread
 
     def _setup_window(self):
         self.root = tk.Tk()
@@ -144,6 +194,22 @@ class TkinterUI(BaseUI):
                     self.chat_area.insert(tk.END, f"{text}\n")
                     self.chat_area.see(tk.END)
                     self.chat_area.configure(state='disabled')
+                elif msg_type == "partial":
+                    sender, text = content
+                    self.chat_area.configure(state='normal')
+                    if not self._streaming:
+                        self.chat_area.tag_config("jarvis", foreground="#00ffcc")
+                        self.chat_area.insert(tk.END, f"\n[{sender}]: ", "jarvis")
+                        self._streaming = True
+                    self.chat_area.insert(tk.END, text)
+                    self.chat_area.see(tk.END)
+                    self.chat_area.configure(state='disabled')
+                elif msg_type == "partial_end":
+                    if self._streaming:
+                        self.chat_area.configure(state='normal')
+                        self.chat_area.insert(tk.END, "\n")
+                        self.chat_area.configure(state='disabled')
+                        self._streaming = False
                 elif msg_type == "status":
                     self.status_var.set(content)
         except queue.Empty:
@@ -158,6 +224,7 @@ class TkinterUI(BaseUI):
         text = self.entry.get().strip()
         if text:
             self.entry.delete(0, tk.END)
+            tracing.new_turn("text")
             self.callback_handler(text)
 
     def _on_close(self):
@@ -167,6 +234,12 @@ class TkinterUI(BaseUI):
     def display_message(self, text: str, sender: str = "JARVIS"):
         self.msg_queue.put(("msg", (sender, text)))
 
+    def stream_message(self, text: str, sender: str = "JARVIS"):
+        self.msg_queue.put(("partial", (sender, text)))
+
+    def end_stream(self, sender: str = "JARVIS"):
+        self.msg_queue.put(("partial_end", sender))
+
     def set_status(self, text: str):
         self.msg_queue.put(("status", text))
 
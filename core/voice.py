@@ -4,6 +4,8 @@ import logging
 import queue
 import numpy as np
 
+from core import tracing
+
 
 sr_error = None
 try:
@@ -114,6 +116,7 @@ class VoiceManager:
         buffer = []
         is_speaking = False
         silence_chunks = 0
+        speech_start = None
         
         # Calculate chunks for silence duration
         chunks_per_sec = self.SAMPLE_RATE / self.BLOCK_SIZE
@@ -141,6 +144,8 @@ class VoiceManager:
             # For now, keeping static is safer to avoid drift loops
             
             if energy > self.SILENCE_THRESHOLD:
+                if not is_speaking:
+                    speech_start = time.perf_counter()
                 is_speaking = True
                 silence_chunks = 0
                 buffer.append(chunk)
@@ -152,9 +157,17 @@ class VoiceManager:
                     if silence_chunks > silence_limit:
                         # End of utterance
                         logging.info("VoiceManager: End of speech detected. Processing...")
-                        # Spawn thread to recognize so we don't block VAD
+                        tracing.new_turn("voice")
+                        tracing.record("vad", speech_start, time.perf_counter(), chunks=len(buffer))
+                        # Recognition runs on the pipeline's ASR stage so we don't block VAD
                         full_audio = np.concatenate(buffer)
-                        threading.Thread(target=self._recognize_audio, args=(full_audio,), daemon=True).start()
+                        pipeline = getattr(self.engine, 'pipeline', None)
+                        if pipeline:
+                            pipeline.submit("asr", full_audio)
+                        else:
+                            command = self.recognize(full_audio)
+                            if command:
+                                self.engine.handle_input(command)
                         
                         # Reset
                         buffer = []
@@ -164,7 +177,8 @@ class VoiceManager:
                     # Pre-roll buffer could go here
                     pass
 
-    def _recognize_audio(self, audio_data):
+    def recognize(self, audio_data):
+        """Transcribes one utterance. Returns the command after the wake word, or None."""
         try:
             # Create AudioData
             audio_bytes = audio_data.tobytes()
@@ -185,9 +199,9 @@ class VoiceManager:
                 parts = text.split(self.wake_word, 1)
                 if len(parts) > 1 and parts[1].strip():
                     command = parts[1].strip()
-                    self.engine.handle_input(command)
                     if hasattr(self.engine, 'ui'):
                         self.engine.ui.set_status("Processing Command...")
+                    return command
                     
             elif "stop" in text and "listening" in text:
                  self.engine.speak("Pausing voice.")
@@ -199,3 +213,4 @@ class VoiceManager:
             logging.error(f"VoiceManager API Error: {e}")
         except Exception as e:
             logging.error(f"VoiceManager Unexpected Error: {e}")
+        return None
@@ -0,0 +1,100 @@
+import os
+import time
+import logging
+import threading
+
+try:
+    from inotify_simple import INotify, flags
+except Exception:
+    INotify = None
+
+class FileWatcher:
+    """Watches a directory for changed, added or removed *.py files and calls
+    on_change(changed_paths, removed_paths) after a short quiet period.
+
+    Uses inotify (inotify_simple, Linux) when available, else polls mtimes.
+    """
+    def __init__(self, directory: str, on_change, interval=1.0, debounce=0.3, suffix=".py"):
+        self.directory = directory
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.suffix = suffix
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.mode = "inotify" if INotify is not None else "polling"
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        target = self._run_inotify if self.mode == "inotify" else self._run_polling
+        self.thread = threading.Thread(target=target, daemon=True, name="skill-watcher")
+        self.thread.start()
+        logging.info(f"Watching {self.directory} for changes ({self.mode}).")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _wanted(self, name: str) -> bool:
+        return name.endswith(self.suffix) and not name.startswith(('__', '.'))
+
+    def _snapshot(self) -> dict:
+        snap = {}
+        try:
+            for name in os.listdir(self.directory):
+                if self._wanted(name):
+                    path = os.path.join(self.directory, name)
+                    try:
+                        st = os.stat(path)
+                        snap[path] = (st.st_mtime, st.st_size)
+                    except OSError:
+                        pass
+        except OSError as e:
+            logging.warning(f"Watcher: cannot list {self.directory}: {e}")
+        return snap
+
+    def _emit(self, changed, removed):
+        if not changed and not removed:
+            return
+        try:
+            self.on_change(sorted(changed), sorted(removed))
+        except Exception as e:
+            logging.error(f"Watcher callback failed: {e}")
+
+    def _run_polling(self):
+        previous = self._snapshot()
+        while not self.stop_event.wait(self.interval):
+            current = self._snapshot()
+            if current == previous:
+                continue
+            # Let editors finish writing (save = truncate + write, or write + rename)
+            time.sleep(self.debounce)
+            current = self._snapshot()
+            changed = [p for p, sig in current.items() if previous.get(p) != sig]
+            removed = [p for p in previous if p not in current]
+            previous = current
+            self._emit(changed, removed)
+
+    def _run_inotify(self):
+        inotify = INotify()
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE | flags.MOVED_FROM
+        try:
+            inotify.add_watch(self.directory, mask)
+        except OSError as e:
+            logging.warning(f"Watcher: inotify unavailable ({e}), polling instead.")
+            self.mode = "polling"
+            self._run_polling()
+            return
+        pending = set()
+        while not self.stop_event.is_set():
+            events = inotify.read(timeout=int(self.debounce * 1000) if pending else int(self.interval * 1000))
+            names = {e.name for e in events if self._wanted(e.name)}
+            if names:
+                pending |= names
+                continue # Keep collecting until the burst of events is over
+            if pending:
+                paths = [os.path.join(self.directory, n) for n in pending]
+                pending = set()
+                self._emit([p for p in paths if os.path.exists(p)], [p for p in paths if not os.path.exists(p)])
+        inotify.close()
@@ -6,6 +6,7 @@ from core.skills import BaseSkill
 class AppControlSkill(BaseSkill):
     name = "AppControl"
     description = "Opens and closes applications."
+    triggers = [("keyword", "open", 1)]
     
     def __init__(self, context):
         super().__init__(context)
@@ -1,15 +1,25 @@
 from core.skills import BaseSkill
+from core.grammars import SHELL_COMMAND_GBNF
 import subprocess
 import logging
 
 class AutomationSkill(BaseSkill):
     name = "AutomationSkill"
     description = "Controls the system via PowerShell commands."
+    triggers = [
+        ("keyword", "open "), ("keyword", "close "), ("keyword", "create "), ("keyword", "delete "),
+        ("keyword", "set volume"), ("keyword", "shutdown"), ("keyword", "restart"),
+    ]
+
+    timeout = 120.0
 
     def __init__(self, context):
         super().__init__(context)
         self.pending_command = None
 
+    def expects_followup(self) -> bool:
+        return self.pending_command is not None
+
     def handle(self, text: str) -> bool:
         lower = text.lower().strip()
         
@@ -53,7 +63,10 @@ class AutomationSkill(BaseSkill):
         - If it involves volume, use nircmd or wscript, or just say #Impossible if too hard without tools.
         - Example: "Create folder test" -> "mkdir test"
         """
-        command = self.context.llm_query(prompt).strip().strip('`').strip()
+        # The grammar stops decoding at the end of the first line and rules out markdown.
+        # Exact-prompt caching only: "My-Docs" and "my docs" are different folders.
+        command = self.context.llm_query(prompt, caller=self.name, cache="exact", intent="command",
+                                         grammar=SHELL_COMMAND_GBNF).strip().strip('`').strip()
         
         if "Impossible" in command or len(command) > 200:
              self.context.speak("I am sorry, I can't generate a safe command for that.")
@@ -1,11 +1,28 @@
+import os
 import subprocess
+from core.skills import BaseSkill
+from core.llm import is_error_response
 
 class DevSkill(BaseSkill):
     name = "DevMode"
     description = "Generates and saves code using CodeLlama."
+    triggers = [
+        ("keyword", "enable coding mode", 5), ("keyword", "start coding mode", 5),
+        ("keyword", "disable coding mode", 5), ("keyword", "normal mode", 5), ("keyword", "exit coding mode", 5),
+        ("keyword", "run code", 5), ("keyword", "debug code", 5), ("keyword", "fix code", 5), ("keyword", "it failed", 5),
+        ("keyword", "write code", 5), ("keyword", "create python script", 5), ("keyword", "generate code", 5),
+    ]
+    # No intent router examples: switching modes loads a model and "run code" executes a script
+
+    timeout = 600.0 # Loading CodeLlama plus a full generation
 
     CODING_MODEL = r"D:\models\codellama\codellama-7b-instruct.Q5_K_M.gguf"
 
+    def __init__(self, context):
+        super().__init__(context)
+        # Code requests always go to CodeLlama; the model pool keeps it resident next to the chat model
+        self.context.engine.llm.register_model("coding", os.environ.get('CODELLAMA_MODEL_PATH', self.CODING_MODEL))
+
     def handle(self, text: str) -> bool:
         print(f"DEBUG: DevSkill handle called with: '{text}'")
         lower = text.lower()
@@ -32,39 +49,32 @@ class DevSkill(BaseSkill):
         return False
 
     def switch_to_coding(self):
-        current_path = self.context.engine.llm.current_model_path
-        if current_path == self.CODING_MODEL:
+        llm = self.context.engine.llm
+        if llm.active_model == "coding":
             self.context.speak("I am already in Coding Mode.")
             return
 
         self.context.speak("Switching to CodeLlama model. This may take a moment...")
-        success = self.context.engine.llm.reload_model(self.CODING_MODEL)
+        success = llm.set_active_model("coding")
         if success:
             self.context.speak("Coding Mode Enabled. Initialized CodeLlama 7B.")
         else:
-             self.context.speak("Failed to load CodeLlama. Reverting to default.")
-             self.context.engine.llm.reload_model(self.context.engine.llm.default_model_path)
+             self.context.speak("Failed to load CodeLlama. Staying on the default model.")
 
     def switch_to_normal(self):
-        default = self.context.engine.llm.default_model_path
-        if self.context.engine.llm.current_model_path == default:
+        llm = self.context.engine.llm
+        if llm.active_model == "default":
             self.context.speak("I am already in Normal Mode.")
             return
 
         self.context.speak("Reverting to standard conversation model...")
-        success = self.context.engine.llm.reload_model(default)
+        success = llm.set_active_model("default")
         if success:
              self.context.speak("Normal Mode Enabled.")
         else:
              self.context.speak("Error reverting model. System check required.")
 
     def start_dev_session(self, trigger_text):
-        # Auto-switch
-        if self.context.engine.llm.current_model_path != self.CODING_MODEL:
-             self.context.speak("Using Coding Model...")
-             self.switch_to_coding()
-             if self.context.engine.llm.current_model_path != self.CODING_MODEL: return
-
         prompt = trigger_text
         if len(prompt.split()) < 4:
             self.context.speak("Please describe the code.")
@@ -73,7 +83,11 @@ class DevSkill(BaseSkill):
         full_prompt = f"Write a complete, runnable Python script for: {prompt}. Return ONLY code."
         
         self.context.speak("Generating code...")
-        code = self.context.llm_query(full_prompt).replace("```python", "").replace("```", "").strip()
+        code = self.context.llm_query(full_prompt, model="coding", caller=self.name, intent="code")
+        if is_error_response(code):
+            self.context.speak(f"Code generation failed: {code}")
+            return
+        code = code.replace("```python", "").replace("```", "").strip()
         
         filename = "generated_script.py"
         try:
@@ -118,7 +132,12 @@ class DevSkill(BaseSkill):
             Return ONLY the fixed code. No markdown.
             """
             
-            fixed_code = self.context.llm_query(fix_prompt).replace("```python", "").replace("```", "").strip()
+            fixed_code = self.context.llm_query(fix_prompt, model="coding", caller=self.name, draft="prompt", intent="code")
+            if is_error_response(fixed_code):
+                # Keep the broken script rather than overwrite it with the error text
+                self.context.speak(f"Auto-fix failed: {fixed_code}")
+                return
+            fixed_code = fixed_code.replace("```python", "").replace("```", "").strip()
             
             with open(filename, "w") as f: f.write(fixed_code)
             self.context.speak("Applied fix. Say 'run code' to verify.")
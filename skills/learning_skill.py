@@ -3,6 +3,7 @@ from core.skills import BaseSkill
 class LearningSkill(BaseSkill):
     name = "SelfLearning"
     description = "Allows the user to teach Jarvis custom commands."
+    triggers = [("prefix", "learn:", 10)]
 
     def handle(self, text: str) -> bool:
         # Syntax: "Learn: when I say <phrase> do <action>"
@@ -3,11 +3,15 @@ from ddgs import DDGS
 import requests
 from bs4 import BeautifulSoup
 import logging
-import threading
 
 class ResearchSkill(BaseSkill):
     name = "ResearchSkill"
     description = "Searches the web and learns from content."
+    triggers = [
+        ("prefix", "research", 5), ("prefix", "learn about", 5),
+        ("prefix", "find out about", 5), ("prefix", "search for", 5),
+    ]
+    timeout = 300.0 # Runs inline on the skill executor: search, scrape and summarize
 
     def __init__(self, context):
         super().__init__(context)
@@ -21,7 +25,7 @@ class ResearchSkill(BaseSkill):
             if text.lower().startswith(t):
                 query = text[len(t):].strip()
                 if query:
-                    threading.Thread(target=self.perform_research, args=(query,)).start()
+                    self.perform_research(query)
                     return True
         return False
 
@@ -36,8 +40,8 @@ class ResearchSkill(BaseSkill):
                 self.context.speak(f"I couldn't find any information on {query}.")
                 return
 
-            # 2. Scrape & Aggregate
-            aggregated_text = ""
+            # 2. Scrape
+            pages = []
             for r in results:
                 url = r['href']
                 try:
@@ -45,18 +49,36 @@ class ResearchSkill(BaseSkill):
                     soup = BeautifulSoup(resp.content, 'html.parser')
                     # Get paragraphs
                     paragraphs = soup.find_all('p')
-                    text_content = " ".join([p.get_text() for p in paragraphs[:5]]) # First 5 paragraphs per site
-                    aggregated_text += f"\nSource: {r['title']}\n{text_content[:1000]}\n"
+                    text_content = " ".join([p.get_text() for p in paragraphs[:8]]) # First 8 paragraphs per site
+                    if text_content.strip():
+                        pages.append((r['title'], text_content[:3000]))
                 except Exception:
                     continue
             
-            if not aggregated_text:
+            self.context.check_cancelled()
+            if not pages:
                 # Fallback to snippets
-                aggregated_text = "\n".join([f"{r['title']}: {r['body']}" for r in results])
+                pages = [(r['title'], r['body']) for r in results]
 
-            # 3. Summarize with LLM
-            prompt = f"The user asked to research '{query}'. Here is the raw data gathered from the web:\n{aggregated_text}\n\nProvide a comprehensive and concise summary of this information."
-            summary = self.context.llm_query(prompt)
+            # 3. Summarize each source (batched), then combine the notes
+            map_prompts = [
+                f"The user asked to research '{query}'. Here is text from the web page '{title}':\n{text}\n\n"
+                f"Summarize the information relevant to '{query}' in a few sentences."
+                for title, text in pages
+            ]
+            notes = [r.text for r in self.context.llm_batch(map_prompts, max_tokens=256, priority="background",
+                                                            caller=self.name, cache=True, draft="prompt", intent="summary") if r.ok]
+            if not notes:
+                self.context.speak("I found sources but couldn't summarize them right now.")
+                return
+
+            if len(notes) == 1:
+                summary = notes[0]
+            else:
+                sources = "\n".join(f"- {note}" for note in notes)
+                prompt = f"The user asked to research '{query}'. Here are notes from {len(notes)} web sources:\n{sources}\n\nProvide a comprehensive and concise summary of this information."
+                summary = self.context.llm_query(prompt, priority="background", caller=self.name, cache=True, draft="prompt",
+                                                intent="summary")
             
             self.context.speak(f"Here is what I found about {query}.")
             self.context.speak(summary)
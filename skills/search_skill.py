@@ -5,6 +5,7 @@ from core.skills import BaseSkill
 class SearchSkill(BaseSkill):
     name = "Search"
     description = "Searches Google or opens websites."
+    triggers = [("keyword", "search for"), ("keyword", "google"), ("prefix", "www."), ("regex", r"\.com$")]
 
     def handle(self, text: str) -> bool:
         lower = text.lower()
@@ -5,6 +5,21 @@ import time
 class SmallTalkSkill(BaseSkill):
     name = "SmallTalk"
     description = "Handles basic conversation when LLM is offline."
+    # Lowest priority: "jarvis, open notepad" is a command, not small talk
+    triggers = [
+        ("regex", r"^(hi|hey|yo|bye)$", -5),
+        ("keyword", "hello", -5), ("keyword", "how are you", -5), ("keyword", "who are you", -5),
+        ("keyword", "what can you do", -5), ("keyword", "thank you", -5), ("keyword", "thanks", -5),
+        ("keyword", "good morning", -5), ("keyword", "good night", -5), ("keyword", "jarvis", -5),
+        ("keyword", "what time", -5), ("keyword", "current time", -5),
+    ]
+    examples = {
+        "what can you do": ["what are your abilities", "what are you capable of", "list your features"],
+        "who are you": ["introduce yourself", "tell me about yourself"],
+        "what time": ["tell me the hour", "what's the clock say", "do you know the time"],
+    }
+
+    PUNCTUATION = str.maketrans('', '', '.?!,')
 
     def __init__(self, context):
         super().__init__(context)
@@ -26,29 +41,18 @@ class SmallTalkSkill(BaseSkill):
 
     def handle(self, text: str) -> bool:
         # [FIX] Robust stripping of punctuation and whitespace
-        clean_text = text.lower().strip()
-        for char in '.?!,':
-            clean_text = clean_text.replace(char, '')
-        clean_text = clean_text.strip()
-        
-        # Exact match or simple containment
-        for key, replies in self.responses.items():
-            # Check for exact match OR (key is prevalent and text is short)
-            if clean_text == key:
-                response = random.choice(replies)
-                self.context.speak(response)
-                self.context.memory.add_history_item("user", text)
-                self.context.memory.add_history_item("assistant", response)
-                return True
-            
-            # Substring match for longer phrases (avoid matching "hi" in "history")
-            if len(key) > 3 and key in clean_text:
-                response = random.choice(replies)
-                self.context.speak(response)
-                # We need to manually add to history since we bypassing engine LLM logic
-                self.context.memory.add_history_item("user", text)
-                self.context.memory.add_history_item("assistant", response)
-                return True
+        clean_text = text.lower().translate(self.PUNCTUATION).strip()
+
+        # Exact match, else containment for longer phrases (avoid matching "hi" in "history")
+        key = clean_text if clean_text in self.responses else next(
+            (k for k in self.responses if len(k) > 3 and k in clean_text), None)
+        if key:
+            response = random.choice(self.responses[key])
+            self.context.speak(response)
+            # We need to manually add to history since we bypassing engine LLM logic
+            self.context.memory.add_history_item("user", text)
+            self.context.memory.add_history_item("assistant", response)
+            return True
                 
         # Time/Date checks (Engine fallback covers this, but Skill is faster)
         if "what time" in clean_text or "current time" in clean_text:
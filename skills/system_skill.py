@@ -13,6 +13,17 @@ except ImportError:
 class SystemSkill(BaseSkill):
     name = "SystemControl"
     description = "Controls Volume, Brightness, and System Power."
+    triggers = [
+        ("keyword", "volume", 5), ("keyword", "shutdown pc", 5), ("keyword", "turn off computer", 5),
+        ("keyword", "restart pc", 5), ("keyword", "screenshot", 5), ("keyword", "battery", 5),
+    ]
+    # Paraphrases for the intent router; power actions and screenshots are deliberately left out
+    examples = {
+        "volume up": ["bump the sound", "make it louder", "turn the sound up", "raise the audio", "louder please"],
+        "volume down": ["make it quieter", "turn the sound down", "lower the audio", "that's too loud"],
+        "volume mute": ["silence the speakers", "kill the sound", "mute the audio"],
+        "battery": ["how much charge is left", "what's my power level", "am i plugged in"],
+    }
 
     def mute(self):
         ctypes.windll.user32.keybd_event(0xAD, 0, 0, 0)
@@ -8,6 +8,18 @@ import logging
 class VisionSkill(BaseSkill):
     name = "VisionSkill"
     description = "Allows Jarvis to see the screen and read text using OCR."
+    triggers = [
+        ("keyword", "read screen", 5), ("keyword", "read my screen", 5), ("keyword", "what is on my screen", 5),
+        ("keyword", "what's on my screen", 5), ("keyword", "scan screen", 5), ("keyword", "scan this", 5),
+    ]
+    examples = {
+        "read screen": ["look at my display", "what does my monitor show", "tell me what's displayed",
+                        "read the text on my monitor", "check what i'm looking at"],
+    }
+
+    OCR_CHUNK = 2000    # Characters per summarized chunk
+    OCR_MAX = 12000     # Text beyond this is ignored
+    timeout = 180.0
 
     def __init__(self, context):
         super().__init__(context)
@@ -35,6 +47,7 @@ class VisionSkill(BaseSkill):
             
             # OCR
             text = pytesseract.image_to_string(screenshot)
+            self.context.check_cancelled()
             
             if not text.strip():
                 self.context.speak("I couldn't detect any clear text on the screen.")
@@ -43,8 +56,7 @@ class VisionSkill(BaseSkill):
             # Summarize or read it
             if len(text) > 500:
                 self.context.speak("I've captured the screen content. It's quite long, so I'll summarize it.")
-                prompt = f"The following is text extracted from the user's screen via OCR. Summarize it and capture the key information:\n\n{text[:4000]}"
-                summary = self.context.llm_query(prompt)
+                summary = self.summarize(text)
                 self.context.speak(summary)
             else:
                 self.context.speak(f"Here is what I see: {text}")
@@ -55,3 +67,22 @@ class VisionSkill(BaseSkill):
         except Exception as e:
             logging.error(f"Vision error: {e}")
             self.context.speak("I encountered an error while trying to read the screen.")
+
+    def summarize(self, text):
+        """Summarizes each OCR chunk (batched), then merges the partial summaries."""
+        header = "The following is text extracted from the user's screen via OCR."
+        chunks = [text[i:i + self.OCR_CHUNK] for i in range(0, min(len(text), self.OCR_MAX), self.OCR_CHUNK)]
+        if len(chunks) == 1:
+            prompt = f"{header} Summarize it and capture the key information:\n\n{chunks[0]}"
+            return self.context.llm_query(prompt, caller=self.name, cache=True, draft="prompt", intent="summary")
+
+        prompts = [f"{header} This is part {i + 1} of {len(chunks)}. Capture its key information briefly:\n\n{chunk}"
+                   for i, chunk in enumerate(chunks)]
+        parts = [r.text for r in self.context.llm_batch(prompts, max_tokens=200, caller=self.name,
+                                                        cache=True, draft="prompt", intent="summary") if r.ok]
+        if not parts:
+            return "I couldn't summarize the screen content right now."
+        self.context.check_cancelled()
+        notes = "\n".join(f"- {part}" for part in parts)
+        prompt = f"{header} Here are notes on each part of the screen:\n{notes}\n\nSummarize the screen and capture the key information."
+        return self.context.llm_query(prompt, caller=self.name, cache=True, intent="summary")
@@ -0,0 +1,20 @@
+import os
+import sys
+
+# The repository root holds the core/ and skills/ packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from core.backends import StubBackend
+from core.llm import LLMEngine
+
+@pytest.fixture
+def make_llm(monkeypatch, tmp_path):
+    """Builds a fresh LLMEngine around a backend; the singleton is reset per test."""
+    monkeypatch.setenv('JARVIS_RESPONSE_CACHE', str(tmp_path / "response_cache.json"))
+    def make(backend=None, model_path="stub.gguf"):
+        monkeypatch.setattr(LLMEngine, "_instance", None)
+        return LLMEngine(model_path=model_path, backend=backend or StubBackend())
+    yield make
+    LLMEngine._instance = None
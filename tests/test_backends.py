@@ -0,0 +1,84 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import backends
+from core.backends import OpenAIHTTPBackend, StubBackend, create_backend
+
+def test_create_backend_by_name(monkeypatch):
+    assert isinstance(create_backend("stub"), StubBackend)
+    monkeypatch.setenv('JARVIS_LLM_BACKEND', "stub")
+    assert isinstance(create_backend(), StubBackend)
+    with pytest.raises(ValueError):
+        create_backend("nope")
+
+def test_stub_replies_depend_only_on_the_prompt():
+    backend = StubBackend()
+    assert backend.complete("a", "hello", None, 100) == backend.complete("b", "hello", None, 100)
+    assert backend.complete("a", "hello", None, 100) != backend.complete("a", "bye", None, 100)
+    assert "".join(backend.stream("a", "hello", None, 100)) == backend.complete("a", "hello", None, 100)
+    assert len(backend.complete("a", "hello", None, 3).split(" ")) == 3
+
+def test_engine_runs_on_the_stub_backend(make_llm):
+    llm = make_llm(StubBackend(reply="fine"))
+    assert llm.generate("hi") == "fine"
+    assert llm.stats()["backend"] == "stub"
+
+def test_http_payload_uses_the_model_id_and_grammar_fields(monkeypatch):
+    monkeypatch.setenv('JARVIS_LLM_EXTRA_BODY', '{"cache_prompt": true}')
+    backend = OpenAIHTTPBackend(base_url="http://localhost:1/v1/")
+    payload = backend._payload("/models/mistral-7b.Q5.gguf", "hi", ["\n"], 8, False, grammar="root ::= \"x\"")
+    assert payload == {"cache_prompt": True, "model": "mistral-7b.Q5", "prompt": "hi", "max_tokens": 8,
+                       "stop": ["\n"], "stream": False, "grammar": "root ::= \"x\""}
+    assert backend._payload("m.gguf", "hi", None, 8, True, grammar={"type": "object"})["json_schema"] == \
+        {"type": "object"}
+
+def test_http_backend_reports_missing_requests(monkeypatch):
+    monkeypatch.setattr(backends, "requests", None)
+    backend = OpenAIHTTPBackend(base_url="http://localhost:1/v1")
+    assert "requests" in backend.unavailable_reason()
+    assert not backend.load("m.gguf")
+
+class _CompletionsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send(json.dumps({"data": [{"id": "model"}]}).encode())
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/tokenize":
+            self._send(json.dumps({"tokens": request["content"].split()}).encode())
+        elif request["stream"]:
+            events = "".join(f"data: {json.dumps({'choices': [{'text': piece}]})}\n\n" for piece in ("a", "b"))
+            self._send((events + "data: [DONE]\n\n").encode(), "text/event-stream")
+        else:
+            prompts = request["prompt"] if isinstance(request["prompt"], list) else [request["prompt"]]
+            choices = [{"index": i, "text": f"echo {p}"} for i, p in reversed(list(enumerate(prompts)))]
+            self._send(json.dumps({"choices": choices}).encode())
+
+@pytest.fixture
+def server():
+    pytest.importorskip("requests")
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionsHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+def test_http_backend_round_trip(server):
+    backend = OpenAIHTTPBackend(base_url=server + "/v1")
+    assert backend.load("model.gguf")
+    assert backend.complete("model.gguf", "hi", None, 8) == "echo hi"
+    assert list(backend.stream("model.gguf", "hi", None, 8)) == ["a", "b"]
+    assert backend.complete_batch("model.gguf", ["x", "y"], None, 8) == ["echo x", "echo y"]
+    assert backend.count_tokens("model.gguf", "one two three") == 3
@@ -0,0 +1,60 @@
+import threading
+
+from core.backends import StubBackend
+
+class EchoBackend(StubBackend):
+    """Replies "echo <prompt>"; prompts containing "fail" raise. Records batch calls."""
+    supports_batch = False
+
+    def __init__(self):
+        super().__init__()
+        self.slots = 3
+        self.batches = []
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def complete(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None):
+        with self.lock:
+            self.calls += 1
+        if "fail" in prompt:
+            raise RuntimeError("boom")
+        return f"echo {prompt}"
+
+    def complete_batch(self, path, prompts, stop, max_tokens, grammar=None):
+        self.batches.append(list(prompts))
+        return [f"echo {p}" for p in prompts]
+
+class BatchingBackend(EchoBackend):
+    supports_batch = True
+
+def test_results_come_back_in_input_order_with_per_item_errors(make_llm):
+    llm = make_llm(EchoBackend())
+    results = llm.generate_batch(["a", "fail", "c"])
+    assert [r.index for r in results] == [0, 1, 2]
+    assert [r.text for r in results if r.ok] == ["echo a", "echo c"]
+    assert not results[1].ok and results[1].error.startswith("Error")
+
+def test_batching_backend_gets_one_request_for_uncached_prompts(make_llm):
+    llm = make_llm(BatchingBackend())
+    llm.generate_batch(["a"], cache=True)
+    results = llm.generate_batch(["a", "b", "c"], cache=True)
+    assert llm.backend.batches == [["b", "c"]]
+    assert [r.text for r in results] == ["echo a", "echo b", "echo c"]
+    assert [r.cached for r in results] == [True, False, False]
+
+def test_batched_results_are_cached_with_the_requested_key_mode(make_llm):
+    llm = make_llm(BatchingBackend())
+    llm.generate_batch(["Copy A", "Copy B"], cache="exact")
+    results = llm.generate_batch(["copy a", "Copy A"], cache=True)
+    # Only the identical prompt hits: exact-mode results never get a normalized key
+    assert [r.cached for r in results] == [False, True]
+
+def test_intent_caps_the_batch_token_budget(make_llm):
+    budgets = []
+    class Recording(EchoBackend):
+        def complete(self, path, prompt, stop, max_tokens, *args, **kwargs):
+            budgets.append(max_tokens)
+            return "ok"
+    llm = make_llm(Recording())
+    llm.generate_batch(["a", "b"], max_tokens=1000, intent="summary")
+    assert budgets == [384, 384]
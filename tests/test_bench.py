@@ -0,0 +1,44 @@
+import json
+
+from core import bench, tracing
+from core.llm import LLMEngine
+
+def test_percentiles_use_nearest_rank():
+    stats = bench.percentiles([float(v) for v in range(1, 101)])
+    assert stats == {"count": 100, "mean": 50.5, "p50": 50.0, "p95": 95.0, "p99": 99.0, "max": 100.0}
+    assert bench.percentiles([7.0]) == {"count": 1, "mean": 7.0, "p50": 7.0, "p95": 7.0, "p99": 7.0, "max": 7.0}
+    assert bench.percentiles([]) == {"count": 0}
+
+def test_load_corpus_reads_memory_files_lists_and_text(tmp_path):
+    memory = tmp_path / "memory.json"
+    memory.write_text(json.dumps({"history": [{"role": "user", "content": "hello"},
+                                              {"role": "assistant", "content": "hi"},
+                                              {"role": "user", "content": "exit"}]}))
+    listing = tmp_path / "list.json"
+    listing.write_text(json.dumps(["one", " two ", ""]))
+    text = tmp_path / "lines.txt"
+    text.write_text("first line\n\nQuit\nsecond line\n")
+    assert bench.load_corpus(str(memory)) == ["hello"]
+    assert bench.load_corpus(str(listing)) == ["one", "two"]
+    assert bench.load_corpus(str(text)) == ["first line", "second line"]
+
+def test_replay_reports_every_turn(tmp_path, monkeypatch):
+    for name, value in (('JARVIS_RESPONSE_CACHE', "response_cache.json"), ('JARVIS_INTENT_CACHE', "intent"),
+                        ('JARVIS_SKILL_MANIFEST', "manifest.json")):
+        monkeypatch.setenv(name, str(tmp_path / value))
+    monkeypatch.setattr(tracing, "ENABLED", False)
+    monkeypatch.setattr(LLMEngine, "_instance", None)
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("tell me a story about the sea\nwhat is the capital of france\n")
+    output = tmp_path / "results.json"
+    try:
+        assert bench.main(["--corpus", str(corpus), "--memory", str(tmp_path / "none.json"),
+                           "--output", str(output), "--repeat", "2"]) == 0
+    finally:
+        LLMEngine._instance = None
+    results = json.loads(output.read_text())
+    assert results["backend"] == "stub"
+    assert results["turns"] == 4 and results["timeouts"] == 0
+    assert results["turn_ms"]["count"] == 4
+    assert results["turn_ms_by_path"]["llm"]["count"] == 4
+    assert "llm" in results["stages_ms"]
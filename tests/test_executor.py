@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from core.executor import SkillExecutor, current_token
+
+@pytest.fixture
+def executor():
+    executor = SkillExecutor(max_workers=1, max_pending=1)
+    yield executor
+    executor.shutdown()
+
+def _finished(task, timeout=2.0):
+    done = threading.Event()
+    previous = task.on_done
+    task.on_done = lambda t: (previous and previous(t), done.set())
+    if task.finished is None:
+        done.wait(timeout)
+    return task.status
+
+def test_results_and_failures_are_reported(executor):
+    outcomes = []
+    ok = executor.submit("ok", lambda: 42, on_done=outcomes.append)
+    bad = executor.submit("bad", lambda: 1 / 0)
+    assert _finished(ok) == "done" and ok.result == 42
+    assert _finished(bad) == "failed" and isinstance(bad.error, ZeroDivisionError)
+    assert outcomes == [ok]
+
+def test_timed_out_task_counts_as_active_until_it_returns(executor):
+    release = threading.Event()
+    task = executor.submit("slow", lambda: release.wait(5.0), timeout=0.05)
+    assert _finished(task) == "timeout"
+    assert task.token.cancelled and task.token.reason == "timeout"
+    assert executor.busy() == 1
+    release.set()
+    task.future.result(2.0)
+    assert executor.busy() == 0
+    assert task.status == "timeout"  # The late result doesn't overwrite the outcome
+
+def test_full_executor_rejects_new_work(executor):
+    release = threading.Event()
+    running = executor.submit("running", lambda: release.wait(5.0))
+    queued = executor.submit("queued", lambda: None)
+    assert executor.submit("rejected", lambda: None) is None
+    release.set()
+    assert _finished(running) == "done" and _finished(queued) == "done"
+
+def test_cancel_all_stops_running_and_queued_tasks(executor):
+    started = threading.Event()
+    def cooperative():
+        started.set()
+        token = current_token()
+        while True:
+            token.check()
+            token.event.wait(0.01)
+    running = executor.submit("running", cooperative)
+    queued = executor.submit("queued", lambda: None)
+    assert started.wait(2.0)
+    assert executor.cancel_all() == 2
+    assert _finished(running) == "cancelled" and _finished(queued) == "cancelled"
+    running.future.result(2.0)
+    assert executor.busy() == 0
+
+def test_token_is_only_set_on_executor_threads(executor):
+    seen = []
+    task = executor.submit("probe", lambda: seen.append(current_token()))
+    _finished(task)
+    assert seen == [task.token]
+    assert current_token() is None
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from core import memory as memory_module
+from core.history_archive import HistoryArchive
+from core.memory import Memory, HISTORY_SUFFIX
+
+@pytest.fixture
+def small_tiers(monkeypatch):
+    # Archive after a handful of messages instead of hundreds
+    monkeypatch.setattr(memory_module, "HISTORY_LIMIT", 4)
+    monkeypatch.setattr(memory_module, "SEGMENT_SIZE", 5)
+
+def _open(path):
+    return Memory(str(path), flush_interval=0)
+
+def _contents(items):
+    return [item["content"] for item in items]
+
+def test_old_messages_move_to_compressed_segments(tmp_path, small_tiers):
+    memory = _open(tmp_path / "memory.json")
+    for i in range(12):
+        memory.add_history_item("user", f"message {i}")
+
+    assert len(memory.archive) == 5
+    assert len(memory.data["history"]) == 7
+    assert _contents(memory.iter_history()) == [f"message {i}" for i in range(12)]
+    assert _contents(memory.get_recent_history(limit=2)) == ["message 10", "message 11"]
+    names = sorted(os.listdir(str(tmp_path / "memory.json") + HISTORY_SUFFIX))
+    assert names == ["manifest.json", "segment-000000.index.json.gz", "segment-000000.jsonl.gz"]
+
+def test_paging_spans_archive_and_hot_tail(tmp_path, small_tiers):
+    memory = _open(tmp_path / "memory.json")
+    for i in range(12):
+        memory.add_history_item("user", f"trip to paris {i}" if i % 3 == 0 else f"weather {i}")
+
+    page = memory.history_mentioning("Paris trip", limit=2)
+    assert _contents(page) == ["trip to paris 9", "trip to paris 6"]
+    page = memory.history_mentioning("paris trip", limit=2, before=page[-1]["seq"])
+    assert _contents(page) == ["trip to paris 3", "trip to paris 0"]
+    assert memory.history_mentioning("the", limit=5) == []
+
+    first = memory.history_between(0, float("inf"), limit=4)
+    rest = memory.history_between(0, float("inf"), limit=100, after=first[-1]["seq"])
+    assert len(first) == 4 and len(rest) == 8
+    assert [item["seq"] for item in first + rest] == sorted(item["seq"] for item in first + rest)
+
+def test_reload_skips_snapshot_and_journal_entries_already_archived(tmp_path, small_tiers):
+    path = tmp_path / "memory.json"
+    memory = _open(path)
+    for i in range(6):
+        memory.add_history_item("user", f"message {i}")
+    memory.save() # Snapshot holds all six
+    for i in range(6, 12):
+        memory.add_history_item("user", f"message {i}")
+    assert len(memory.archive) == 5
+    # Crash: the snapshot and journal still hold the archived messages
+
+    reloaded = _open(path)
+    assert _contents(reloaded.iter_history()) == [f"message {i}" for i in range(12)]
+
+def test_unlisted_segment_from_interrupted_append_is_overwritten(tmp_path):
+    directory = str(tmp_path / "archive")
+    archive = HistoryArchive(directory)
+    archive.append([{"role": "user", "content": f"old {i}", "ts": float(i), "seq": i} for i in range(3)])
+    # Crash after writing segment 1 but before the manifest named it
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = f.read()
+    archive.append([{"role": "user", "content": "lost", "ts": 9.0, "seq": 9}])
+    with open(os.path.join(directory, "manifest.json"), 'w') as f:
+        f.write(manifest)
+
+    recovered = HistoryArchive(directory)
+    assert recovered.last_seq == 2
+    assert not recovered.archived(9)
+    recovered.append([{"role": "user", "content": "new", "ts": 5.0, "seq": 5}])
+    assert _contents(recovered.iter_items()) == ["old 0", "old 1", "old 2", "new"]
+    assert _contents(recovered.mentioning(["new"], limit=5)) == ["new"]
+    assert _contents(recovered.mentioning(["lost"], limit=5)) == []
+
+def test_append_skips_messages_already_archived(tmp_path):
+    archive = HistoryArchive(str(tmp_path / "archive"))
+    items = [{"role": "user", "content": f"m {i}", "ts": float(i), "seq": i} for i in range(4)]
+    archive.append(items[:3])
+    archive.append(items) # Replayed after a crash: only m 3 is new
+    assert _contents(archive.iter_items()) == ["m 0", "m 1", "m 2", "m 3"]
+    with open(os.path.join(str(tmp_path / "archive"), "manifest.json")) as f:
+        assert [segment["count"] for segment in json.load(f)["segments"]] == [3, 1]
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from core.embeddings import HashingEmbedder
+from core.intent import IntentRouter
+from skills.dev_skill import DevSkill
+from skills.system_skill import SystemSkill
+
+class Skill:
+    def __init__(self, name, examples):
+        self.name = name
+        self.examples = examples
+
+class TableEmbedder:
+    """Semantic embedder stand-in: each known text maps to a fixed direction."""
+    name = "table"
+    paraphrases = True
+    threshold = 0.6
+    margin = 0.05
+
+    def __init__(self, table):
+        self.table = table
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded += list(texts)
+        rows = np.array([self.table[text] for text in texts], dtype=np.float32)
+        return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+TABLE = {
+    "volume up": [1, 0, 0], "bump the sound": [1, 0.1, 0],
+    "battery": [0, 1, 0], "power level": [0, 1, 0.1],
+    "make it louder": [1, 0.2, 0], "how is my power": [0, 1, 0.05],
+    "something in between": [1, 1.1, 0], "the weather": [0, 0, 1],
+}
+
+@pytest.fixture
+def skills():
+    return [Skill("System", {"volume up": ["bump the sound"], "battery": ["power level"]})]
+
+def test_paraphrases_route_to_the_canonical_command(tmp_path, skills):
+    router = IntentRouter(embedder=TableEmbedder(TABLE), cache_dir=str(tmp_path))
+    router.build(skills)
+    match = router.route("make it louder")
+    assert (match.skill.name, match.utterance, match.example) == ("System", "volume up", "bump the sound")
+    assert router.route("how is my power").utterance == "battery"
+
+def test_weak_or_ambiguous_matches_are_not_routed(tmp_path, skills):
+    router = IntentRouter(embedder=TableEmbedder(TABLE), cache_dir=str(tmp_path))
+    router.build(skills)
+    assert router.route("the weather") is None
+    assert router.route("something in between") is None
+
+def test_cached_vectors_are_reused(tmp_path, skills):
+    IntentRouter(embedder=TableEmbedder(TABLE), cache_dir=str(tmp_path)).build(skills)
+    embedder = TableEmbedder(TABLE)
+    router = IntentRouter(embedder=embedder, cache_dir=str(tmp_path))
+    router.build(skills)
+    assert embedder.encoded == []
+    skills[0].examples["volume up"].append("make it louder")
+    router.build(skills)
+    assert embedder.encoded == ["make it louder"]
+
+def test_hashing_embedder_routes_on_canonical_commands_only(tmp_path):
+    router = IntentRouter(embedder=HashingEmbedder(), cache_dir=str(tmp_path))
+    router.build([Skill("System", SystemSkill.examples)])
+    assert "make it louder" not in router.texts
+    assert router.route("turn the volume up").utterance == "volume up"
+    assert router.route("how much charge is left in a tesla") is None
+
+def test_side_effect_commands_have_no_examples():
+    assert not DevSkill.examples
+    assert "screenshot" not in SystemSkill.examples
+
+@pytest.mark.parametrize("text", ["let us do some programming homework", "how much charge is left in a tesla",
+                                  "take a screen capture of the sea", "what is my name"])
+def test_chat_is_not_routed_to_commands(tmp_path, text):
+    router = IntentRouter(embedder=HashingEmbedder(), cache_dir=str(tmp_path))
+    router.build([Skill("System", SystemSkill.examples), Skill("DevMode", DevSkill.examples)])
+    assert router.route(text) is None
@@ -0,0 +1,59 @@
+import os
+import time
+
+from core.kv_cache import KVStateCache
+
+MODEL = "model.gguf"
+
+def test_lookup_returns_the_longest_cached_prefix(tmp_path):
+    cache = KVStateCache(cache_dir=str(tmp_path))
+    tokens = list(range(100))
+    cache.save(MODEL, tokens[:40], "short")
+    cache.save(MODEL, tokens[:60], "long")
+    assert cache.lookup(MODEL, tokens) == (60, "long")
+    assert cache.lookup(MODEL, tokens[:50]) == (40, "short")
+    # A state must leave at least one token to evaluate
+    assert cache.lookup(MODEL, tokens[:40]) is None
+
+def test_lookup_ignores_a_different_prefix_and_min_tokens(tmp_path):
+    cache = KVStateCache(cache_dir=str(tmp_path))
+    cache.save(MODEL, list(range(40)), "state")
+    assert cache.lookup(MODEL, [1] + list(range(1, 50))) is None
+    assert cache.lookup(MODEL, list(range(50)), min_tokens=40) is None
+    assert cache.lookup("other.gguf", list(range(50))) is None
+
+def test_short_prefixes_are_not_saved(tmp_path):
+    cache = KVStateCache(cache_dir=str(tmp_path))
+    cache.save(MODEL, list(range(KVStateCache.MIN_TOKENS - 1)), "state")
+    assert not cache.contains(MODEL, list(range(KVStateCache.MIN_TOKENS - 1)))
+
+def test_entries_survive_a_restart(tmp_path):
+    KVStateCache(cache_dir=str(tmp_path)).save(MODEL, list(range(40)), {"kv": b"x" * 10})
+    reopened = KVStateCache(cache_dir=str(tmp_path))
+    assert reopened.contains(MODEL, list(range(40)))
+    assert reopened.lookup(MODEL, list(range(41))) == (40, {"kv": b"x" * 10})
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    cache = KVStateCache(cache_dir=str(tmp_path))
+    tokens = list(range(40))
+    cache.save(MODEL, tokens, "state")
+    with open(cache._entry_path(cache.model_key(MODEL), cache.prefix_hash(tokens)), 'wb') as f:
+        f.write(b"garbage")
+    assert cache.lookup(MODEL, tokens + [1]) is None
+    assert not cache.contains(MODEL, tokens)
+
+def test_least_recently_used_entry_is_evicted_over_capacity(tmp_path):
+    cache = KVStateCache(cache_dir=str(tmp_path), capacity_mb=1)
+    blob = b"x" * 400 * 1024
+    first, second, third = list(range(40)), list(range(1, 41)), list(range(2, 42))
+    cache.save(MODEL, first, blob)
+    time.sleep(0.01)
+    cache.save(MODEL, second, blob)
+    time.sleep(0.01)
+    assert cache.lookup(MODEL, first + [0]) is not None  # first is now the most recent
+    time.sleep(0.01)
+    cache.save(MODEL, third, blob)
+    assert cache.contains(MODEL, first)
+    assert not cache.contains(MODEL, second)
+    assert cache.contains(MODEL, third)
+    assert not os.path.exists(cache._entry_path(cache.model_key(MODEL), cache.prefix_hash(second)))
@@ -0,0 +1,55 @@
+import json
+
+from core.memory import Memory, JOURNAL_SUFFIX
+
+def _open(path, **kwargs):
+    return Memory(str(path), flush_interval=0, **kwargs)
+
+def test_mutations_survive_a_crash_through_the_journal(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = _open(path)
+    memory.set_preference("user_name", "Tony")
+    memory.learn_command("lights", "turn on the lights")
+    memory.add_history_item("user", "hello")
+    # No close(): the snapshot was never written, only the journal
+
+    reloaded = _open(path)
+    assert reloaded.get_preference("user_name") == "Tony"
+    assert reloaded.get_learned_command("LIGHTS") == "turn on the lights"
+    assert [item["content"] for item in reloaded.get_recent_history()] == ["hello"]
+
+def test_torn_last_line_is_dropped_and_compacted(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = _open(path)
+    memory.set_preference("a", 1)
+    memory.set_preference("b", 2)
+    with open(str(path) + JOURNAL_SUFFIX, 'a', encoding='utf-8') as f:
+        f.write('{"op": "set", "section": "user_preferences", "key": "c", "va')
+
+    reloaded = _open(path)
+    assert reloaded.get_preference("a") == 1
+    assert reloaded.get_preference("b") == 2
+    assert reloaded.get_preference("c") is None
+    # The torn record forces a compaction: snapshot holds everything, journal is empty
+    with open(str(path) + JOURNAL_SUFFIX, encoding='utf-8') as f:
+        assert f.read() == ""
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)["user_preferences"] == {"a": 1, "b": 2}
+
+    reloaded.set_preference("c", 3)
+    assert _open(path).get_preference("c") == 3
+
+def test_records_already_in_the_snapshot_are_not_applied_twice(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = _open(path)
+    memory.add_history_item("user", "one")
+    memory.add_history_item("user", "two")
+    with open(str(path) + JOURNAL_SUFFIX, encoding='utf-8') as f:
+        journal = f.read()
+    memory.save()
+    # Crash between the snapshot rename and the journal truncation
+    with open(str(path) + JOURNAL_SUFFIX, 'w', encoding='utf-8') as f:
+        f.write(journal)
+
+    reloaded = _open(path)
+    assert [item["content"] for item in reloaded.get_recent_history()] == ["one", "two"]
@@ -0,0 +1,77 @@
+import os
+import time
+import threading
+
+from core import memory as memory_module
+from core.memory import Memory, JOURNAL_SUFFIX
+
+def _journal_lines(path):
+    journal = str(path) + JOURNAL_SUFFIX
+    if not os.path.exists(journal):
+        return 0
+    with open(journal, encoding='utf-8') as f:
+        return len(f.readlines())
+
+def test_mutations_are_visible_at_once_and_written_behind(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = Memory(str(path), flush_interval=0.05)
+    memory.set_preference("name", "Tony")
+    assert memory.get_preference("name") == "Tony"
+    assert _journal_lines(path) == 0
+    deadline = time.time() + 2.0
+    while _journal_lines(path) < 1:
+        assert time.time() < deadline, "flusher never wrote the journal"
+        time.sleep(0.01)
+    memory.close()
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = Memory(str(path), flush_interval=0.01)
+    def write(worker):
+        for i in range(50):
+            memory.add_history_item("user", f"{worker}-{i}")
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    memory.close()
+    reloaded = Memory(str(path), flush_interval=0)
+    contents = [item["content"] for item in reloaded.iter_history()]
+    assert sorted(contents) == sorted(f"{w}-{i}" for w in range(8) for i in range(50))
+    seqs = [item["seq"] for item in reloaded.iter_history()]
+    assert seqs == sorted(set(seqs))
+
+def test_reads_return_copies(tmp_path):
+    memory = Memory(str(tmp_path / "memory.json"), flush_interval=0)
+    memory.add_history_item("user", "hello")
+    memory.get_recent_history()[0]["content"] = "changed"
+    assert memory.get_recent_history()[0]["content"] == "hello"
+
+def test_writes_inside_the_fsync_interval_are_synced_later(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(memory_module, "FSYNC_INTERVAL", 0.2)
+    monkeypatch.setattr(memory_module.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    memory = Memory(str(tmp_path / "memory.json"), fsync="interval", flush_interval=0.01)
+    memory.set_preference("a", 1)
+    memory.flush()
+    memory.set_preference("b", 2)
+    memory.flush()
+    assert len(synced) == 1 and memory.unsynced
+    deadline = time.time() + 2.0
+    while memory.unsynced:
+        assert time.time() < deadline, "deferred fsync never ran"
+        time.sleep(0.01)
+    assert len(synced) == 2
+    memory.close()
+
+def test_close_during_a_burst_returns_promptly(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = Memory(str(path), flush_interval=0.2)
+    memory.add_history_item("user", "hello")
+    time.sleep(0.05)  # The flusher is now waiting for the rest of the burst
+    started = time.perf_counter()
+    memory.close()
+    assert time.perf_counter() - started < 1.0
+    assert [item["content"] for item in Memory(str(path), flush_interval=0).iter_history()] == ["hello"]
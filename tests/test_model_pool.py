@@ -0,0 +1,68 @@
+import pytest
+
+from core import backends
+from core.backends import LlamaCppBackend
+
+class FakeLlama:
+    def __init__(self, model_path, **params):
+        self.model_path = model_path
+        self.params = params
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setenv('JARVIS_KV_CACHE_DIR', str(tmp_path / "kv"))
+    monkeypatch.setenv('JARVIS_LLM_PROFILES', str(tmp_path / "profiles.json"))
+    monkeypatch.setattr(backends, "HAS_LLAMA", True)
+    monkeypatch.setattr(backends, "Llama", FakeLlama)
+    return LlamaCppBackend()
+
+def _model(tmp_path, name, size=1024):
+    path = tmp_path / name
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+def test_models_stay_resident_within_the_budget(backend, tmp_path):
+    a, b = _model(tmp_path, "a.gguf"), _model(tmp_path, "b.gguf")
+    backend.ram_budget_bytes = backend._estimate_bytes(a) * 2
+    assert backend.load(a) and backend.load(b)
+    assert list(backend.pool) == [a, b]
+    assert backend.pool[a].params["use_mmap"] is True
+
+def test_least_recently_used_model_is_evicted(backend, tmp_path):
+    a, b, c = (_model(tmp_path, name) for name in ("a.gguf", "b.gguf", "c.gguf"))
+    backend.ram_budget_bytes = backend._estimate_bytes(a) * 2
+    backend.load(a)
+    backend.load(b)
+    backend.load(a)  # a becomes the most recently used
+    backend.load(c)
+    assert list(backend.pool) == [a, c]
+    assert not backend.is_loaded(b)
+
+def test_a_model_larger_than_the_budget_still_loads_alone(backend, tmp_path):
+    a, b = _model(tmp_path, "a.gguf"), _model(tmp_path, "b.gguf")
+    backend.ram_budget_bytes = 1
+    backend.load(a)
+    backend.load(b)
+    assert list(backend.pool) == [b]
+
+def test_missing_file_fails_without_evicting(backend, tmp_path):
+    a = _model(tmp_path, "a.gguf")
+    backend.load(a)
+    assert not backend.load(str(tmp_path / "missing.gguf"))
+    assert list(backend.pool) == [a]
+
+def test_estimate_grows_with_the_context_size(backend, tmp_path):
+    a = _model(tmp_path, "a.gguf")
+    small = backend._estimate_bytes(a)
+    backend.profiles.set(a, {"n_ctx": backends.DEFAULT_PARAMS["n_ctx"] * 2}, {})
+    assert backend._estimate_bytes(a) - small == backends.DEFAULT_PARAMS["n_ctx"] * backends.KV_BYTES_PER_TOKEN
+
+def test_unload_drops_one_or_all_models(backend, tmp_path):
+    a, b = _model(tmp_path, "a.gguf"), _model(tmp_path, "b.gguf")
+    backend.ram_budget_bytes = backend._estimate_bytes(a) * 2
+    backend.load(a)
+    backend.load(b)
+    backend.unload(a)
+    assert list(backend.pool) == [b]
+    backend.unload()
+    assert not backend.pool
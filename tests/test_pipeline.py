@@ -0,0 +1,110 @@
+import time
+import threading
+
+import pytest
+
+from core.pipeline import Pipeline, OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT
+
+def _wait_idle(pipeline, timeout=2.0):
+    deadline = time.time() + timeout
+    while not pipeline.idle():
+        assert time.time() < deadline, "pipeline never drained"
+        time.sleep(0.001)
+
+def test_single_worker_stage_keeps_order():
+    seen = []
+    pipeline = Pipeline()
+    pipeline.add_stage("work", seen.append, maxsize=100)
+    pipeline.start()
+    try:
+        for i in range(50):
+            assert pipeline.submit("work", i)
+        _wait_idle(pipeline)
+        assert seen == list(range(50))
+    finally:
+        pipeline.stop()
+
+def _gated_pipeline(overflow):
+    gate = threading.Event()
+    seen = []
+    def handler(item):
+        gate.wait(2.0)
+        seen.append(item)
+    pipeline = Pipeline()
+    pipeline.add_stage("work", handler, maxsize=2, overflow=overflow)
+    pipeline.start()
+    return pipeline, gate, seen
+
+def _submit_while_first_runs(pipeline, items):
+    results = [pipeline.submit("work", items[0])]
+    while pipeline.stats()["work"]["running"] == 0:
+        time.sleep(0.001)
+    return results + [pipeline.submit("work", item) for item in items[1:]]
+
+def test_reject_policy_refuses_when_full():
+    pipeline, gate, seen = _gated_pipeline(OVERFLOW_REJECT)
+    try:
+        assert _submit_while_first_runs(pipeline, [0, 1, 2, 3]) == [True, True, True, False]
+        gate.set()
+        _wait_idle(pipeline)
+        assert seen == [0, 1, 2]
+        assert pipeline.stats()["work"]["rejected"] == 1
+    finally:
+        pipeline.stop()
+
+def test_drop_oldest_policy_discards_stale_items():
+    pipeline, gate, seen = _gated_pipeline(OVERFLOW_DROP_OLDEST)
+    try:
+        assert all(_submit_while_first_runs(pipeline, [0, 1, 2, 3]))
+        gate.set()
+        _wait_idle(pipeline)
+        assert seen == [0, 2, 3]
+        assert pipeline.stats()["work"]["dropped"] == 1
+    finally:
+        pipeline.stop()
+
+def test_drain_waits_for_a_stage_to_finish():
+    gate = threading.Event()
+    seen = []
+    pipeline = Pipeline()
+    pipeline.add_stage("work", lambda item: (gate.wait(2.0), seen.append(item)), maxsize=4)
+    pipeline.start()
+    try:
+        pipeline.submit("work", 1)
+        assert not pipeline.drain("work", timeout=0.05)
+        gate.set()
+        assert pipeline.drain("work", timeout=2.0)
+        assert seen == [1]
+    finally:
+        pipeline.stop()
+
+class RecordingTTS:
+    is_speaking = False
+
+    def __init__(self):
+        self.events = []
+
+    def speak(self, text):
+        self.events.append(("speak", text))
+
+    def say(self, text):
+        time.sleep(0.05)  # Speaking takes a while
+        self.events.append(("say", text))
+
+    def stop(self):
+        self.events.append(("stop", None))
+
+def test_shutdown_speaks_before_stopping_the_pipeline(make_llm, tmp_path, monkeypatch):
+    from core.engine import JarvisEngine
+    from core.memory import Memory
+    from core.retrieval import RetrievalIndex
+    from core.ui import NullUI
+
+    monkeypatch.setenv('JARVIS_INTENT_CACHE', str(tmp_path / "intent"))
+    monkeypatch.setenv('JARVIS_SKILL_MANIFEST', str(tmp_path / "manifest.json"))
+    tts = RecordingTTS()
+    engine = JarvisEngine(ui=NullUI(), tts=tts, llm=make_llm(), memory=Memory(str(tmp_path / "memory.json")),
+                          voice=False, retrieval=RetrievalIndex(index_dir=str(tmp_path / "index")))
+    with pytest.raises(SystemExit):
+        engine.shutdown()
+    assert tts.events == [("say", "Shutting down."), ("stop", None)]
@@ -0,0 +1,77 @@
+from core.prompt import PromptBuilder, chatml_turn
+from core.retrieval import Snippet
+
+class WordCountLLM:
+    """Tokenizer stand-in: one token per whitespace-separated word."""
+    def __init__(self, loaded=True):
+        self.loaded = loaded
+        self.calls = 0
+
+    def resolve_model(self, model=None):
+        return "model.gguf"
+
+    def count_tokens(self, text, model=None):
+        self.calls += 1
+        return len(text.split()) if self.loaded else None
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message number {i}"} for i in range(n)]
+
+def test_everything_fits_in_order():
+    builder = PromptBuilder(WordCountLLM(), history_budget=1000)
+    prompt = builder.build("SYSTEM", _history(3), "hello", max_tokens=10, n_ctx=1000)
+    assert prompt == "\n".join(["SYSTEM",
+                                chatml_turn("user", "message number 0"),
+                                chatml_turn("assistant", "message number 1"),
+                                chatml_turn("user", "message number 2"),
+                                chatml_turn("user", "hello") + "\n<|im_start|>assistant\n"])
+
+def test_history_budget_keeps_the_newest_turns():
+    builder = PromptBuilder(WordCountLLM(), history_budget=10)  # Each turn is 5 words
+    prompt = builder.build("SYSTEM", _history(5), "hello", max_tokens=10, n_ctx=1000)
+    assert "message number 4" in prompt and "message number 3" in prompt
+    assert "message number 2" not in prompt
+
+def test_reply_room_is_reserved_from_the_context():
+    builder = PromptBuilder(WordCountLLM(), history_budget=1000)
+    history = _history(50)
+    n_ctx, max_tokens = 200, 60
+    prompt = builder.build("SYSTEM", history, "hello", max_tokens=max_tokens, n_ctx=n_ctx)
+    assert len(prompt.split()) + max_tokens <= n_ctx
+    assert "message number 49" in prompt
+    assert "message number 0\n" not in prompt
+
+def test_token_counts_are_cached_per_text():
+    llm = WordCountLLM()
+    builder = PromptBuilder(llm)
+    builder.count_tokens("some text")
+    builder.count_tokens("some text")
+    assert llm.calls == 1
+
+def test_estimates_are_not_cached_before_the_model_loads():
+    llm = WordCountLLM(loaded=False)
+    builder = PromptBuilder(llm)
+    assert builder.count_tokens("x" * 30) == 11
+    llm.loaded = True
+    assert builder.count_tokens("x" * 30) == 1
+
+def test_context_block_sits_between_history_and_the_user_turn():
+    builder = PromptBuilder(WordCountLLM(), history_budget=1000, context_budget=200)
+    history = _history(2)
+    snippets = [Snippet("fact", "fact_1", "The garage code is 4512", 0.9),
+                Snippet("history", "user:abc", "message number 1", 0.8)]
+    prompt = builder.build("SYSTEM", history, "what is the code", max_tokens=10, n_ctx=1000, snippets=snippets)
+    blocks = prompt.split("\n<|im_start|>")
+    assert blocks[0] == "SYSTEM"
+    assert blocks[-3].startswith("system\nRelevant things you remember")
+    assert "- The garage code is 4512" in blocks[-3]
+    assert "message number 1" not in blocks[-3]  # Already in the history window
+    assert blocks[-2].startswith("user\nwhat is the code")
+
+def test_snippets_beyond_the_context_budget_are_left_out():
+    builder = PromptBuilder(WordCountLLM(), history_budget=1000, context_budget=24)
+    snippets = [Snippet("fact", "fact_1", "a very long fact " * 5, 0.9),
+                Snippet("fact", "fact_2", "short fact", 0.5)]
+    prompt = builder.build("SYSTEM", [], "hi", max_tokens=10, n_ctx=1000, snippets=snippets)
+    assert "short fact" in prompt and "very long fact" not in prompt
+    assert "Relevant things" not in builder.build("SYSTEM", [], "hi", max_tokens=10, n_ctx=1000)
@@ -0,0 +1,71 @@
+import json
+
+from core import response_cache
+from core.backends import StubBackend
+from core.response_cache import ResponseCache
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(path=str(tmp_path / "cache.json"), **kwargs)
+
+def test_normalized_key_matches_trivially_different_prompts(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put(cache.make_keys("m", {}, "Summarize: The Report!"), "short")
+    assert cache.get(cache.make_keys("m", {}, "summarize the report")) == "short"
+    assert cache.get(cache.make_keys("m", {"max_tokens": 10}, "summarize the report")) is None
+    assert cache.get(cache.make_keys("other", {}, "summarize the report")) is None
+
+def test_exact_keys_only_match_the_identical_prompt(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put(cache.make_keys("m", {}, "ls /Home")[:1], "ls /Home")
+    assert cache.get(cache.make_keys("m", {}, "ls /home")) is None
+    assert cache.get(cache.make_keys("m", {}, "ls /Home")[:1]) == "ls /Home"
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = _cache(tmp_path, ttl=60)
+    keys = cache.make_keys("m", {}, "prompt")
+    cache.put(keys, "text")
+    for key in keys:
+        cache.entries[key]["created"] -= 120
+    assert cache.get(keys) is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    a, b, c = ([key] for key in "abc")
+    cache.put(a, "a")
+    cache.put(b, "b")
+    assert cache.get(a) == "a"
+    cache.put(c, "c")
+    assert cache.get(b) is None
+    assert cache.get(a) == "a" and cache.get(c) == "c"
+
+def test_entries_are_written_in_the_background_and_reloaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "SAVE_DELAY", 0.01)
+    cache = _cache(tmp_path)
+    keys = cache.make_keys("m", {}, "prompt")
+    cache.put(keys, "text")
+    cache.saver.join(0.2)  # The saver loops forever; this only gives it time to write
+    with open(tmp_path / "cache.json") as f:
+        assert set(json.load(f)) == set(keys)
+    assert _cache(tmp_path).get(keys) == "text"
+
+def test_generate_caches_only_when_asked(make_llm):
+    class Counting(StubBackend):
+        calls = 0
+        def complete(self, *args, **kwargs):
+            Counting.calls += 1
+            return "Summary."
+    llm = make_llm(Counting())
+    assert llm.generate("Summarize this.", cache=True) == "Summary."
+    assert llm.generate("summarize this", cache=True) == "Summary."
+    assert llm.generate("summarize this") == "Summary."
+    assert Counting.calls == 2
+
+def test_exact_mode_does_not_share_results_across_case(make_llm):
+    class Echo(StubBackend):
+        def complete(self, path, prompt, *args, **kwargs):
+            return prompt
+    llm = make_llm(Echo())
+    assert llm.generate("Copy /Data", cache="exact") == "Copy /Data"
+    assert llm.generate("copy /data", cache="exact") == "copy /data"
+    assert llm.generate("copy /data", cache=True) == "copy /data"
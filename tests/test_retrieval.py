@@ -0,0 +1,76 @@
+import os
+import time
+
+import pytest
+
+from core.embeddings import HashingEmbedder
+from core.memory import Memory
+from core.retrieval import RetrievalIndex, Snippet, describe
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        return super().encode(texts)
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = Memory(str(tmp_path / "memory.json"), flush_interval=0)
+    memory.set_preference("fact_1", "My sister Pepper lives in Malibu")
+    memory.set_preference("knowledge_arc_reactor", "An arc reactor is a compact fusion power source.")
+    memory.add_history_item("user", "remind me to buy coffee beans")
+    yield memory
+    memory.close()
+
+def _index(tmp_path, memory, embedder=None):
+    index = RetrievalIndex(embedder=embedder or HashingEmbedder(), index_dir=str(tmp_path / "index"))
+    index.start(memory)
+    assert index.wait_ready(2.0)
+    return index
+
+def _settle(index, rows):
+    deadline = time.time() + 2.0
+    while index.stats()["rows"] < rows or index.stats()["pending"]:
+        assert time.time() < deadline, "index never caught up"
+        time.sleep(0.01)
+
+def test_describe_maps_memory_entries_to_kinds():
+    assert describe("user_preferences", "fact_2", "x") == ("fact", "fact_2", "x")
+    assert describe("user_preferences", "knowledge_y", "x")[0] == "knowledge"
+    assert describe("user_preferences", "theme", "dark")[0] == "preference"
+    assert describe("user_preferences", "volume", 5) is None
+    assert describe("history", "user", "hi")[0] == "history"
+    assert describe("history", "user", "  ") is None
+
+def test_backfill_and_search(tmp_path, memory):
+    index = _index(tmp_path, memory)
+    assert index.stats()["rows"] == 3
+    [best] = index.search("where does my sister Pepper live", k=1)
+    assert best.kind == "fact" and "Malibu" in best.text
+    assert {s.kind for s in index.search("arc reactor power coffee", k=3, kinds=("history",))} == {"history"}
+
+def test_changes_are_indexed_and_old_values_retired(tmp_path, memory):
+    index = _index(tmp_path, memory)
+    memory.set_preference("fact_1", "My sister Pepper moved to New York")
+    _settle(index, 4)
+    assert index.stats()["live"] == 3
+    texts = [s.text for s in index.search("sister Pepper", k=5)]
+    assert "My sister Pepper moved to New York" in texts
+    assert "My sister Pepper lives in Malibu" not in texts
+
+def test_reopened_index_is_not_re_embedded(tmp_path, memory):
+    _index(tmp_path, memory)
+    embedder = CountingEmbedder()
+    index = _index(tmp_path, memory, embedder)
+    assert index.stats()["rows"] == 3 and embedder.encoded == 0
+
+def test_torn_entries_line_is_dropped_on_open(tmp_path, memory):
+    _index(tmp_path, memory)
+    with open(os.path.join(str(tmp_path / "index"), "entries.jsonl"), "a", encoding="utf-8") as f:
+        f.write('["fact", "fact_9"')
+    index = _index(tmp_path, memory)
+    assert index.stats()["rows"] == 3
+    assert index.search("Pepper Malibu", k=1)[0].key == "fact_1"
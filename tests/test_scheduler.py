@@ -0,0 +1,142 @@
+import time
+import threading
+
+import pytest
+
+from core import tracing
+from core.backends import StubBackend
+from core.scheduler import LLMScheduler, QueueTimeout, PRIORITY_BACKGROUND
+
+def _acquire_later(scheduler, priority, caller, granted):
+    """Queues a request on a thread; appends its caller to `granted` once it runs and
+    releases immediately."""
+    def run():
+        ticket = scheduler.acquire(priority, caller)
+        granted.append(caller)
+        scheduler.release(ticket)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def _wait_queued(scheduler, depth):
+    deadline = time.time() + 2.0
+    while scheduler.depth() < depth:
+        assert time.time() < deadline, "requests never queued"
+        time.sleep(0.001)
+
+def test_higher_priority_class_goes_first():
+    scheduler = LLMScheduler()
+    holder = scheduler.acquire("background", "research")
+    granted = []
+    threads = [_acquire_later(scheduler, "background", "summary", granted)]
+    _wait_queued(scheduler, 1)
+    threads.append(_acquire_later(scheduler, "command", "automation", granted))
+    _wait_queued(scheduler, 2)
+    threads.append(_acquire_later(scheduler, "interactive", "chat", granted))
+    _wait_queued(scheduler, 3)
+
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join(2.0)
+    assert granted == ["chat", "automation", "summary"]
+
+def test_callers_within_a_class_are_served_round_robin():
+    scheduler = LLMScheduler()
+    holder = scheduler.acquire("command", "holder")
+    granted = []
+    threads = []
+    for caller in ("a", "a", "b"):
+        threads.append(_acquire_later(scheduler, "command", caller, granted))
+        _wait_queued(scheduler, len(threads))
+
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join(2.0)
+    assert granted == ["a", "b", "a"]
+
+def test_interactive_request_flags_running_background_ticket():
+    scheduler = LLMScheduler()
+    background = scheduler.acquire("background", "research")
+    assert not background.preempt.is_set()
+
+    granted = []
+    thread = _acquire_later(scheduler, "interactive", "chat", granted)
+    assert background.preempt.wait(2.0)
+    assert scheduler.higher_priority_waiting(PRIORITY_BACKGROUND)
+
+    scheduler.release(background, preempted=True)
+    thread.join(2.0)
+    assert granted == ["chat"]
+    assert scheduler.stats()["background"]["preempted"] == 1
+
+def test_equal_priority_does_not_preempt():
+    scheduler = LLMScheduler()
+    running = scheduler.acquire("interactive", "chat")
+    granted = []
+    thread = _acquire_later(scheduler, "interactive", "other", granted)
+    _wait_queued(scheduler, 1)
+    assert not running.preempt.is_set()
+    scheduler.release(running)
+    thread.join(2.0)
+    assert granted == ["other"]
+
+def test_queue_timeout_removes_the_request():
+    scheduler = LLMScheduler()
+    holder = scheduler.acquire("interactive", "chat")
+    with pytest.raises(QueueTimeout):
+        scheduler.acquire("command", "automation", timeout=0.05)
+    assert scheduler.depth() == 0
+    assert scheduler.stats()["command"]["timeouts"] == 1
+    scheduler.release(holder)
+
+class GatedBackend(StubBackend):
+    """Streams "w " pieces worth two tokens each and pauses after the third piece of the
+    first call until `gate` is set."""
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.paused = threading.Event()
+        self.budgets = []
+
+    def count_tokens(self, path, text):
+        return 2 * len(text.split())
+
+    def complete(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None):
+        return "interactive reply"
+
+    def stream(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None):
+        first = not self.budgets
+        self.budgets.append(max_tokens)
+        for i in range(max_tokens // 2):
+            if first and i == 3:
+                self.paused.set()
+                self.gate.wait(2.0)
+            yield "w "
+
+def test_preempted_generation_resumes_with_the_tokens_it_has_left(make_llm):
+    llm = make_llm(GatedBackend())
+    results = {}
+    background = threading.Thread(
+        target=lambda: results.update(background=llm.generate("summarize", max_tokens=20, priority="background")))
+    background.start()
+    assert llm.backend.paused.wait(2.0)
+    interactive = threading.Thread(target=lambda: results.update(interactive=llm.generate("hi")))
+    interactive.start()
+    _wait_queued(llm.scheduler, 1)
+    llm.backend.gate.set()
+    background.join(2.0)
+    interactive.join(2.0)
+    assert results["interactive"] == "interactive reply"
+    # Four pieces were out when it yielded: 8 tokens by the tokenizer, not 4
+    assert llm.backend.budgets == [20, 12]
+    assert results["background"].split() == ["w"] * 10
+    assert llm.scheduler.stats()["background"]["preempted"] == 1
+
+def test_background_generation_is_traced(make_llm, monkeypatch):
+    monkeypatch.setattr(tracing, "ENABLED", True)
+    tracing.clear()
+    llm = make_llm(StubBackend(reply="done"))
+    assert llm.generate("summarize", priority="background", caller="research") == "done"
+    spans = [e for e in tracing.events() if e["name"] == "llm generate"]
+    assert [s["args"]["caller"] for s in spans] == ["research"]
+    tracing.clear()
@@ -0,0 +1,138 @@
+import time
+import textwrap
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core.skills import SkillManager, LazySkill
+from core.watcher import FileWatcher
+
+class FakeContext:
+    def __init__(self):
+        self.spoken = []
+        self.messages = []
+        self.engine = SimpleNamespace(ui=SimpleNamespace(display_message=lambda text, sender: self.messages.append(text)))
+
+    def speak(self, text):
+        self.spoken.append(text)
+
+SKILL = '''
+from core.skills import BaseSkill
+{imports}
+HANDLED = []
+
+class {cls}(BaseSkill):
+    name = "{name}"
+    triggers = {triggers}
+
+    def handle(self, text):
+        HANDLED.append(text)
+        return True
+'''
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv('JARVIS_SKILL_MANIFEST', str(tmp_path / "manifest.json"))
+    manager = SkillManager(FakeContext())
+    manager.skills_dir = str(tmp_path / "skills")
+    (tmp_path / "skills").mkdir()
+    yield manager
+    manager.stop_watching()
+    manager.executor.shutdown()
+
+def write_skill(manager, filename, name, triggers='[("keyword", "hello", 5)]', imports="", cls="TestSkill"):
+    path = f"{manager.skills_dir}/{filename}"
+    with open(path, "w") as f:
+        f.write(textwrap.dedent(SKILL.format(name=name, triggers=triggers, imports=imports, cls=cls)))
+    return path
+
+def test_skills_with_triggers_are_imported_on_first_use(manager):
+    path = write_skill(manager, "greeter.py", "Greeter")
+    manager.load_skills()
+    [skill] = manager.skills
+    assert isinstance(skill, LazySkill) and not skill.loaded
+    assert path not in manager.modules
+    assert manager.candidates("hello there") == [skill]
+    assert manager.process("hello there")
+    assert skill.loaded and manager.modules[path].HANDLED == ["hello there"]
+    assert "greeter.py" in manager.import_report()
+
+def test_files_without_skill_classes_are_not_imported(manager):
+    with open(f"{manager.skills_dir}/helpers.py", "w") as f:
+        f.write("def shared_helper():\n    return 1\n")
+    manager.load_skills()
+    assert manager.skills == [] and manager.modules == {}
+
+def test_computed_attributes_fall_back_to_importing(manager):
+    path = write_skill(manager, "computed.py", "Computed", triggers='[("keyword", "hel" + "lo", 5)]')
+    manager.load_skills()
+    assert path in manager.modules
+    assert [s.name for s in manager.candidates("hello")] == ["Computed"]
+
+def test_skills_without_triggers_are_loaded_now(manager):
+    write_skill(manager, "legacy.py", "Legacy", triggers="[]")
+    manager.load_skills()
+    assert manager.skills[0].loaded
+    assert manager.candidates("anything") == manager.skills
+
+def test_skills_with_missing_dependencies_are_skipped(manager):
+    write_skill(manager, "needs.py", "Needs", imports="import surely_not_installed_xyz")
+    write_skill(manager, "fine.py", "Fine")
+    manager.load_skills()
+    assert [s.name for s in manager.skills] == ["Fine"]
+
+def test_manifests_are_cached_until_the_file_changes(manager, tmp_path):
+    write_skill(manager, "greeter.py", "Greeter")
+    manager.load_skills()
+    assert (tmp_path / "manifest.json").exists()
+    manager.manifests.dirty = False
+    manager.load_skills()
+    assert not manager.manifests.dirty
+
+def test_reload_swaps_in_the_changed_file(manager):
+    path = write_skill(manager, "greeter.py", "Greeter")
+    manager.load_skills()
+    reloaded = []
+    manager.add_reload_listener(reloaded.append)
+    write_skill(manager, "greeter.py", "Greeter", triggers='[("keyword", "good morning", 5)]')
+    manager.reload_files([path])
+    assert manager.candidates("hello") == []
+    [skill] = manager.candidates("good morning")
+    assert skill.loaded  # Reloaded files are imported before the swap
+    assert reloaded == [manager.skills]
+
+def test_a_broken_file_keeps_the_previous_version(manager):
+    path = write_skill(manager, "greeter.py", "Greeter")
+    manager.load_skills()
+    with open(path, "a") as f:
+        f.write("this is not python\n")
+    manager.reload_files([path])
+    assert [s.name for s in manager.candidates("hello")] == ["Greeter"]
+    assert "reload failed" in manager.context.messages[-1]
+
+def test_removed_files_drop_their_skills(manager):
+    path = write_skill(manager, "greeter.py", "Greeter")
+    manager.load_skills()
+    manager.reload_files([], removed=[path])
+    assert manager.skills == [] and manager.candidates("hello") == []
+
+def test_watcher_reports_changed_and_removed_files(tmp_path):
+    events = []
+    changed = threading.Event()
+    watcher = FileWatcher(str(tmp_path), lambda c, r: (events.append((c, r)), changed.set()),
+                          interval=0.02, debounce=0.01)
+    watcher.mode = "polling"
+    watcher.start()
+    try:
+        time.sleep(0.05)
+        (tmp_path / "notes.txt").write_text("ignored")
+        (tmp_path / "skill.py").write_text("x = 1\n")
+        assert changed.wait(2.0)
+        changed.clear()
+        (tmp_path / "skill.py").unlink()
+        assert changed.wait(2.0)
+    finally:
+        watcher.stop()
+    path = str(tmp_path / "skill.py")
+    assert events == [([path], []), ([], [path])]
@@ -0,0 +1,62 @@
+import pytest
+
+from core import backends
+from core.backends import LlamaCppBackend
+from core.speculative import DraftStats, TrackingDraft, DRAFT_PROMPT_LOOKUP
+
+class FixedDraft:
+    """Proposes the given token lists, one per call."""
+    def __init__(self, *proposals):
+        self.proposals = list(proposals)
+
+    def __call__(self, input_ids, **kwargs):
+        return self.proposals.pop(0)
+
+class FakeLlama:
+    def __init__(self, model_path, **params):
+        self.params = params
+
+def test_tracking_draft_counts_accepted_tokens():
+    stats = DraftStats()
+    draft = TrackingDraft(FixedDraft([5, 6, 7], [9, 9]), stats)
+    assert draft([1, 2]) == [5, 6, 7]
+    # The target kept 5 and 6, then produced 8 instead of 7
+    draft([1, 2, 5, 6, 8])
+    draft.finish([1, 2, 5, 6, 8, 9])
+    assert stats.as_dict() == {"generations": 1, "proposed": 5, "accepted": 3, "acceptance_rate": 0.6}
+
+def test_stats_without_proposals_report_zero_rate():
+    assert DraftStats().as_dict()["acceptance_rate"] == 0.0
+
+@pytest.fixture
+def llama_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv('JARVIS_KV_CACHE_DIR', str(tmp_path / "kv"))
+    monkeypatch.setenv('JARVIS_LLM_PROFILES', str(tmp_path / "profiles.json"))
+    monkeypatch.setattr(backends, "HAS_LLAMA", True)
+    monkeypatch.setattr(backends, "Llama", FakeLlama)
+    def make(speculative):
+        monkeypatch.setattr(backends, "HAS_SPECULATIVE", True)
+        monkeypatch.setenv('JARVIS_SPECULATIVE', "1" if speculative else "0")
+        return LlamaCppBackend()
+    return make
+
+def test_drafting_is_off_unless_enabled(llama_backend):
+    backend = llama_backend(speculative=False)
+    assert backend._make_draft(DRAFT_PROMPT_LOOKUP) is None
+    assert backend._make_draft(None) is None
+
+def test_models_keep_all_logits_only_when_drafting_is_enabled(llama_backend, tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"\0" * 16)
+    for speculative in (False, True):
+        backend = llama_backend(speculative)
+        backend.load(str(model))
+        assert backend.pool[str(model)].params["logits_all"] is speculative
+
+def test_logits_all_is_counted_in_the_memory_estimate(llama_backend, tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"\0" * 16)
+    plain = llama_backend(False)._estimate_bytes(str(model))
+    drafting = llama_backend(True)._estimate_bytes(str(model))
+    n_ctx = backends.DEFAULT_PARAMS["n_ctx"]
+    assert drafting - plain == n_ctx * backends.VOCAB_SIZE_ESTIMATE * 4
@@ -0,0 +1,95 @@
+import os
+import time
+
+from core.memory import Memory, JOURNAL_SUFFIX
+from core.sqlite_memory import SQLiteMemory, fts_query
+
+def _open(tmp_path, json_path=None, **kwargs):
+    return SQLiteMemory(str(tmp_path / "memory.db"), json_path=json_path, flush_interval=0, **kwargs)
+
+def test_preferences_facts_and_knowledge_round_trip(tmp_path):
+    memory = _open(tmp_path)
+    memory.set_preference("name", {"first": "Tony"})
+    memory.set_preference("fact_1", "The garage door code is 4512")
+    memory.set_preference("knowledge_solar_panels", "Panels convert sunlight into electricity.")
+    memory.learn_command("Lights Out", "turn off the lights")
+    memory.close()
+    memory = _open(tmp_path)
+    assert memory.get_preference("name") == {"first": "Tony"}
+    assert memory.get_preference("fact_1") == "The garage door code is 4512"
+    assert memory.get_preference("missing", "default") == "default"
+    assert memory.get_learned_command("lights out") == "turn off the lights"
+    assert memory.facts() == ["The garage door code is 4512"]
+    memory.close()
+
+def test_search_ranks_across_facts_knowledge_and_history(tmp_path):
+    memory = _open(tmp_path)
+    memory.set_preference("fact_1", "My sister lives in Lisbon")
+    memory.set_preference("knowledge_lisbon", "Lisbon is the capital of Portugal.")
+    memory.add_history_item("user", "book a flight to lisbon")
+    memory.add_history_item("user", "what is the weather")
+    kinds = {r["kind"] for r in memory.search("Lisbon")}
+    assert kinds == {"facts", "knowledge", "history"}
+    assert memory.search("weather", kinds=("history",))[0]["content"] == "what is the weather"
+    # Query syntax in user text is quoted, not interpreted
+    assert {r["kind"] for r in memory.search('lisbon" OR content:*')} == kinds
+    assert fts_query("what is the NEAR(weather)") == '"near" OR "weather"'
+    memory.close()
+
+def test_history_pages_by_time_and_keyword(tmp_path):
+    memory = _open(tmp_path)
+    for i in range(5):
+        memory.add_history_item("user", f"note {i} about paris" if i % 2 == 0 else f"note {i}")
+    first = memory.history_between(0, time.time() + 1, limit=2)
+    second = memory.history_between(0, time.time() + 1, limit=2, after=first[-1]["seq"])
+    assert [m["content"] for m in first + second] == ["note 0 about paris", "note 1", "note 2 about paris", "note 3"]
+    newest = memory.history_mentioning("paris", limit=2)
+    older = memory.history_mentioning("paris", limit=2, before=newest[-1]["seq"])
+    assert [m["content"] for m in newest + older] == ["note 4 about paris", "note 2 about paris", "note 0 about paris"]
+    memory.close()
+
+def test_json_memory_is_migrated_once_and_left_untouched(tmp_path):
+    json_path = str(tmp_path / "memory.json")
+    source = Memory(json_path, flush_interval=0)
+    source.set_preference("name", "Tony")
+    source.add_history_item("user", "hello")
+    source.save()
+    source.add_history_item("user", "only in the journal")
+    # Not closed: the last message is only in the journal, as after a crash
+    before = {p: open(p, 'rb').read() for p in (json_path, json_path + JOURNAL_SUFFIX)}
+
+    memory = _open(tmp_path, json_path=json_path)
+    assert memory.get_preference("name") == "Tony"
+    assert [m["content"] for m in memory.iter_history()] == ["hello", "only in the journal"]
+    memory.add_history_item("user", "new")
+    memory.close()
+    assert {p: open(p, 'rb').read() for p in before} == before
+
+    reopened = _open(tmp_path, json_path=json_path)
+    assert [m["content"] for m in reopened.iter_history()] == ["hello", "only in the journal", "new"]
+    reopened.close()
+
+def test_read_only_memory_never_writes(tmp_path):
+    path = tmp_path / "memory.json"
+    memory = Memory(str(path), flush_interval=0)
+    memory.set_preference("a", 1)
+    with open(str(path) + JOURNAL_SUFFIX, 'a', encoding='utf-8') as f:
+        f.write('{"op": "se')
+    with open(str(path) + JOURNAL_SUFFIX, 'rb') as f:
+        before = f.read()
+
+    reader = Memory(str(path), read_only=True)
+    assert reader.get_preference("a") == 1
+    reader.close()
+    assert not path.exists()
+    with open(str(path) + JOURNAL_SUFFIX, 'rb') as f:
+        assert f.read() == before
+
+def test_writes_are_committed_behind_and_close_returns_promptly(tmp_path):
+    memory = SQLiteMemory(str(tmp_path / "memory.db"), json_path=None, flush_interval=0.2)
+    memory.add_history_item("user", "hello")
+    time.sleep(0.05)  # The flusher is now waiting for the rest of the burst
+    started = time.perf_counter()
+    memory.close()
+    assert time.perf_counter() - started < 1.0
+    assert [m["content"] for m in _open(tmp_path).iter_history()] == ["hello"]
@@ -0,0 +1,42 @@
+from core.backends import StubBackend
+from core.tts import SentenceBuffer
+
+def test_sentence_buffer_releases_complete_sentences():
+    buffer = SentenceBuffer()
+    assert buffer.feed("Hello there") == []
+    assert buffer.feed(". How are") == ["Hello there."]
+    assert buffer.feed(" you?") == []
+    assert buffer.feed(" I am") == ["How are you?"]
+    assert buffer.flush() == "I am"
+    assert buffer.flush() == ""
+
+def test_sentence_buffer_splits_on_blank_lines():
+    buffer = SentenceBuffer()
+    assert buffer.feed("First paragraph\n\nSecond") == ["First paragraph"]
+    assert buffer.flush() == "Second"
+
+def test_sentence_buffer_keeps_abbreviation_free_numbers_together():
+    buffer = SentenceBuffer()
+    assert buffer.feed("It costs 3.50 dollars") == []
+    assert buffer.flush() == "It costs 3.50 dollars"
+
+def test_generate_stream_yields_the_same_text_as_generate(make_llm):
+    llm = make_llm(StubBackend(reply="one two three four"))
+    pieces = list(llm.generate_stream("hi", max_tokens=10))
+    assert len(pieces) == 4
+    assert "".join(pieces) == llm.generate("hi", max_tokens=10)
+
+def test_generate_stream_releases_the_model_when_closed(make_llm):
+    llm = make_llm(StubBackend(reply="one two three four"))
+    stream = llm.generate_stream("hi")
+    assert next(stream) == "one"
+    stream.close()
+    assert llm.scheduler.depth() == 0
+    assert llm.generate("hi") == "one two three four"
+
+def test_generate_stream_yields_a_single_error_when_unavailable(make_llm):
+    class Broken(StubBackend):
+        def load(self, path):
+            return False
+    llm = make_llm(Broken())
+    assert list(llm.generate_stream("hi")) == ["Error: Model could not be loaded. Please check logs."]
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from core.backends import StubBackend
+from core.grammars import SHELL_COMMAND_GBNF
+from core.llm import LLMEngine, INTENT_TOKEN_CAPS
+from skills.dev_skill import DevSkill
+
+def test_intent_caps_bound_the_token_budget():
+    assert LLMEngine.token_budget(None, "command") == INTENT_TOKEN_CAPS["command"]
+    assert LLMEngine.token_budget(5000, "code") == INTENT_TOKEN_CAPS["code"]
+    assert LLMEngine.token_budget(10, "code") == 10
+    assert LLMEngine.token_budget(None, None) == 1024
+    assert LLMEngine.token_budget(None, "unknown") == 1024
+
+def test_grammar_and_cap_reach_the_backend(make_llm):
+    seen = {}
+    class Recording(StubBackend):
+        def complete(self, path, prompt, stop, max_tokens, cache_prefix=None, draft=None, grammar=None):
+            seen.update(max_tokens=max_tokens, grammar=grammar)
+            return "mkdir test\n"
+    llm = make_llm(Recording())
+    assert llm.generate("make a folder", grammar=SHELL_COMMAND_GBNF, intent="command") == "mkdir test"
+    assert seen == {"max_tokens": INTENT_TOKEN_CAPS["command"], "grammar": SHELL_COMMAND_GBNF}
+
+def test_grammar_is_part_of_the_cache_key(make_llm):
+    llm = make_llm(StubBackend(reply="x"))
+    plain = llm._cache_keys(None, None, 96, None, "prompt")
+    constrained = llm._cache_keys(None, None, 96, SHELL_COMMAND_GBNF, "prompt")
+    assert set(plain).isdisjoint(constrained)
+
+class FakeContext:
+    def __init__(self, reply):
+        self.reply = reply
+        self.spoken = []
+        self.queries = []
+        self.engine = SimpleNamespace(llm=SimpleNamespace(register_model=lambda name, path: None))
+
+    def speak(self, text):
+        self.spoken.append(text)
+
+    def llm_query(self, prompt, **kwargs):
+        self.queries.append(kwargs)
+        return self.reply
+
+def test_generated_code_keeps_backticks_and_loses_fences(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code = 'print(f"`{1 + 1}`")'
+    context = FakeContext(f"```python\n{code}\n```")
+    DevSkill(context).start_dev_session("write a script that prints two")
+    assert (tmp_path / "generated_script.py").read_text() == code
+    assert context.queries[0]["intent"] == "code"
+    assert "grammar" not in context.queries[0]
+
+def test_generation_errors_are_not_saved_as_code(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    context = FakeContext("Error: Model could not be loaded. Please check logs.")
+    DevSkill(context).start_dev_session("write a script that prints two")
+    assert not (tmp_path / "generated_script.py").exists()
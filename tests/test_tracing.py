@@ -0,0 +1,66 @@
+import json
+import threading
+
+import pytest
+
+from core import tracing
+from core.executor import SkillExecutor
+from core.pipeline import Pipeline
+
+@pytest.fixture
+def traced(monkeypatch):
+    monkeypatch.setattr(tracing, "ENABLED", True)
+    tracing.clear()
+    yield
+    tracing.clear()
+    tracing.set_turn(None)
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, "ENABLED", False)
+    tracing.clear()
+    assert tracing.new_turn("test") is None
+    with tracing.span("work"):
+        pass
+    tracing.record("other", 0.0, 1.0)
+    assert tracing.events() == []
+
+def test_spans_carry_the_current_turn(traced):
+    turn = tracing.new_turn("typed")
+    with tracing.span("route intent", text="hi"):
+        pass
+    start, span = tracing.events()
+    assert start["name"] == "turn start" and start["args"] == {"source": "typed", "turn": turn}
+    assert span["name"] == "route intent" and span["cat"] == "route" and span["ph"] == "X"
+    assert span["args"] == {"text": "hi", "turn": turn} and span["dur"] >= 0
+
+def test_pipeline_and_executor_continue_the_submitters_turn(traced):
+    pipeline = Pipeline()
+    seen = []
+    done = threading.Event()
+    pipeline.add_stage("work", lambda item: (seen.append(tracing.current_turn()), done.set()))
+    pipeline.start()
+    executor = SkillExecutor(max_workers=1)
+    try:
+        turn = tracing.new_turn("voice")
+        pipeline.submit("work", "item")
+        assert done.wait(2.0)
+        task = executor.submit("skill", tracing.current_turn)
+        assert task.future.result(2.0) is None
+        assert task.result == turn
+    finally:
+        pipeline.stop()
+        executor.shutdown()
+    assert seen == [turn]
+    stage_spans = [e for e in tracing.events() if e["name"] in ("work", "work wait")]
+    assert {e["args"]["turn"] for e in stage_spans} == {turn}
+
+def test_export_writes_chrome_trace_json(traced, tmp_path):
+    tracing.new_turn("typed")
+    with tracing.span("llm generate"):
+        pass
+    path = tracing.export(str(tmp_path / "trace.json"))
+    with open(path) as f:
+        trace = json.load(f)
+    names = [e["name"] for e in trace["traceEvents"]]
+    assert "thread_name" in names and "llm generate" in names
+    assert trace["displayTimeUnit"] == "ms"
@@ -0,0 +1,54 @@
+from core.triggers import AhoCorasick, TriggerIndex, normalize
+
+class Skill:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+def _index(*skills_and_triggers):
+    index = TriggerIndex()
+    for skill, triggers in skills_and_triggers:
+        index.add(skill, triggers)
+    index.build()
+    return index
+
+def test_normalize_trims_case_spaces_and_edge_punctuation():
+    assert normalize("  Hello,   Jarvis!! ") == "hello, jarvis"
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = AhoCorasick()
+    for pattern in ("he", "she", "hers"):
+        automaton.add(pattern, pattern)
+    matches = sorted(automaton.iter_matches("ushers"))
+    assert matches == [(1, "she"), (2, "he"), (2, "hers")]
+
+def test_keyword_matches_anywhere_and_prefix_only_at_start():
+    learn, search = Skill("learn"), Skill("search")
+    index = _index((learn, [("prefix", "learn:")]), (search, [("keyword", "search for")]))
+    assert index.match("Please search for cats") == [search]
+    assert index.match("learn: hi means hello") == [learn]
+    assert index.match("how do I learn: things") == []
+
+def test_pattern_edge_spaces_are_kept():
+    apps = Skill("apps")
+    index = _index((apps, [("keyword", "open ")]))
+    assert index.match("open notepad") == [apps]
+    assert index.match("please reopen") == []
+
+def test_candidates_ordered_by_priority_then_position_then_registration():
+    smalltalk, apps, system = Skill("smalltalk"), Skill("apps"), Skill("system")
+    index = _index(
+        (smalltalk, [("keyword", "jarvis", -5)]),
+        (apps, [("keyword", "open ")]),
+        (system, [("keyword", "volume"), ("regex", r"^jarvis")]),
+    )
+    assert index.match("Jarvis, open the volume mixer") == [system, apps, smalltalk]
+    assert index.match("open it and raise the volume") == [apps, system]
+
+def test_invalid_triggers_are_skipped():
+    skill = Skill("broken")
+    index = _index((skill, [("glob", "*"), ("regex", "("), ("keyword", "fine")]))
+    assert index.count == 1
+    assert index.match("this is fine") == [skill]
@@ -0,0 +1,54 @@
+import pytest
+
+from core.tuning import Tuner, ProfileStore, DEFAULT_PARAMS
+
+class FakeTuner(Tuner):
+    """Speeds from a formula instead of a real model: 4 threads and 256-token batches are
+    fastest, and prompt evaluation slows down as the prompt grows past 2k tokens."""
+    def __init__(self, *args, fail_batch=None, context_cost=0.5, **kwargs):
+        super().__init__(*args, log=lambda message: None, **kwargs)
+        self.fail_batch = fail_batch
+        self.context_cost = context_cost
+        self.prompts = []
+
+    def candidates(self):
+        return {"n_threads": [2, 4, 8], "n_batch": [128, 256, 512], "n_gpu_layers": [0],
+                "n_ctx": [2048, 4096, 8192]}
+
+    def benchmark(self, params, prompt_tokens=None):
+        if params["n_batch"] == self.fail_batch:
+            return None
+        prompt_tokens = prompt_tokens or self.prompt_tokens
+        self.prompts.append((params["n_ctx"], prompt_tokens))
+        speed = 100.0 - abs(params["n_threads"] - 4) * 10 - abs(params["n_batch"] - 256) / 32
+        slowdown = max(1.0, prompt_tokens / 2048) ** self.context_cost
+        return speed / slowdown, speed / 4 / slowdown
+
+def test_profiles_are_stored_per_model_and_applied_over_defaults(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.json"))
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"\0" * 16)
+    assert store.params_for(str(model)) == DEFAULT_PARAMS
+    store.set(str(model), {"n_threads": 3}, {"gen_tps": 1.0})
+    reopened = ProfileStore(str(tmp_path / "profiles.json"))
+    assert reopened.params_for(str(model)) == dict(DEFAULT_PARAMS, n_threads=3)
+    assert reopened.get(str(tmp_path / "other.gguf")) is None
+
+@pytest.mark.parametrize("context_cost, n_ctx", [(0.5, 2048), (0.25, 4096), (0.0, 8192)])
+def test_run_picks_the_fastest_settings_and_largest_affordable_context(tmp_path, context_cost, n_ctx):
+    store = ProfileStore(str(tmp_path / "profiles.json"))
+    tuner = FakeTuner(str(tmp_path / "model.gguf"), store=store, context_cost=context_cost)
+    best = tuner.run()
+    assert best["n_threads"] == 4 and best["n_batch"] == 256
+    assert best["n_ctx"] == n_ctx
+    assert store.get(str(tmp_path / "model.gguf"))["params"] == best
+
+def test_context_benchmarks_fill_each_candidate(tmp_path):
+    tuner = FakeTuner(str(tmp_path / "model.gguf"), store=ProfileStore(str(tmp_path / "p.json")))
+    tuner.run()
+    filled = {ctx: tokens for ctx, tokens in tuner.prompts if tokens != tuner.prompt_tokens}
+    assert filled == {n: n - tuner.gen_tokens - 16 for n in (2048, 4096, 8192)}
+
+def test_failing_candidates_are_skipped(tmp_path):
+    tuner = FakeTuner(str(tmp_path / "model.gguf"), store=ProfileStore(str(tmp_path / "p.json")), fail_batch=256)
+    assert tuner.run()["n_batch"] in (128, 512)
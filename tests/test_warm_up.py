@@ -0,0 +1,56 @@
+import time
+import threading
+
+from core.backends import StubBackend
+from core.llm import STATE_IDLE, STATE_LOADING, STATE_WARMING, STATE_READY, STATE_FAILED
+
+class SlowWarmUp(StubBackend):
+    def __init__(self):
+        super().__init__(reply="hello")
+        self.warming = threading.Event()
+        self.release = threading.Event()
+
+    def warm_up(self, path):
+        self.warming.set()
+        self.release.wait(2.0)
+
+def test_warm_up_reports_each_state_in_order(make_llm):
+    llm = make_llm(SlowWarmUp())
+    states = []
+    llm.add_state_listener(states.append)
+    llm.warm_up_async()
+    assert llm.backend.warming.wait(2.0)
+    assert not llm.is_ready()
+    llm.backend.release.set()
+    assert llm.wait_until_ready(2.0)
+    assert states == [STATE_IDLE, STATE_LOADING, STATE_WARMING, STATE_READY]
+
+def test_requests_during_warm_up_do_not_claim_readiness(make_llm):
+    llm = make_llm(SlowWarmUp())
+    llm.warm_up_async()
+    assert llm.backend.warming.wait(2.0)
+    assert llm.generate("hi") == "hello"
+    assert llm.state == STATE_WARMING
+    assert not llm.ready_event.is_set()
+    llm.backend.release.set()
+    assert llm.wait_until_ready(2.0)
+
+def test_failed_load_reports_failure(make_llm):
+    class Broken(StubBackend):
+        def load(self, path):
+            return False
+    llm = make_llm(Broken())
+    states = []
+    llm.add_state_listener(states.append)
+    llm.warm_up_async()
+    deadline = time.time() + 2.0
+    while states[-1] != STATE_FAILED:
+        assert time.time() < deadline, "warm-up never failed"
+        time.sleep(0.001)
+    assert llm.generate("hi").startswith("Error")
+
+def test_first_request_without_warm_up_marks_the_model_ready(make_llm):
+    llm = make_llm(StubBackend(reply="hello"))
+    assert llm.state == STATE_IDLE
+    llm.generate("hi")
+    assert llm.is_ready()